@@ -13,32 +13,55 @@ Package for designing, simulating, and imaging with lensless cameras.
 """
 
 
-from .recon.recon import ReconstructionAlgorithm
-from .recon.admm import ADMM
-from .recon.gd import (
-    GradientDescent,
-    NesterovGradientDescent,
-    FISTA,
-    GradientDescentUpdate,
-)
-from .recon.tikhonov import CodedApertureReconstruction
-from .hardware.sensor import VirtualSensor, SensorOptions
-
-try:
-    from .recon.trainable_recon import TrainableReconstructionAlgorithm
-    from .recon.unrolled_admm import UnrolledADMM
-    from .recon.unrolled_fista import UnrolledFISTA
-    from .recon.trainable_inversion import TrainableInversion
-    from .recon.multi_wiener import MultiWiener
-    from .recon.sv_deconvnet import SVDeconvNet
-except Exception:
-    pass
-
-try:
-    from .recon.apgd import APGD, APGDPriors
-
-    pycsou_available = True
-except Exception:
-    pycsou_available = False
+import importlib
 
 from .version import __version__
+
+# objects are only imported when accessed (PEP 562), so that `import lensless` is fast and
+# heavy dependencies (torch, torchvision, matplotlib, etc) are only loaded when needed
+_lazy_objects = {
+    "ReconstructionAlgorithm": ".recon.recon",
+    "ADMM": ".recon.admm",
+    "GradientDescent": ".recon.gd",
+    "NesterovGradientDescent": ".recon.gd",
+    "FISTA": ".recon.gd",
+    "GradientDescentUpdate": ".recon.gd",
+    "CodedApertureReconstruction": ".recon.tikhonov",
+    "VirtualSensor": ".hardware.sensor",
+    "SensorOptions": ".hardware.sensor",
+    # require torch
+    "TrainableReconstructionAlgorithm": ".recon.trainable_recon",
+    "UnrolledADMM": ".recon.unrolled_admm",
+    "UnrolledFISTA": ".recon.unrolled_fista",
+    "TrainableInversion": ".recon.trainable_inversion",
+    "MultiWiener": ".recon.multi_wiener",
+    "SVDeconvNet": ".recon.sv_deconvnet",
+    # require pycsou
+    "APGD": ".recon.apgd",
+    "APGDPriors": ".recon.apgd",
+}
+_lazy_submodules = ["eval", "hardware", "recon", "utils"]
+
+
+def __getattr__(name):
+    if name in _lazy_objects:
+        module = importlib.import_module(_lazy_objects[name], __name__)
+        obj = getattr(module, name)
+    elif name in _lazy_submodules:
+        obj = importlib.import_module("." + name, __name__)
+    elif name == "pycsou_available":
+        try:
+            importlib.import_module(".recon.apgd", __name__)
+            obj = True
+        except Exception:
+            obj = False
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    # cache for subsequent accesses
+    globals()[name] = obj
+    return obj
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_objects.keys()) + ["pycsou_available"])
@@ -7,13 +7,13 @@
 # #############################################################################
 
 
-from lensless.utils.dataset import DiffuserCamTestDataset
+from lensless.utils.dataset import DiffuserCamTestDataset, create_dataloader
 from lensless.utils.io import save_image
+from lensless.utils.image import flip_HWC
 from waveprop.noise import add_shot_noise
 from tqdm import tqdm
 import os
 import numpy as np
-import wandb
 
 try:
     import torch
@@ -78,6 +78,8 @@ def benchmark(
     use_background=True,
     pnp=None,
     swap_channels=False,
+    num_workers=0,
+    prefetch_factor=None,
     **kwargs,
 ):
     """
@@ -110,6 +112,10 @@ def benchmark(
     pnp : dict, optional
         Dictionary of parameters for (Parameterize and perturb) algorithm, by default None.
         Required keys: "mu" (distance from original parameters), "lr" (SGD learning rate), "n_iter" (number of iterations), "model_path" (original model path).
+    num_workers : int, optional
+        Number of DataLoader worker processes, by default 0 (main process).
+    prefetch_factor : int, optional
+        Number of batches loaded in advance by each worker, by default None (PyTorch default).
 
     Returns
     -------
@@ -165,7 +171,13 @@ def benchmark(
     output_intermediate = unrolled_output_factor or pre_process_aux or save_intermediate
 
     # loop over batches
-    dataloader = DataLoader(dataset, batch_size=batchsize, pin_memory=(device != "cpu"))
+    dataloader = create_dataloader(
+        dataset,
+        batch_size=batchsize,
+        pin_memory=(device != "cpu"),
+        num_workers=num_workers,
+        prefetch_factor=prefetch_factor,
+    )
     model.reset()
     idx = 0
     weights = []  # for averaging batches
@@ -179,14 +191,23 @@ def benchmark(
         lensed = batch[1].to(device)
         if dataset.measured_bg and use_background:
             background = batch[-1].to(device)
-        if dataset.multimask or dataset.random_flip:
+        if dataset.multimask:
             psfs = batch[2]
             psfs = psfs.to(device)
         else:
             psfs = None
+        psfs_flipped = psfs
         if dataset.random_flip:
-            flip_lr = batch[3]
-            flip_ud = batch[4]
+            flip_lr = batch[3 if dataset.multimask else 2]
+            flip_ud = batch[4 if dataset.multimask else 3]
+            if batchsize == 1 or "ReconstructionError" in metrics:
+                # batched reconstruction flips PSFs according to flags, but flipped PSFs are
+                # needed for setting the PSF of the model or computing the reconstruction error
+                psfs_flipped = flip_HWC(
+                    psfs if psfs is not None else dataset.psf[None].to(device),
+                    flip_lr=flip_lr,
+                    flip_ud=flip_ud,
+                )
 
         # add shot noise
         if snr is not None:
@@ -197,11 +218,14 @@ def benchmark(
         if batchsize == 1:
 
             if pnp is not None:
-                from lensless.recon.model_dict import load_model
+                from lensless.recon.model_dict import get_model
                 from lensless.recon.rfft_convolve import RealFFTConvolve2D
 
-                psf = psfs[0].to(device)
-                recon_pnp = load_model(pnp["model_path"], psf, device=device, verbose=False)
+                psf = psfs_flipped[0].to(device)
+                # copy, as the model is adapted to each example
+                recon_pnp = get_model(
+                    pnp["model_path"], psf, device=device, copy=True, verbose=False
+                )
 
                 # define optimizer
                 optimizer = SGD(recon_pnp.parameters(), lr=pnp["lr"])
@@ -241,8 +265,8 @@ def benchmark(
 
             else:
                 with torch.no_grad():
-                    if psfs is not None:
-                        model._set_psf(psfs[0])
+                    if psfs_flipped is not None:
+                        model._set_psf(psfs_flipped[0])
                     model.set_data(lensless)
                     prediction = model.apply(
                         plot=False,
@@ -255,7 +279,12 @@ def benchmark(
         else:
             with torch.no_grad():
                 prediction = model.forward(
-                    batch=lensless, psfs=psfs, background=background, **kwargs
+                    batch=lensless,
+                    psfs=psfs,
+                    background=background,
+                    flip_lr=flip_lr,
+                    flip_ud=flip_ud,
+                    **kwargs,
                 )
 
         if output_intermediate:
@@ -330,6 +359,8 @@ def benchmark(
                             save_image(psfs_out_np, fp=fp)
 
                     if use_wandb:
+                        import wandb
+
                         assert epoch is not None, "epoch must be provided for wandb logging"
                         log_key = f"{_batch_idx}_{label}" if label is not None else f"{_batch_idx}"
                         wandb.log({log_key: wandb.Image(fp)}, step=epoch)
@@ -347,7 +378,7 @@ def benchmark(
         for metric in metrics:
             if metric == "ReconstructionError":
                 metrics_values[metric] += model.reconstruction_error(
-                    prediction=prediction_original, lensless=lensless, psfs=psfs
+                    prediction=prediction_original, lensless=lensless, psfs=psfs_flipped
                 ).tolist()
             else:
                 try:
@@ -48,6 +48,7 @@ class Mask3DModel:
         simplify: bool = False,
         show_axis: bool = False,
         generate: bool = True,
+        height_levels: Optional[int] = None,
     ):
         """
         Wrapper to CadQuery to generate a 3D model from a mask array, e.g. for 3D printing.
@@ -70,6 +71,8 @@ class Mask3DModel:
             Show axis for debug purposes. Defaults to False.
         generate : bool, optional
             Generate model on initialization. Defaults to True.
+        height_levels : Optional[int], optional
+            For a height map, quantize heights to this number of uniformly spaced levels (between 0 and the maximum height) before meshing, which reduces the number of boxes. Defaults to None, i.e. the heights of the mask are used as is.
 
         """
 
@@ -85,6 +88,7 @@ class Mask3DModel:
         self.height = height
         self.simplify = simplify
         self.show_axis = show_axis
+        self.height_levels = height_levels
 
         self.model = None
 
@@ -132,6 +136,91 @@ class Mask3DModel:
             heights = None
         return coordinates, heights
 
+    @staticmethod
+    def merge_rectangles(covered: np.ndarray):
+        """
+        Greedy meshing of a binary array: merge covered pixels into maximal rectangles.
+
+        Rows are scanned from top to bottom, and each run of covered pixels in a row is
+        extended downwards as long as the rows below cover the whole run.
+
+        Parameters
+        ----------
+        covered : np.ndarray
+            Boolean array of pixels to cover.
+
+        Returns
+        -------
+        np.ndarray
+            Rectangles as (start row, start column, end row, end column), end being exclusive.
+        """
+        covered = np.array(covered, dtype=bool)
+        n_rows, n_cols = covered.shape
+        rectangles = []
+        for row in range(n_rows):
+            col = 0
+            while col < n_cols:
+                start = np.flatnonzero(covered[row, col:])
+                if len(start) == 0:
+                    break
+                col_start = col + start[0]
+                end = np.flatnonzero(~covered[row, col_start:])
+                col_end = col_start + end[0] if len(end) > 0 else n_cols
+                row_end = row + 1
+                while row_end < n_rows and covered[row_end, col_start:col_end].all():
+                    row_end += 1
+                covered[row:row_end, col_start:col_end] = False
+                rectangles.append((row, col_start, row_end, col_end))
+                col = col_end
+        return np.array(rectangles, dtype=int).reshape(-1, 4)
+
+    @staticmethod
+    def mask_to_rectangles(
+        mask: np.ndarray,
+        px_size: Union[tuple[float, float], np.ndarray],
+        height_levels: Optional[int] = None,
+    ):
+        """
+        Turns mask into rectangles of pixels with the same height, covering the same volume as the
+        pixel boxes of :py:func:`~lensless.hardware.fabrication.Mask3DModel.mask_to_points`.
+
+        For a binary mask, the rectangles cover the transparent (zero) pixels. For a height map,
+        the pixels of each height are merged into rectangles, each extruded from the bottom of the
+        mask to this height. As the pixels are partitioned into rectangles, there are never more
+        rectangles than pixel boxes.
+
+        Parameters
+        ----------
+        mask : np.ndarray
+            Mask array.
+        px_size : Union[tuple[float, float], np.ndarray]
+            Pixel size in meters.
+        height_levels : Optional[int], optional
+            Quantize heights to this number of levels, such that more pixels can be merged. Defaults to None.
+
+        Returns
+        -------
+        list
+            One tuple (thickness, coordinates, sizes) per height, with the thickness relative to
+            the mask height, and the coordinates / sizes of the rectangles with this height.
+        """
+        is_3D = len(np.unique(mask)) > 2
+
+        def to_rectangles(covered, thickness):
+            rectangles = Mask3DModel.merge_rectangles(covered)
+            coordinates = (rectangles[:, :2] - np.array(mask.shape) / 2) * px_size
+            sizes = (rectangles[:, 2:] - rectangles[:, :2]) * px_size
+            return thickness, coordinates, sizes
+
+        if not is_3D:
+            return [to_rectangles(mask == 0, 1)]
+
+        assert np.all(mask >= 0), "Heights must be non-negative."
+        if height_levels is not None:
+            step = mask.max() / height_levels
+            mask = np.round(mask / step) * step
+        return [to_rectangles(mask == height, height) for height in np.unique(mask[mask != 0])]
+
     def generate_3d_model(self):
         """
         Based on provided (1) mask, (2) frame, and (3) connection between frame and mask, generate a 3d model.
@@ -149,31 +238,21 @@ class Mask3DModel:
             model = model.add(connection_model)
 
         px_size = self.mask_size / self.mask.shape
-        points, heights = Mask3DModel.mask_to_points(self.mask, px_size)
-        if len(points) != 0:
-            if heights is None:
-                assert self.height is not None, "height must be provided if mask is 2D."
-                mask_model = (
-                    cq.Workplane("XY")
-                    .pushPoints(points)
-                    .box(px_size[0], px_size[1], self.height, centered=False, combine=False)
+        rectangles = Mask3DModel.mask_to_rectangles(self.mask, px_size, self.height_levels)
+        if sum(len(coordinates) for _, coordinates, _ in rectangles) != 0:
+            assert self.height is not None, "height must be provided."
+            # one box per rectangle of merged pixels, rather than one box per pixel
+            boxes = [
+                cq.Solid.makeBox(
+                    float(size[0]),
+                    float(size[1]),
+                    float(thickness * self.height),
+                    pnt=cq.Vector(float(point[0]), float(point[1]), 0),
                 )
-            else:
-                mask_model = cq.Workplane("XY")
-                for point, height in zip(points, heights):
-
-                    box = (
-                        cq.Workplane("XY")
-                        .moveTo(point[0], point[1])
-                        .box(
-                            px_size[0],
-                            px_size[1],
-                            height * self.height,
-                            centered=False,
-                            combine=False,
-                        )
-                    )
-                    mask_model = mask_model.add(box)
+                for thickness, coordinates, sizes in rectangles
+                for point, size in zip(coordinates, sizes)
+            ]
+            mask_model = cq.Workplane("XY").add(boxes)
 
             if self.simplify:
                 mask_model = mask_model.combine(glue=True)
@@ -27,11 +27,11 @@ from sympy.ntheory import quadratic_residues
 from scipy.signal import max_len_seq
 from scipy.linalg import circulant
 from numpy.linalg import multi_dot
-from waveprop.fresnel import fresnel_conv
-from waveprop.rs import angular_spectrum
+from waveprop.util import sample_points
 from waveprop.noise import add_shot_noise
 from lensless.hardware.sensor import VirtualSensor
 from lensless.utils.image import resize
+from lensless.utils.propagation import angular_spectrum_batch
 import matplotlib.pyplot as plt
 
 try:
@@ -217,24 +217,28 @@ class Mask(abc.ABC):
             if not hasattr(wavelength, "__len__"):
                 wavelength = [wavelength]
 
+        # propagate all wavelengths at once
+        if self.height_map is None:
+            u_in = self.mask
+        elif self.use_torch:
+            u_in = torch.stack([self.height_map_to_field(wv) for wv in wavelength])
+        else:
+            u_in = np.stack([self.height_map_to_field(wv) for wv in wavelength])
+        if self.use_torch and not torch.is_tensor(u_in):
+            u_in = torch.from_numpy(u_in)
+        psf = angular_spectrum_batch(
+            u_in=u_in,
+            wavelengths=wavelength,
+            d1=self.feature_size,
+            dz=self.distance_sensor,
+            bandlimit=True,
+            dtype=np.float32,
+            device=self.torch_device if self.use_torch else None,
+        )
         if self.use_torch:
-            psf = torch.zeros(
-                tuple(self.resolution) + (len(wavelength),),
-                dtype=torch.complex64,
-                device=self.torch_device,
-            )
+            psf = psf.to(torch.complex64).permute(1, 2, 0).contiguous()
         else:
-            psf = np.zeros(tuple(self.resolution) + (len(wavelength),), dtype=np.complex64)
-        for i, wv in enumerate(wavelength):
-            psf[:, :, i] = angular_spectrum(
-                u_in=self.mask if self.height_map is None else self.height_map_to_field(wv),
-                wv=wv,
-                d1=self.feature_size,
-                dz=self.distance_sensor,
-                dtype=np.float32 if not self.use_torch else torch.float32,
-                bandlimit=True,
-                device=self.torch_device if self.use_torch else None,
-            )[0]
+            psf = np.ascontiguousarray(np.moveaxis(psf.astype(np.complex64), 0, -1))
 
         # intensity PSF
         if intensity:
@@ -606,17 +610,32 @@ class MultiLensArray(Mask):
 
     def place_spheres_on_plane(self, radius, max_attempts=1000):
         """Try to place circles of given radius on a 2D plane."""
-        placed_circles = []
         rad_sorted = sorted(radius, reverse=True)  # sort the radius in descending order
         loc = []
         r_placed = []
+
+        # placed circles are indexed by grid cells, such that a candidate is only compared to
+        # circles of neighboring cells: cell size is the maximum distance for an overlap
+        cell_size = 2 * rad_sorted[0] + self.min_separation if len(rad_sorted) > 0 else 1
+        placed_circles = dict()
+
+        def neighbors(x, y):
+            cell_x, cell_y = int(x // cell_size), int(y // cell_size)
+            return [
+                circle
+                for i in range(cell_x - 1, cell_x + 2)
+                for j in range(cell_y - 1, cell_y + 2)
+                for circle in placed_circles.get((i, j), [])
+            ]
+
         for r in rad_sorted:
             placed = False
             for _ in range(max_attempts):
                 x = np.random.uniform(r, self.size[1] - r)
                 y = np.random.uniform(r, self.size[0] - r)
-                if not self.does_circle_overlap(placed_circles, x, y, r):
-                    placed_circles.append((x, y, r))
+                if not self.does_circle_overlap(neighbors(x, y), x, y, r):
+                    cell = (int(x // cell_size), int(y // cell_size))
+                    placed_circles.setdefault(cell, []).append((x, y, r))
                     loc.append([x, y])
                     r_placed.append(r)
                     placed = True
@@ -674,15 +693,27 @@ class MultiLensArray(Mask):
         if self.centered:
             x = x - self.resolution[1] / 2
             y = y - self.resolution[0] / 2
-        X, Y = (
-            np.meshgrid(x, y, indexing="ij")
-            if not self.use_torch
-            else torch.meshgrid(x, y, indexing="ij")
-        )
+        x0 = float(x[0])
+        y0 = float(y[0])
         for idx, rad in enumerate(radius):
+            # only evaluate lens within its bounding box (with a margin of one pixel)
+            center = (float(locs[idx][1]), float(locs[idx][0]))
+            rows = slice(
+                max(int(np.floor(center[0] - float(rad) - x0)) - 1, 0),
+                max(int(np.ceil(center[0] + float(rad) - x0)) + 2, 0),
+            )
+            cols = slice(
+                max(int(np.floor(center[1] - float(rad) - y0)) - 1, 0),
+                max(int(np.ceil(center[1] + float(rad) - y0)) + 2, 0),
+            )
+            X, Y = (
+                np.meshgrid(x[rows], y[cols], indexing="ij")
+                if not self.use_torch
+                else torch.meshgrid(x[rows], y[cols], indexing="ij")
+            )
             contribution = self.lens_contribution(X, Y, rad, locs[idx]) * self.feature_size[0]
             contribution[(X - locs[idx][1]) ** 2 + (Y - locs[idx][0]) ** 2 > rad**2] = 0
-            height = height + contribution
+            height[rows, cols] = height[rows, cols] + contribution
         height[height < self.min_height] = self.min_height
         return height
 
@@ -772,17 +803,33 @@ class PhaseContour(Mask):
         self.height_map = height_map
 
 
-def phase_retrieval(target_psf, wv, d1, dz, n=1.2, n_iter=10, height_map=False, phase_wrap=1):
+def phase_retrieval(
+    target_psf,
+    wv,
+    d1,
+    dz,
+    n=1.2,
+    n_iter=10,
+    height_map=False,
+    phase_wrap=1,
+    tol=None,
+    return_errors=False,
+    device=None,
+):
     """
     Iterative phase retrieval algorithm similar to `PhlatCam <https://ieeexplore.ieee.org/document/9076617>`_,
     using Fresnel propagation.
 
+    Multiple target PSFs and / or wavelengths can be optimized at once. Fresnel kernels are computed
+    once, and propagation is done with NumPy or PyTorch depending on the type of ``target_psf``.
+
     Parameters
     ----------
     target_psf: array_like
-        Target PSF to optimize the phase mask for.
-    wv: float
-        Wavelength (m).
+        Target PSF to optimize the phase mask for, of shape (height, width), or (batch, height, width)
+        for multiple PSFs. :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`.
+    wv: float or array_like
+        Wavelength(s) (m).
     d1: float
         Sample period on the sensor i.e. pixel size (m).
     dz: float
@@ -790,34 +837,153 @@ def phase_retrieval(target_psf, wv, d1, dz, n=1.2, n_iter=10, height_map=False,
     n: float
         Refractive index of the mask substrate. Default is 1.2.
     n_iter: int
-        Number of iterations. Default value is 10.
+        (Maximum) number of iterations. Default value is 10.
+    height_map: bool
+        Whether to also return the height map. Default is False.
     phase_wrap : int
         How many multiple of (2*pi) to wrap the phase, to limit heights. Default is 1.
+    tol : float, optional
+        Stop early if the error (see ``return_errors``) of each PSF changes by less than ``tol`` between
+        two iterations. Default is to run ``n_iter`` iterations.
+    return_errors : bool
+        Whether to also return the error at each iteration, namely the relative error (L2 norm)
+        between the amplitude at the sensor, rescaled to the norm of the square root of the target
+        PSF, and the square root of the target PSF.
+    device : str, optional
+        Device for PyTorch. Default is the device of ``target_psf``.
+
+    Returns
+    -------
+    phi : :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`
+        Phase pattern of shape ([batch,] [n_wavelengths,] height, width), where the batch and wavelength
+        dimensions are only present for multiple target PSFs and wavelengths respectively.
+    height_map : :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`
+        Height map, same shape as ``phi``. Only returned if ``height_map=True``.
+    errors : :py:class:`~numpy.ndarray`
+        Errors of shape (n_iterations, [batch,] [n_wavelengths]). Only returned if ``return_errors=True``.
     """
     assert isinstance(phase_wrap, int), "phase_wrap should be an integer"
-    M_p = np.sqrt(target_psf)
 
     if hasattr(d1, "__len__"):
         if d1[0] != d1[1]:
             warnings.warn("Non-square pixel, first dimension taken as feature size.")
         d1 = d1[0]
+    d1 = float(d1)
+
+    is_torch = torch_available and torch.is_tensor(target_psf)
+    single_wv = not hasattr(wv, "__len__")
+    wv = np.atleast_1d(np.array(wv, dtype=float))
+    single_psf = len(target_psf.shape) == 2
+    shape = target_psf.shape[-2:]
+    dims = (-2, -1)
+
+    # target amplitudes, of shape (batch, 1, height, width)
+    if is_torch:
+        device = device if device is not None else target_psf.device
+        M_target = torch.sqrt(target_psf.to(device=device, dtype=torch.float32))
+    else:
+        M_target = np.sqrt(np.asarray(target_psf, dtype=np.float32))
+    M_target = M_target.reshape((-1, 1) + tuple(shape))
+
+    # Fresnel kernels (as in `waveprop.fresnel.fresnel_conv` without rescaling), one per wavelength
+    pad = [(n_pix // 2 + 1 if n_pix % 2 else n_pix // 2, n_pix // 2) for n_pix in shape]
+    N = np.array([n_pix + sum(p) for n_pix, p in zip(shape, pad)])
+    df1 = 1 / (N * d1)
+    fX, fY = sample_points(N=N, delta=df1)
+    fsq = fX**2 + fY**2
+    k = 2 * np.pi / wv[:, np.newaxis, np.newaxis]
+    Q_forward = np.exp(-1j * np.pi**2 * 2 * dz / k * fsq).astype(np.complex64)
+    Q_backward = np.conj(Q_forward)
+    ft_fact = d1 * d1
+    ift_fact = N[0] * N[1] * df1[0] * df1[1]
+    if is_torch:
+        Q_forward = torch.from_numpy(Q_forward).to(device)
+        Q_backward = torch.from_numpy(Q_backward).to(device)
+
+    def propagate(u, Q):
+        # zero-pad, convolve with kernel (as `ft2` and `ift2` of waveprop), crop
+        if is_torch:
+            u = torch.nn.functional.pad(u, pad[1] + pad[0])
+            U = torch.fft.fftshift(
+                torch.fft.fft2(torch.fft.fftshift(u * ft_fact, dim=dims)), dim=dims
+            )
+            u = torch.fft.ifftshift(
+                torch.fft.ifft2(torch.fft.ifftshift(Q * U * ift_fact, dim=dims)), dim=dims
+            )
+        else:
+            u = np.pad(u, [(0, 0)] * (u.ndim - 2) + pad)
+            U = np.fft.fftshift(np.fft.fft2(np.fft.fftshift(u, axes=dims)), axes=dims) * ft_fact
+            U = U.astype(np.complex64)
+            u = np.fft.ifftshift(
+                np.fft.ifft2(np.fft.ifftshift(Q * U * ift_fact, axes=dims)), axes=dims
+            )
+            u = u.astype(np.complex64)
+        return u[
+            ..., shape[0] // 2 : shape[0] // 2 + shape[0], shape[1] // 2 : shape[1] // 2 + shape[1]
+        ]
+
+    if is_torch:
+        angle, exp = torch.angle, torch.exp
+    else:
+        angle, exp = np.angle, np.exp
 
-    for _ in range(n_iter):
+    def l2_norm(u):
+        # over spatial dimensions
+        if is_torch:
+            return torch.linalg.vector_norm(u, dim=dims).cpu().numpy()
+        else:
+            return np.linalg.norm(u, axis=dims)
+
+    target_norm = l2_norm(M_target)
+
+    M_p = M_target
+    errors = []
+    for i in range(n_iter):
         # back propagate from sensor to mask
-        M_phi = fresnel_conv(M_p, wv, d1, -dz, dtype=np.float32)[0]
+        M_phi = propagate(M_p, Q_backward)
         # constrain amplitude at mask to be unity, i.e. phase pattern
-        M_phi = np.exp(1j * np.angle(M_phi))
+        M_phi = exp(1j * angle(M_phi))
         # forward propagate from mask to sensor
-        M_p = fresnel_conv(M_phi, wv, d1, dz, dtype=np.float32)[0]
+        M_p = propagate(M_phi, Q_forward)
+
+        # error with respect to target, after rescaling the amplitude to the target's norm (as the
+        # amplitude constraint at the mask does not preserve energy)
+        M_amp = abs(M_p)
+        scale = target_norm / l2_norm(M_amp)
+        if is_torch:
+            scale = torch.from_numpy(scale).to(device)
+        errors.append(l2_norm(M_amp * scale[..., None, None] - M_target) / target_norm)
+
         # constrain amplitude to be sqrt(PSF)
-        M_p = np.sqrt(target_psf) * np.exp(1j * np.angle(M_p))
+        M_p = M_target * exp(1j * angle(M_p))
 
-    phi = (np.angle(M_phi) + 2 * np.pi) % (2 * np.pi * phase_wrap)
+        if tol is not None and i > 0 and np.all(np.abs(errors[-2] - errors[-1]) < tol):
+            break
 
-    if height_map:
-        return phi, wv * phi / (2 * np.pi * (n - 1))
+    if is_torch:
+        phi = torch.remainder(angle(M_phi) + 2 * np.pi, 2 * np.pi * phase_wrap)
     else:
-        return phi
+        phi = (angle(M_phi) + 2 * np.pi) % (2 * np.pi * phase_wrap)
+    errors = np.array(errors)
+
+    # remove batch / wavelength dimensions if not needed
+    if single_wv:
+        phi = phi[:, 0]
+        errors = errors[:, :, 0]
+    if single_psf:
+        phi = phi[0]
+        errors = errors[:, 0]
+
+    res = [phi]
+    if height_map:
+        wv_shape = (-1, 1, 1) if not single_wv else ()
+        wv_phi = wv[0] if single_wv else wv.reshape(wv_shape)
+        if is_torch:
+            wv_phi = torch.as_tensor(wv_phi, dtype=phi.dtype, device=device)
+        res.append(wv_phi * phi / (2 * np.pi * (n - 1)))
+    if return_errors:
+        res.append(errors)
+    return res[0] if len(res) == 1 else tuple(res)
 
 
 class FresnelZoneAperture(Mask):
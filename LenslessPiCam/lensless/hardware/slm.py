@@ -7,9 +7,9 @@
 
 
 import os
+from collections import OrderedDict
 import numpy as np
 from lensless.hardware.utils import check_username_hostname
-from lensless.utils.io import get_ctypes
 from slm_controller.hardware import SLMParam, slm_devices
 from scipy.ndimage import rotate as rotate_func
 
@@ -26,9 +26,9 @@ except ImportError:
 try:
     from waveprop.spherical import spherical_prop
     from waveprop.color import ColorSystem
-    from waveprop.rs import angular_spectrum
     from waveprop.slm import get_centers
     from waveprop.devices import SLMParam as SLMParam_wp
+    from lensless.utils.propagation import angular_spectrum_batch
 
     waveprop_available = True
 except ImportError:
@@ -123,6 +123,21 @@ def set_programmable_mask(pattern, device, rpi_username=None, rpi_hostname=None,
     os.remove(local_path)
 
 
+def _covered_pixels(starts, length, n_pixels):
+    """
+    Sensor pixels (along one dimension) covered by SLM pixels starting at ``starts`` and of
+    ``length`` sensor pixels, and which SLM pixel covers each of them. If SLM pixels overlap, the
+    last one is kept.
+    """
+    owner = np.full(n_pixels, -1)
+    pixels = starts[:, np.newaxis] + np.arange(length)
+    slm_idx = np.broadcast_to(np.arange(len(starts))[:, np.newaxis], pixels.shape)
+    valid = (pixels >= 0) & (pixels < n_pixels)
+    np.maximum.at(owner, pixels[valid], slm_idx[valid])
+    idx = np.nonzero(owner >= 0)[0]
+    return idx, owner[idx]
+
+
 def get_programmable_mask(
     vals, sensor, slm_param, rotate=None, flipud=False, nbits=8, color_filter=None, deadspace=True
 ):
@@ -179,56 +194,55 @@ def get_programmable_mask(
     # -- prepare mask
     if use_torch:
         mask = torch.zeros((n_color_filter,) + tuple(sensor.resolution)).to(vals)
-        slm_vals_flat = vals.flatten()
     else:
         mask = np.zeros((n_color_filter,) + tuple(sensor.resolution), dtype=dtype)
-        slm_vals_flat = vals.reshape(-1)
     pixel_pitch = slm_param[SLMParam_wp.PITCH]
     d1 = sensor.pitch
     if deadspace:
 
-        centers = get_centers(n_active_slm_pixels, pixel_pitch=pixel_pitch)
-
+        # SLM pixel centers along each dimension (separable grid)
+        centers_y, centers_x = get_centers(
+            n_active_slm_pixels, pixel_pitch=pixel_pitch, return_mesh=False
+        )
         _height_pixel, _width_pixel = (slm_param[SLMParam_wp.CELL_SIZE] / d1).astype(int)
 
-        for i, _center in enumerate(centers):
+        # sensor rows / columns covered by each SLM row / column
+        center_rows = (centers_y[:, 0] / d1[0] + sensor.resolution[0] / 2).astype(int)
+        center_cols = (centers_x[0] / d1[1] + sensor.resolution[1] / 2).astype(int)
+        rows_top = center_rows - np.floor(_height_pixel / 2).astype(int)
+        cols_left = center_cols + 1 - np.floor(_width_pixel / 2).astype(int)
+        row_idx, row_owner = _covered_pixels(rows_top, _height_pixel, sensor.resolution[0])
+        col_idx, col_owner = _covered_pixels(cols_left, _width_pixel, sensor.resolution[1])
 
-            _center_pixel = (_center / d1 + sensor.resolution / 2).astype(int)
-            _center_top_left_pixel = (
-                _center_pixel[0] - np.floor(_height_pixel / 2).astype(int),
-                _center_pixel[1] + 1 - np.floor(_width_pixel / 2).astype(int),
-            )
-            color_filter_idx = i // n_active_slm_pixels[1] % n_color_filter
-
-            mask_val = slm_vals_flat[i] * color_filter[color_filter_idx][0]
-            if isinstance(mask_val, np.ndarray):
-                mask_val = mask_val[:, np.newaxis, np.newaxis]
-            elif isinstance(mask_val, torch.Tensor):
-                mask_val = mask_val.unsqueeze(-1).unsqueeze(-1)
-            mask[
-                :,
-                _center_top_left_pixel[0] : _center_top_left_pixel[0] + _height_pixel,
-                _center_top_left_pixel[1] : _center_top_left_pixel[1] + _width_pixel,
-            ] = mask_val
+        # value of each SLM pixel, color filter depends on the row
+        cf_idx = np.arange(n_active_slm_pixels[0]) % n_color_filter
+        if use_torch:
+            cf_rows = color_filter[torch.from_numpy(cf_idx).to(vals.device), 0]
+            slm_rgb = vals.unsqueeze(-1) * cf_rows.unsqueeze(1)
+            row_idx = torch.from_numpy(row_idx).to(vals.device)
+            col_idx = torch.from_numpy(col_idx).to(vals.device)
+            row_owner = torch.from_numpy(row_owner).to(vals.device)
+            col_owner = torch.from_numpy(col_owner).to(vals.device)
+            mask_vals = slm_rgb[row_owner][:, col_owner].permute(2, 0, 1)
+        else:
+            cf_rows = np.asarray(color_filter)[cf_idx, 0]
+            slm_rgb = vals[:, :, np.newaxis] * cf_rows[:, np.newaxis]
+            mask_vals = np.moveaxis(slm_rgb[row_owner][:, col_owner], -1, 0)
+        mask[:, row_idx[:, None], col_idx[None, :]] = mask_vals
 
     else:
 
-        # use color filter to turn mask into RGB
+        # use color filter to turn mask into RGB, flipping both dimensions
+        cf_rows = np.arange(n_active_slm_pixels[0]) % color_filter.shape[0]
+        cf_cols = np.arange(n_active_slm_pixels[1]) % color_filter.shape[1]
         if use_torch:
-            active_mask_rgb = torch.zeros((n_color_filter,) + n_active_slm_pixels).to(vals)
+            cf_rows = torch.from_numpy(cf_rows).to(vals.device)
+            cf_cols = torch.from_numpy(cf_cols).to(vals.device)
+            slm_rgb = vals.unsqueeze(-1) * color_filter[cf_rows][:, cf_cols]
+            active_mask_rgb = torch.flip(slm_rgb, dims=(0, 1)).permute(2, 0, 1)
         else:
-            active_mask_rgb = np.zeros((n_color_filter,) + n_active_slm_pixels, dtype=dtype)
-
-        # TODO avoid for loop
-        for i in range(n_active_slm_pixels[0]):
-            row_idx = i % color_filter.shape[0]
-            for j in range(n_active_slm_pixels[1]):
-
-                col_idx = j % color_filter.shape[1]
-                color_filter_idx = color_filter[row_idx, col_idx]
-                active_mask_rgb[
-                    :, n_active_slm_pixels[0] - i - 1, n_active_slm_pixels[1] - j - 1
-                ] = (vals[i, j] * color_filter_idx)
+            slm_rgb = vals[:, :, np.newaxis] * np.asarray(color_filter)[cf_rows][:, cf_cols]
+            active_mask_rgb = np.moveaxis(slm_rgb[::-1, ::-1], -1, 0).astype(dtype)
 
         # size of active pixels in pixels
         n_active_dim = np.around(slm_param[SLMParam_wp.PITCH] * n_active_slm_pixels / d1).astype(
@@ -313,6 +327,41 @@ def full2subpattern(
     return subpattern
 
 
+# cache of spherical wavefronts, see `_get_spherical_wavefront`
+_spherical_wavefronts = OrderedDict()
+max_cached_spherical_wavefronts = 8
+
+
+def _get_spherical_wavefront(sensor, wv, scene2mask, dtype, is_torch, device):
+    """
+    Spherical wavefronts (one per wavelength) from a point source to the mask, which only depend on
+    the sensor sampling and the distance, so they are cached.
+    """
+    key = (
+        tuple(int(n) for n in sensor.resolution),
+        tuple(np.broadcast_to(np.array(sensor.pitch, dtype=float), (2,))),
+        tuple(float(val) for val in np.atleast_1d(wv)),
+        float(scene2mask),
+        str(dtype),
+        str(device) if is_torch else None,
+    )
+    if key not in _spherical_wavefronts:
+        _spherical_wavefronts[key] = spherical_prop(
+            in_shape=sensor.resolution,
+            d1=sensor.pitch,
+            wv=wv,
+            dz=scene2mask,
+            return_psf=True,
+            is_torch=is_torch,
+            device=device,
+            dtype=dtype,
+        )
+        while len(_spherical_wavefronts) > max_cached_spherical_wavefronts:
+            _spherical_wavefronts.popitem(last=False)
+    _spherical_wavefronts.move_to_end(key)
+    return _spherical_wavefronts[key]
+
+
 def get_intensity_psf(
     mask,
     waveprop=False,
@@ -354,15 +403,8 @@ def get_intensity_psf(
         device = mask.device
 
     dtype = mask.dtype
-    ctype, _ = get_ctypes(dtype, is_torch)
-
-    if is_torch:
-        psfs = torch.zeros(mask.shape, dtype=ctype, device=device)
-    else:
-        psfs = np.zeros(mask.shape, dtype=ctype)
 
     if waveprop:
-
         assert sensor is not None, "sensor must be specified"
         assert scene2mask is not None, "scene2mask must be specified"
         assert mask2sensor is not None, "mask2sensor must be specified"
@@ -372,28 +414,20 @@ def get_intensity_psf(
         ), "Number of wavelengths must match number of color channels"
 
         # spherical wavefronts to mask
-        spherical_wavefront = spherical_prop(
-            in_shape=sensor.resolution,
-            d1=sensor.pitch,
-            wv=color_system.wv,
-            dz=scene2mask,
-            return_psf=True,
-            is_torch=is_torch,
-            device=device,
-            dtype=dtype,
+        spherical_wavefront = _get_spherical_wavefront(
+            sensor, color_system.wv, scene2mask, dtype, is_torch, device
         )
         u_in = spherical_wavefront * mask
 
-        # free space propagation to sensor
-        for i, wv in enumerate(color_system.wv):
-            psfs[i], _, _ = angular_spectrum(
-                u_in=u_in[i],
-                wv=wv,
-                d1=sensor.pitch,
-                dz=mask2sensor,
-                dtype=dtype,
-                device=device,
-            )
+        # free space propagation to sensor, all wavelengths at once
+        psfs = angular_spectrum_batch(
+            u_in=u_in,
+            wavelengths=color_system.wv,
+            d1=sensor.pitch,
+            dz=mask2sensor,
+            dtype=dtype,
+            device=device,
+        )
 
     else:
 
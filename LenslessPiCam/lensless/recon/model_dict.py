@@ -8,6 +8,9 @@ and other intermediate files. Models are stored on Hugging Face.
 
 
 import os
+import copy as copy_module
+import hashlib
+import threading
 from lensless.recon.integrated_background_sub import IntegratedBackgroundSub
 import numpy as np
 import torch
@@ -279,6 +282,30 @@ def download_model(camera, dataset, model, local_model_dir=None):
     return model_dir
 
 
+def load_state_dict(checkpoint, device="cpu", mmap=True):
+    """
+    Load state dict of a checkpoint. With ``mmap``, tensors are memory-mapped from the file
+    and only read when needed, e.g. when copied into the model parameters.
+
+    Parameters
+    ----------
+    checkpoint : str
+        Path to checkpoint.
+    device : str
+        Device to load state dict on.
+    mmap : bool
+        Whether to memory-map the checkpoint. Only possible for checkpoints saved with the zipfile
+        serialization of PyTorch (default since 1.6), otherwise the whole file is read.
+    """
+    if mmap:
+        try:
+            return torch.load(checkpoint, map_location=device, mmap=True)
+        except RuntimeError:
+            # legacy serialization format
+            pass
+    return torch.load(checkpoint, map_location=device)
+
+
 def load_model(
     model_path,
     psf,
@@ -290,6 +317,7 @@ def load_model(
     skip_post=False,
     train_last_layer=False,
     return_intermediate=False,
+    mmap=True,
 ):
 
     """
@@ -303,6 +331,8 @@ def load_model(
         PSF tensor.
     device : str
         Device to load model on.
+    mmap : bool
+        Whether to memory-map the checkpoint rather than reading it entirely into memory.
     """
 
     # load Hydra config
@@ -331,7 +361,7 @@ def load_model(
     assert os.path.exists(model_checkpoint), "Checkpoint does not exist"
     if verbose:
         print("Loading checkpoint from : ", model_checkpoint)
-    model_state_dict = torch.load(model_checkpoint, map_location=device)
+    model_state_dict = load_state_dict(model_checkpoint, device, mmap=mmap)
 
     if config["files"].get("psf_snr", None) is not None:
         # overwrite PSF with noisy PSF used during training
@@ -561,3 +591,116 @@ def load_model(
         recon = MyDataParallel(recon, device_ids=device_ids)
     recon.to(device)
     return recon
+
+
+# registry of loaded models, so that switching between models is immediate after the first call
+_model_cache = dict()
+_model_cache_lock = threading.Lock()
+_model_locks = dict()
+
+
+def _model_key(model_path, device, **kwargs):
+    return (
+        os.path.realpath(model_path),
+        str(device),
+        tuple(sorted((k, str(v)) for k, v in kwargs.items() if k != "verbose")),
+    )
+
+
+def _psf_key(psf):
+    # PSF is identified by its shape and content
+    psf_np = psf.detach().cpu().numpy()
+    return tuple(psf_np.shape), hashlib.md5(psf_np.tobytes()).hexdigest()
+
+
+def get_model(model_path, psf, device="cpu", copy=False, **kwargs):
+    """
+    Get a model with :py:func:`~lensless.recon.model_dict.load_model`, and keep it in an in-process registry
+    for subsequent calls with the same path, device and options. One model is kept per path, device and
+    options: if it was loaded with a different PSF, it is loaded again.
+
+    Without ``copy``, the same object is returned for subsequent calls, so it should only be used for
+    reconstruction. Callers that modify the model (e.g. training, or setting another PSF) should request
+    a copy.
+
+    Parameters
+    ----------
+    model_path : str
+        Path to model, e.g. as returned by :py:func:`~lensless.recon.model_dict.download_model`.
+    psf : py:class:`~torch.Tensor`
+        PSF tensor.
+    device : str
+        Device to load model on.
+    copy : bool
+        Whether to return a deep copy of the registered model.
+    **kwargs
+        Additional options for :py:func:`~lensless.recon.model_dict.load_model`.
+    """
+    key = _model_key(model_path, device, **kwargs)
+    psf_key = _psf_key(psf)
+    with _model_cache_lock:
+        # one lock per model, so that different models can be loaded in parallel
+        model_lock = _model_locks.setdefault(key, threading.Lock())
+
+    with model_lock:
+        # may have been loaded by another thread in the meantime
+        if key not in _model_cache or _model_cache[key][1] != psf_key:
+            model = load_model(model_path, psf, device=device, **kwargs)
+            with _model_cache_lock:
+                _model_cache[key] = (model, psf_key)
+        model = _model_cache[key][0]
+        if copy:
+            model = _copy_model(model)
+    return model
+
+
+def _copy_model(model):
+    # tensors derived from the parameters (e.g. in `reset`) are part of the autograd graph, which
+    # cannot be deep copied, so they are copied detached
+    memo = dict()
+    for module in model.modules():
+        for val in vars(module).values():
+            if torch.is_tensor(val) and not val.is_leaf:
+                memo[id(val)] = val.detach().clone()
+    return copy_module.deepcopy(model, memo)
+
+
+def preload_models(model_paths, psf, device="cpu", **kwargs):
+    """
+    Load models into the registry (see :py:func:`~lensless.recon.model_dict.get_model`) in a background thread,
+    e.g. at start-up of a demo, so that models are available when requested.
+
+    Parameters
+    ----------
+    model_paths : list of str
+        Paths to models.
+    psf : py:class:`~torch.Tensor`
+        PSF tensor.
+    device : str
+        Device to load models on.
+    **kwargs
+        Additional options for :py:func:`~lensless.recon.model_dict.load_model`.
+
+    Returns
+    -------
+    :py:class:`threading.Thread`
+        Thread loading the models, can be joined to wait for all models to be loaded.
+    """
+    kwargs.setdefault("verbose", False)
+
+    def _preload():
+        for model_path in model_paths:
+            get_model(model_path, psf, device=device, **kwargs)
+
+    thread = threading.Thread(target=_preload, daemon=True)
+    thread.start()
+    return thread
+
+
+def clear_model_cache():
+    """
+    Remove all models from the registry.
+    """
+    with _model_cache_lock:
+        _model_cache.clear()
+        _model_locks.clear()
@@ -13,6 +13,7 @@ import torch.nn.functional as F
 import numpy as np
 from lensless.recon.utils import convert_to_NCHW, convert_to_NDCHW
 from lensless.recon.rfft_convolve import RealFFTConvolve2D
+from lensless.utils.image import flip_HWC
 
 
 class DoubleConv(nn.Module):
@@ -204,7 +205,13 @@ class MultiWiener(nn.Module):
             self.pre_process_param,
         ) = self._prepare_process_block(pre_process)
 
-    def forward(self, batch, psfs=None, **kwargs):
+    def forward(self, batch, psfs=None, flip_lr=None, flip_ud=None, **kwargs):
+
+        if flip_lr is not None or flip_ud is not None:
+            # random flip augmentation
+            if psfs is None:
+                psfs = self._convolver._psf[None]
+            psfs = flip_HWC(psfs.to(batch.device), flip_lr=flip_lr, flip_ud=flip_ud)
 
         if psfs is None:
             psf = self._psf.to(batch.device)
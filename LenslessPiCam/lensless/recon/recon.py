@@ -163,7 +163,6 @@ corresponding configurations in ``configs``.
 import abc
 import numpy as np
 import pathlib as plib
-import matplotlib.pyplot as plt
 from lensless.utils.plot import plot_image
 from lensless.utils.io import get_dtype
 from lensless.recon.rfft_convolve import RealFFTConvolve2D
@@ -243,6 +242,10 @@ class ReconstructionAlgorithm(abc.ABC):
                 * ``"network"``: model to use as a denoiser.
                 * ``"noise_level"``: noise level of the denoiser.
 
+                Optionally, ``"tile_size"``, ``"tile_overlap"``, ``"tile_window"`` and ``"tile_batch_size"``
+                can be set to apply the denoiser on overlapping tiles (see :py:func:`~lensless.recon.utils.apply_denoiser_tiled`),
+                e.g. to limit memory usage at full sensor resolution.
+
                 If provided, the denoiser will be used as a projection function at each iteration.
                 Defaults to None.
         """
@@ -316,7 +319,14 @@ class ReconstructionAlgorithm(abc.ABC):
             device = self._psf.device
             if denoiser["network"] == "DruNet":
                 denoiser_model = load_drunet(requires_grad=False).to(device)
-                self._denoiser = get_drunet_function_v2(denoiser_model, mode="inference")
+                tiling = {
+                    key: denoiser[key]
+                    for key in ["tile_size", "tile_overlap", "tile_window", "tile_batch_size"]
+                    if key in denoiser.keys()
+                }
+                self._denoiser = get_drunet_function_v2(
+                    denoiser_model, mode="inference", tiling=tiling
+                )
             else:
                 raise NotImplementedError(f"Unsupported denoiser: {denoiser['network']}")
             self._denoiser_noise_level = denoiser["noise_level"]
@@ -560,6 +570,9 @@ class ReconstructionAlgorithm(abc.ABC):
         if n_iter is None:
             n_iter = self._n_iter
 
+        if plot or save:
+            import matplotlib.pyplot as plt
+
         if (plot or save) and disp_iter is not None:
             if ax is None:
                 img = self._form_image()
@@ -11,6 +11,7 @@
 2D convolution in Fourier domain, with same real-valued kernel.
 """
 
+import copy
 import numpy as np
 from scipy import fft
 from scipy.fftpack import next_fast_len
@@ -130,6 +131,31 @@ class RealFFTConvolve2D:
             self._Hadj = np.conj(self._H)
             self._padded_data = np.zeros(self._padded_shape).astype(self.dtype)
 
+    def select(self, idx):
+        """
+        Get convolver for a subset of a batch of PSFs, without recomputing their FFTs.
+        For example, to assign one of several precomputed PSFs to each sample of a batch.
+
+        Parameters
+        ----------
+        idx : :py:class:`~numpy.ndarray` or :py:class:`~torch.Tensor`
+            Indices along the batch dimension of the PSFs.
+
+        Returns
+        -------
+        :py:class:`~lensless.recon.rfft_convolve.RealFFTConvolve2D`
+            Convolver with PSFs of shape (len(idx), depth, height, width, channels).
+        """
+        assert len(self._psf_shape) == 5, "Expected batch of PSFs"
+        convolver = copy.copy(self)
+        convolver._psf = self._psf[idx]
+        convolver._psf_shape = np.array(convolver._psf.shape)
+        convolver._H = self._H[idx]
+        convolver._Hadj = self._Hadj[idx]
+        if not self.is_torch:
+            convolver._padded_data = np.zeros(self._padded_shape).astype(self.dtype)
+        return convolver
+
     def convolve(self, x, return_fft=False):
         """
         Convolve with pre-computed FFT of provided PSF.
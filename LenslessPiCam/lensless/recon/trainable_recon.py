@@ -11,6 +11,7 @@ from matplotlib import pyplot as plt
 from lensless.recon.recon import ReconstructionAlgorithm
 from lensless.utils.plot import plot_image
 from lensless.recon.rfft_convolve import RealFFTConvolve2D
+from lensless.utils.image import flip_HWC
 
 try:
     import torch
@@ -109,6 +110,7 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
         )
 
         self._legacy_denoiser = legacy_denoiser
+        self._process_tiling = None
         self.input_background = False
         if pre_process is not None:
             self.set_pre_process(pre_process)
@@ -147,6 +149,9 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
                 ), "Cannot use direct_background_subtraction and background_network at the same time."
                 self.set_background_network(background_network)
 
+        # convolver with flipped PSFs, for random flip augmentation
+        self._flip_convolver = None
+
         # PSF network
         self.psf_network = None
         self.psf_residual = psf_residual
@@ -203,7 +208,9 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             elif self._legacy_denoiser:
                 process_function = get_drunet_function(process_model, mode="train")
             else:
-                process_function = get_drunet_function_v2(process_model, mode="train")
+                process_function = get_drunet_function_v2(
+                    process_model, mode="train", tiling=self._process_tiling
+                )
         elif process is not None:
             # Otherwise, we assume it is a function.
             assert callable(process), "pre_process must be a callable function"
@@ -254,6 +261,23 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             self.psf_network_param,
         ) = self._prepare_process_block(psf_network)
 
+    def set_process_tiling(self, tiling=None):
+        """
+        Method for applying the DruNet like pre- and post-processors on overlapping tiles, e.g. to limit
+        memory usage at full sensor resolution. Learned noise levels are kept.
+
+        Parameters
+        ----------
+            tiling : dict, optional
+                Parameters for tiled inference (``tile_size``, ``tile_overlap``, ``tile_window``, ``tile_batch_size``),
+                see :py:func:`~lensless.recon.utils.apply_denoiser`. If None, process whole image at once.
+        """
+        self._process_tiling = tiling
+        if self.pre_process_model is not None:
+            self.pre_process, _, _ = self._prepare_process_block(self.pre_process_model)
+        if self.post_process_model is not None:
+            self.post_process, _, _ = self._prepare_process_block(self.post_process_model)
+
     def freeze_pre_process(self):
         """
         Method for freezing the pre process block.
@@ -294,7 +318,30 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             for param in self.post_process_model.parameters():
                 param.requires_grad = True
 
-    def forward(self, batch, psfs=None, background=None):
+    def _set_psf(self, psf):
+        super()._set_psf(psf)
+        self._flip_convolver = None
+
+    def _get_flip_convolver(self, device):
+        """
+        Convolver for the four flipped versions of the PSF, such that their FFTs are only
+        computed once for random flip augmentation. Index 0 is the original PSF, 1 is flipped
+        left-right, 2 is flipped up-down, and 3 is flipped in both directions.
+        """
+        if self._flip_convolver is None or self._flip_convolver._H.device != device:
+            psf = self._psf.to(device)
+            psfs = torch.stack(
+                [
+                    psf,
+                    torch.flip(psf, dims=(-2,)),
+                    torch.flip(psf, dims=(-3,)),
+                    torch.flip(psf, dims=(-3, -2)),
+                ]
+            )
+            self._flip_convolver = RealFFTConvolve2D(psfs, **self._convolver_param)
+        return self._flip_convolver
+
+    def forward(self, batch, psfs=None, background=None, flip_lr=None, flip_ud=None):
         """
         Method for performing iterative reconstruction on a batch of images.
         This implementation is a properly vectorized implementation of FISTA.
@@ -305,6 +352,14 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             The lensless images to reconstruct.
         psfs : :py:class:`~torch.Tensor` of shape (batch, depth, channels, height, width)
             The lensless images to reconstruct.
+        background : :py:class:`~torch.Tensor`, optional
+            Background measurements, for background subtraction.
+        flip_lr : :py:class:`~torch.Tensor`, optional
+            Per-sample flags of random flip augmentation (left-right), such that the PSF is
+            flipped accordingly. If ``psfs`` is not provided, the FFTs of the flipped versions
+            of the PSF are precomputed, instead of being computed for each sample.
+        flip_ud : :py:class:`~torch.Tensor`, optional
+            Per-sample flags of random flip augmentation (up-down).
 
         Returns
         -------
@@ -335,9 +390,14 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             self._data = torch.clamp(self._data, 0, 1)
 
         # set / transform PSFs if need be
+        flip = flip_lr is not None or flip_ud is not None
+        if psfs is not None and flip:
+            psfs = flip_HWC(psfs, flip_lr=flip_lr, flip_ud=flip_ud)
         if self.psf_network is not None:
             if psfs is None:
                 psfs = self._psf.to(self._data.device)
+                if flip:
+                    psfs = flip_HWC(psfs[None], flip_lr=flip_lr, flip_ud=flip_ud)
             if self.psf_residual:
                 psfs = self.psf_network(psfs, self.psf_network_param).to(psfs.device) + psfs
             else:
@@ -348,6 +408,15 @@ class TrainableReconstructionAlgorithm(ReconstructionAlgorithm, torch.nn.Module)
             assert psfs.shape[-3:] == batch.shape[-3:], "psfs must have the same shape as batch"
             # -- update convolver
             self._convolver = RealFFTConvolve2D(psfs.to(self._data.device), **self._convolver_param)
+        elif flip:
+            # -- select among precomputed flipped PSFs
+            idx = torch.zeros(batch_size, dtype=torch.long)
+            if flip_lr is not None:
+                idx += torch.as_tensor(flip_lr).reshape(-1).long().cpu()
+            if flip_ud is not None:
+                idx += 2 * torch.as_tensor(flip_ud).reshape(-1).long().cpu()
+            flip_convolver = self._get_flip_convolver(self._data.device)
+            self._convolver = flip_convolver.select(idx.to(self._data.device))
         elif self._data.device != self._convolver._H.device:
             # needed for multi-GPU... TODO better solution?
             self._convolver = RealFFTConvolve2D(
@@ -6,7 +6,7 @@
 # Eric BEZZAM [ebezzam@gmail.com]
 # #############################################################################
 
-import wandb
+import copy
 import json
 import math
 import numpy as np
@@ -14,6 +14,7 @@ import matplotlib.pyplot as plt
 import time
 import os
 import gc
+import warnings
 import torch
 from torch import nn
 from lensless.eval.benchmark import benchmark
@@ -23,8 +24,8 @@ from lensless.recon.drunet.network_unet import UNetRes
 from lensless.recon.restormer import Restormer
 from lensless.utils.io import save_image
 from lensless.utils.plot import plot_image
-from lensless.utils.dataset import SimulatedDatasetTrainableMask
-from lensless.utils.image import rotate_HWC
+from lensless.utils.dataset import SimulatedDatasetTrainableMask, create_dataloader
+from lensless.utils.image import flip_HWC, rotate_HWC
 
 
 def double_cnn_max_pool(c_in, c_out, cnn_kernel=3, max_pool=2, padding=1, skip_last_relu=False):
@@ -245,12 +246,24 @@ def load_drunet(model_path=None, n_channels=3, requires_grad=False):
 
 
 def apply_denoiser(
-    model, image, noise_level=10, mode="inference", compensation_output=None, background=None
+    model,
+    image,
+    noise_level=10,
+    mode="inference",
+    compensation_output=None,
+    background=None,
+    tile_size=None,
+    tile_overlap=32,
+    tile_window="hann",
+    tile_batch_size=4,
 ):
     """
     Apply a pre-trained denoising model with input in the format Channel, Height, Width.
     An additionnal channel is added for the noise level as done in Drunet.
 
+    If ``tile_size`` is provided, the image is processed in overlapping tiles that are blended together,
+    see :py:func:`~lensless.recon.utils.apply_denoiser_tiled`.
+
     Parameters
     ----------
     model : :py:class:`torch.nn.Module`
@@ -265,12 +278,34 @@ def apply_denoiser(
         Device to use for computation. Can be "cpu" or "cuda".
     mode : str
         Mode to use for model. Can be "inference" or "train".
+    tile_size : int or tuple, optional
+        Size (height, width) of tiles for tiled inference. Default is to process the whole image at once.
+    tile_overlap : int, optional
+        Overlap between neighboring tiles (in pixels), by default 32.
+    tile_window : str, optional
+        Blending window in the overlap regions: "hann", "linear", or "constant" (average). By default "hann".
+    tile_batch_size : int, optional
+        Number of tiles to pass through the model at once, by default 4.
 
     Returns
     -------
     image : :py:class:`torch.Tensor`
         Reconstructed image.
     """
+    if tile_size is not None:
+        return apply_denoiser_tiled(
+            model,
+            image,
+            tile_size=tile_size,
+            overlap=tile_overlap,
+            window=tile_window,
+            batch_size=tile_batch_size,
+            noise_level=noise_level,
+            mode=mode,
+            compensation_output=compensation_output,
+            background=background,
+        )
+
     assert noise_level > 0
     assert noise_level <= 255
 
@@ -335,6 +370,144 @@ def apply_denoiser(
     return image
 
 
+def _tile_starts(length, tile, overlap):
+    # start indices of tiles along one axis, last tile is aligned with the end
+    if tile >= length:
+        return [0]
+    stride = tile - overlap
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def _blending_window(length, overlap, window, taper_start, taper_end, device, dtype):
+    # 1D weights that taper within the overlap on sides shared with another tile
+    weights = torch.ones(length, device=device, dtype=dtype)
+    if overlap == 0 or window == "constant":
+        return weights
+    # strictly positive ramp, so that normalization is always defined
+    t = torch.arange(1, overlap + 1, device=device, dtype=dtype) / (overlap + 1)
+    if window == "hann":
+        ramp = 0.5 - 0.5 * torch.cos(math.pi * t)
+    elif window == "linear":
+        ramp = t
+    else:
+        raise ValueError(f"Unsupported blending window: {window}")
+    if taper_start:
+        weights[:overlap] = ramp
+    if taper_end:
+        weights[-overlap:] = torch.minimum(weights[-overlap:], ramp.flip(0))
+    return weights
+
+
+def apply_denoiser_tiled(
+    model,
+    image,
+    tile_size,
+    overlap=32,
+    window="hann",
+    batch_size=4,
+    noise_level=10,
+    mode="inference",
+    compensation_output=None,
+    background=None,
+):
+    """
+    Apply a denoising model (see :py:func:`~lensless.recon.utils.apply_denoiser`) on overlapping tiles
+    of the image, and blend the outputs with a window that tapers within the overlap regions.
+    This limits memory usage for large images (e.g. full resolution of the Raspberry Pi HQ sensor),
+    while being close to processing the whole image at once if the overlap is large with
+    respect to the receptive field of the model.
+
+    Parameters
+    ----------
+    model : :py:class:`torch.nn.Module`
+        Drunet compatible model.
+    image : :py:class:`torch.Tensor`
+        Input image, in the format (batch, depth, height, width, channels).
+    tile_size : int or tuple
+        Size (height, width) of the tiles. Preferably a multiple of 8 to avoid padding each tile.
+    overlap : int, optional
+        Overlap between neighboring tiles (in pixels), by default 32.
+    window : str, optional
+        Blending window in the overlap regions: "hann", "linear", or "constant" (average). By default "hann".
+    batch_size : int, optional
+        Number of tiles to pass through the model at once, by default 4.
+    noise_level : float or :py:class:`torch.Tensor`
+        Noise level in the image within [0, 255].
+    mode : str
+        Mode to use for model. Can be "inference" or "train".
+    background : :py:class:`torch.Tensor`, optional
+        If provided, use background as noise channel instead of noise level.
+
+    Returns
+    -------
+    image : :py:class:`torch.Tensor`
+        Reconstructed image.
+    """
+    assert compensation_output is None, "Compensation branch not supported for tiled inference."
+    if isinstance(tile_size, int):
+        tile_size = (tile_size, tile_size)
+    height, width = image.shape[-3:-1]
+    tile_h = min(tile_size[0], height)
+    tile_w = min(tile_size[1], width)
+    assert 0 <= overlap < min(tile_h, tile_w), "Overlap must be smaller than tile size."
+
+    # tile positions and blending weights
+    starts_h = _tile_starts(height, tile_h, overlap)
+    starts_w = _tile_starts(width, tile_w, overlap)
+    tiles = []
+    for i, y in enumerate(starts_h):
+        weight_h = _blending_window(
+            tile_h, overlap, window, i > 0, i < len(starts_h) - 1, image.device, image.dtype
+        )
+        for j, x in enumerate(starts_w):
+            weight_w = _blending_window(
+                tile_w, overlap, window, j > 0, j < len(starts_w) - 1, image.device, image.dtype
+            )
+            tiles.append((y, x, weight_h[:, None] * weight_w[None, :]))
+
+    output = None
+    weight_sum = torch.zeros(height, width, device=image.device, dtype=image.dtype)
+    n_batch = image.shape[0]
+    for k in range(0, len(tiles), batch_size):
+        batch_tiles = tiles[k : k + batch_size]
+
+        # stack tiles along batch dimension
+        image_tiles = torch.cat(
+            [image[..., y : y + tile_h, x : x + tile_w, :] for y, x, _ in batch_tiles], dim=0
+        )
+        background_tiles = None
+        if background is not None:
+            background_tiles = torch.cat(
+                [background[..., y : y + tile_h, x : x + tile_w, :] for y, x, _ in batch_tiles],
+                dim=0,
+            )
+        out_tiles = apply_denoiser(
+            model,
+            image_tiles,
+            noise_level=noise_level,
+            mode=mode,
+            background=background_tiles,
+        )
+
+        # blend
+        if output is None:
+            output = torch.zeros(
+                (n_batch, out_tiles.shape[1], height, width, out_tiles.shape[-1]),
+                device=out_tiles.device,
+                dtype=out_tiles.dtype,
+            )
+        for t, (y, x, weight) in enumerate(batch_tiles):
+            out_tile = out_tiles[t * n_batch : (t + 1) * n_batch]
+            output[..., y : y + tile_h, x : x + tile_w, :] = (
+                output[..., y : y + tile_h, x : x + tile_w, :] + out_tile * weight[:, :, None]
+            )
+            weight_sum[y : y + tile_h, x : x + tile_w] += weight
+
+    return output / weight_sum[:, :, None]
+
+
 def get_drunet_function(model, mode="inference"):
     """
     Return a processing function that applies the DruNet model to an image.
@@ -366,7 +539,7 @@ def get_drunet_function(model, mode="inference"):
     return process
 
 
-def get_drunet_function_v2(model, mode="inference"):
+def get_drunet_function_v2(model, mode="inference", tiling=None):
     """
     Return a processing function that applies the DruNet model to an image.
 
@@ -376,7 +549,12 @@ def get_drunet_function_v2(model, mode="inference"):
         DruNet like denoiser model
     mode : str
         Mode to use for model. Can be "inference" or "train".
+    tiling : dict, optional
+        Parameters for tiled inference, i.e. ``tile_size``, ``tile_overlap``, ``tile_window`` and ``tile_batch_size``
+        of :py:func:`~lensless.recon.utils.apply_denoiser`. Default is to process the whole image at once.
     """
+    if tiling is None:
+        tiling = dict()
 
     def process(image, noise_level=10, compensation_output=None, background=None):
         x_max = torch.amax(image, dim=(-1, -2, -3, -4), keepdim=True) + 1e-6
@@ -387,6 +565,7 @@ def get_drunet_function_v2(model, mode="inference"):
             mode=mode,
             compensation_output=compensation_output,
             background=background,
+            **tiling,
         )
         image = torch.clip(image, min=0.0) * x_max.to(image.device)
         return image
@@ -528,6 +707,242 @@ def create_process_network(
     return (process, process_name)
 
 
+class QuantizedProcess(nn.Module):
+    """
+    Wrapper around an int8 quantized DruNet / UnetRes network, such that it can be used as a
+    pre- or post-processor (same call signature as :py:class:`~lensless.recon.drunet.network_unet.UNetRes`).
+    Quantized networks only run on CPU.
+    """
+
+    def __init__(self, model, input_background=False):
+        super(QuantizedProcess, self).__init__()
+        self.model = model
+        self.input_background = input_background
+
+    def forward(self, x, compensation_output=None, background=None):
+        assert compensation_output is None, "Compensation branch not supported for quantized model."
+        assert background is None, "Background subtraction not supported for quantized model."
+        device = x.device
+        return self.model(x.cpu()).to(device)
+
+
+class _SingleInput(nn.Module):
+    # only the image is passed to the network, so that it can be traced for quantization
+    def __init__(self, model):
+        super(_SingleInput, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x)
+
+
+def quantize_process_network(process, calibration_data, backend="fbgemm"):
+    """
+    Post-training static quantization (int8 weights and activations) of a DruNet / UnetRes network
+    created with :py:func:`~lensless.recon.utils.create_process_network`. Transposed convolutions
+    are kept in float, except with the "qnnpack" backend.
+
+    Parameters
+    ----------
+    process : :py:class:`torch.nn.Module`
+        Network to quantize. It is not modified.
+    calibration_data : list of :py:class:`torch.Tensor`
+        Network inputs (NCHW, including noise level / background channels) to calibrate the range
+        of the activations, e.g. recorded with :py:func:`~lensless.recon.utils.quantize_recon_process`.
+    backend : str, optional
+        Quantization backend: "fbgemm" (x86) or "qnnpack" (ARM, e.g. Raspberry Pi). Defaults to "fbgemm".
+
+    Returns
+    -------
+    :py:class:`~lensless.recon.utils.QuantizedProcess`
+        Quantized network.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    assert backend in torch.backends.quantized.supported_engines, (
+        f"Quantization backend {backend} not supported, "
+        f"available backends are {torch.backends.quantized.supported_engines}"
+    )
+    assert len(calibration_data) > 0, "At least one calibration sample is needed."
+
+    if isinstance(process, torch.nn.DataParallel):
+        process = process.module
+    assert not getattr(
+        process, "concatenate_compensation", False
+    ), "Quantization of networks with compensation branch not supported."
+    assert not getattr(
+        process, "background_subtraction", False
+    ), "Quantization of networks with background subtraction not supported."
+    input_background = getattr(process, "input_background", False)
+
+    # global setting, restored afterwards
+    original_engine = torch.backends.quantized.engine
+    torch.backends.quantized.engine = backend
+    try:
+        qconfig_mapping = get_default_qconfig_mapping(backend)
+        if backend != "qnnpack":
+            # quantized transposed convolutions (upsampling) are inaccurate with the x86 backends,
+            # so they are kept in float
+            qconfig_mapping.set_object_type(torch.nn.ConvTranspose2d, None)
+        model = _SingleInput(copy.deepcopy(process).cpu().eval())
+        with torch.no_grad():
+            model = prepare_fx(
+                model,
+                qconfig_mapping,
+                example_inputs=(calibration_data[0].cpu(),),
+            )
+            for x in calibration_data:
+                model(x.cpu())
+        model = convert_fx(model)
+    finally:
+        torch.backends.quantized.engine = original_engine
+
+    return QuantizedProcess(model, input_background=input_background)
+
+
+def quantize_recon_process(
+    recon, dataset, n_calibration=8, backend="fbgemm", pre_process=True, post_process=True
+):
+    """
+    Quantize the pre- and/or post-processor of a trainable reconstruction algorithm, e.g. ``Unet4M+U5+Unet4M``.
+    The inputs of the processors are recorded over a few samples of the dataset for calibration.
+    The reconstruction algorithm is modified in place, and should be on CPU.
+
+    Parameters
+    ----------
+    recon : :py:class:`~lensless.recon.trainable_recon.TrainableReconstructionAlgorithm`
+        Reconstruction algorithm.
+    dataset : :py:class:`torch.utils.data.Dataset`
+        Dataset from which to take calibration samples, e.g. :py:class:`~lensless.utils.dataset.HFDataset`.
+    n_calibration : int, optional
+        Number of samples for calibration. Defaults to 8.
+    backend : str, optional
+        Quantization backend: "fbgemm" (x86) or "qnnpack" (ARM). Defaults to "fbgemm".
+    pre_process : bool, optional
+        Whether to quantize the pre-processor. Defaults to True.
+    post_process : bool, optional
+        Whether to quantize the post-processor. Defaults to True.
+
+    Returns
+    -------
+    :py:class:`~lensless.recon.trainable_recon.TrainableReconstructionAlgorithm`
+        Reconstruction algorithm with quantized processor(s).
+    """
+
+    to_quantize = []
+    if pre_process and recon.pre_process_model is not None:
+        to_quantize.append("pre_process")
+    if post_process and recon.post_process_model is not None:
+        to_quantize.append("post_process")
+    if len(to_quantize) == 0:
+        return recon
+
+    # record network inputs
+    calibration_data = {name: [] for name in to_quantize}
+
+    def record(name):
+        def hook(module, args):
+            calibration_data[name].append(args[0].detach().cpu())
+
+        return hook
+
+    handles = [
+        getattr(recon, name + "_model").register_forward_pre_hook(record(name))
+        for name in to_quantize
+    ]
+    device = recon._psf.device
+    recon.eval()
+    n_calibration = min(n_calibration, len(dataset))
+    with torch.no_grad():
+        for i in range(n_calibration):
+            batch = dataset[i]
+            lensless = batch[0].unsqueeze(0).to(device)
+            psfs = None
+            background = None
+            if getattr(dataset, "measured_bg", False):
+                background = batch[-1].unsqueeze(0).to(device)
+            flip_lr = None
+            flip_ud = None
+            multimask = getattr(dataset, "multimask", False)
+            if multimask:
+                psfs = batch[2].unsqueeze(0).to(device)
+            if getattr(dataset, "random_flip", False):
+                flip_lr = batch[3 if multimask else 2]
+                flip_ud = batch[4 if multimask else 3]
+            recon.forward(
+                batch=lensless, psfs=psfs, background=background, flip_lr=flip_lr, flip_ud=flip_ud
+            )
+    for handle in handles:
+        handle.remove()
+
+    # quantize, keeping learned noise level parameter
+    for name in to_quantize:
+        model_q = quantize_process_network(
+            getattr(recon, name + "_model"), calibration_data[name], backend=backend
+        )
+        process_function, process_model, _ = recon._prepare_process_block(model_q)
+        setattr(recon, name, process_function)
+        setattr(recon, name + "_model", process_model)
+
+    return recon
+
+
+def benchmark_quantization(recon, dataset, calibration_dataset=None, n_calibration=8, **kwargs):
+    """
+    Compare metrics and runtime of a trainable reconstruction algorithm before and after
+    quantization of its pre- and post-processors (see :py:func:`~lensless.recon.utils.quantize_recon_process`).
+
+    Parameters
+    ----------
+    recon : :py:class:`~lensless.recon.trainable_recon.TrainableReconstructionAlgorithm`
+        Reconstruction algorithm (on CPU). Its original processors are restored at the end.
+    dataset : :py:class:`torch.utils.data.Dataset`
+        Dataset for evaluation with :py:func:`~lensless.eval.benchmark.benchmark`.
+    calibration_dataset : :py:class:`torch.utils.data.Dataset`, optional
+        Dataset for calibration. Defaults to ``dataset``, but should preferably be a training set.
+    n_calibration : int, optional
+        Number of samples for calibration. Defaults to 8.
+    **kwargs
+        Additional arguments for :py:func:`~lensless.recon.utils.quantize_recon_process` (``backend``,
+        ``pre_process``, ``post_process``) and :py:func:`~lensless.eval.benchmark.benchmark`.
+
+    Returns
+    -------
+    dict
+        Metrics (and runtime in seconds under "time") for the original ("float32") and quantized ("int8") models.
+    """
+    if calibration_dataset is None:
+        calibration_dataset = dataset
+    quantize_kwargs = {
+        key: kwargs.pop(key) for key in ["backend", "pre_process", "post_process"] if key in kwargs
+    }
+    recon.eval()
+
+    results = dict()
+    start_time = time.time()
+    results["float32"] = benchmark(recon, dataset, **kwargs)
+    results["float32"]["time"] = time.time() - start_time
+
+    # quantize in place and restore original processors afterwards
+    original = {
+        name: getattr(recon, name)
+        for name in ["pre_process", "pre_process_model", "post_process", "post_process_model"]
+    }
+    try:
+        quantize_recon_process(
+            recon, calibration_dataset, n_calibration=n_calibration, **quantize_kwargs
+        )
+        start_time = time.time()
+        results["int8"] = benchmark(recon, dataset, **kwargs)
+        results["int8"]["time"] = time.time() - start_time
+    finally:
+        for name, value in original.items():
+            setattr(recon, name, value)
+
+    return results
+
+
 class Trainer:
     def __init__(
         self,
@@ -566,6 +981,9 @@ class Trainer:
         post_process_freeze=None,
         post_process_unfreeze=None,
         n_epoch=None,
+        num_workers=0,
+        persistent_workers=False,
+        prefetch_factor=None,
     ):
         """
         Class to train a reconstruction algorithm. Inspired by Trainer from `HuggingFace <https://huggingface.co/docs/transformers/main_classes/trainer>`__.
@@ -632,6 +1050,13 @@ class Trainer:
             Epoch at which to freeze post process component. Default is None.
         post_process_unfreeze : int, optional
             Epoch at which to unfreeze post process component. Default is None.
+        num_workers : int, optional
+            Number of DataLoader worker processes for loading (and simulating) data. Default is 0, i.e. in the main process.
+            Must be 0 when simulating with a trainable mask.
+        persistent_workers : bool, optional
+            Whether to keep DataLoader workers alive between epochs. Default is False.
+        prefetch_factor : int, optional
+            Number of batches loaded in advance by each worker. Default is None (PyTorch default).
 
         """
         # global print
@@ -674,13 +1099,24 @@ class Trainer:
             self.print(f"Train size : {train_size}, Test size : {test_size}")
 
         self.train_dataset = train_dataset
-        self.train_dataloader = torch.utils.data.DataLoader(
-            dataset=train_dataset,
+        self.test_dataset = test_dataset
+        datasets = [train_dataset, test_dataset]
+        datasets += [d.dataset for d in datasets if isinstance(d, torch.utils.data.Subset)]
+        if num_workers > 0 and any(isinstance(d, SimulatedDatasetTrainableMask) for d in datasets):
+            # simulation should remain in the computational graph of the mask
+            warnings.warn("Data is simulated with trainable mask, setting num_workers=0.")
+            num_workers = 0
+        self.num_workers = num_workers
+        self.prefetch_factor = prefetch_factor
+        self.train_dataloader = create_dataloader(
+            train_dataset,
             batch_size=batch_size,
             shuffle=True,
             pin_memory=(self.device != "cpu"),
+            num_workers=num_workers,
+            persistent_workers=persistent_workers,
+            prefetch_factor=prefetch_factor,
         )
-        self.test_dataset = test_dataset
         self.extra_eval_sets = extra_eval_sets  # additional datasets to evaluate on
         self.lpips = lpips
         self.skip_NAN = skip_NAN
@@ -688,7 +1124,7 @@ class Trainer:
         self.train_multimask = False
         if hasattr(train_dataset, "multimask"):
             self.train_multimask = train_dataset.multimask
-        self.train_random_flip = train_dataset.random_flip
+        self.train_random_flip = getattr(train_dataset, "random_flip", False)
         self.random_rotate = random_rotate
         self.random_shift = random_shift
         if hasattr(train_dataset, "measured_bg"):
@@ -729,6 +1165,8 @@ class Trainer:
                     ax.axis("off")
 
                 if self.use_wandb and save_every is not None:
+                    import wandb
+
                     log_key = f"psf_{i}" if n_psf > 1 else "psf"
                     wandb.log({log_key: wandb.Image(fp)}, step=0)
 
@@ -972,19 +1410,30 @@ class Trainer:
             y = batch[1].to(self.device)
             if self.background:
                 background = batch[-1].to(self.device)
-            if self.train_random_flip or self.train_multimask:
+            if self.train_multimask:
                 psfs = batch[2].to(self.device)
             else:
                 psfs = None
             if self.train_random_flip:
-                flip_lr = batch[3]
-                flip_ud = batch[4]
+                # PSFs are flipped by reconstruction according to flags
+                flip_lr = batch[3 if self.train_multimask else 2]
+                flip_ud = batch[4 if self.train_multimask else 3]
+
+            psf_flip_lr = flip_lr
+            psf_flip_ud = flip_ud
 
             random_rotate = False
             if self.random_rotate:
                 random_rotate = np.random.uniform(-self.random_rotate, self.random_rotate)
                 X = rotate_HWC(X, random_rotate)
                 y = rotate_HWC(y, random_rotate)
+                if self.train_random_flip:
+                    # PSFs have to be flipped before rotating, as the data
+                    if psfs is None:
+                        psfs = self.recon._psf[None].to(self.device)
+                    psfs = flip_HWC(psfs, flip_lr=flip_lr, flip_ud=flip_ud)
+                    psf_flip_lr = None
+                    psf_flip_ud = None
                 if psfs is None:
                     psf_single = self.recon._psf
                     psf_single = rotate_HWC(psf_single, random_rotate)
@@ -998,7 +1447,13 @@ class Trainer:
 
             # forward pass
             # torch.autograd.set_detect_anomaly(True)    # for debugging
-            y_pred = self.recon.forward(batch=X, psfs=psfs, background=background)
+            y_pred = self.recon.forward(
+                batch=X,
+                psfs=psfs,
+                background=background,
+                flip_lr=psf_flip_lr,
+                flip_ud=psf_flip_ud,
+            )
             if self.unrolled_output_factor or self.pre_proc_aux:
                 y_pred, camera_inv_out, pre_proc_out = y_pred[0], y_pred[1], y_pred[2]
 
@@ -1221,11 +1676,15 @@ class Trainer:
             pre_process_aux=self.pre_proc_aux,
             use_wandb=self.use_wandb,
             epoch=epoch,
+            num_workers=self.num_workers,
+            prefetch_factor=self.prefetch_factor,
         )
 
         # update metrics with current metrics
         self.metrics["LOSS"].append(mean_loss)
         if self.use_wandb:
+            import wandb
+
             wandb.log({"LOSS": mean_loss}, step=epoch)
         for key in current_metrics:
             self.metrics[key].append(current_metrics[key])
@@ -1252,6 +1711,8 @@ class Trainer:
 
         self.metrics["LOSS_TEST"].append(eval_loss)
         if self.use_wandb:
+            import wandb
+
             wandb.log({"LOSS_TEST": eval_loss}, step=epoch)
 
         # add extra evaluation sets
@@ -1285,6 +1746,8 @@ class Trainer:
                     use_wandb=self.use_wandb,
                     label=eval_set,
                     epoch=epoch,
+                    num_workers=self.num_workers,
+                    prefetch_factor=self.prefetch_factor,
                 )
 
                 # add metrics to dictionary
@@ -1302,6 +1765,8 @@ class Trainer:
 
         # log metrics to wandb
         if self.use_wandb:
+            import wandb
+
             wandb.log(current_metrics, step=epoch)
             if self.extra_eval_sets is not None:
                 wandb.log(extra_metrics_epoch, step=epoch)
@@ -1455,6 +1920,8 @@ class Trainer:
                     ax.axis("off")
 
                 if self.use_wandb and epoch != "BEST":
+                    import wandb
+
                     log_key = f"psf_{i}" if n_psf > 1 else "psf"
                     wandb.log({log_key: wandb.Image(fp)}, step=epoch)
 
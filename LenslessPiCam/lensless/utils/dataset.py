@@ -12,7 +12,7 @@ import glob
 import os
 import torch
 from abc import abstractmethod
-from torch.utils.data import Dataset, Subset
+from torch.utils.data import Dataset, IterableDataset, Subset, default_collate
 from torchvision import datasets, transforms
 from torchvision.transforms import functional as F
 from lensless.hardware.trainable_mask import prep_trainable_mask, AdafruitLCD
@@ -23,7 +23,7 @@ import re
 from lensless.hardware.utils import capture
 from lensless.hardware.utils import display
 from lensless.hardware.slm import set_programmable_mask, adafruit_sub2full
-from datasets import load_dataset
+from datasets import load_dataset, Dataset as ArrowDataset
 from lensless.recon.rfft_convolve import RealFFTConvolve2D
 from huggingface_hub import hf_hub_download
 import cv2
@@ -32,6 +32,9 @@ from scipy.ndimage import rotate
 import warnings
 from waveprop.noise import add_shot_noise
 from lensless.utils.image import shift_with_pad
+import hashlib
+import json
+from tqdm import tqdm
 
 
 def convert(text):
@@ -203,6 +206,106 @@ def get_dataset(dataset_name, split, **kwargs):
     return HFDataset(split=split, **dataset_config)
 
 
+def get_collate_fn(dataset):
+    """
+    Get collate function to pass to the DataLoader of a dataset, i.e. the one of
+    :py:class:`~lensless.utils.dataset.SimulatedFarFieldDataset` with ``batch_simulation``.
+
+    Parameters
+    ----------
+    dataset : :py:class:`~torch.utils.data.Dataset`
+        Dataset, possibly wrapped in (nested) :py:class:`~torch.utils.data.Subset`.
+
+    Returns
+    -------
+    callable or None
+        Collate function, or ``None`` for the default one.
+    """
+    while isinstance(dataset, Subset):
+        dataset = dataset.dataset
+    if getattr(dataset, "batch_simulation", False):
+        return dataset.collate_fn
+    return None
+
+
+def worker_init_fn(worker_id):
+    """
+    Initialize a DataLoader worker process.
+
+    NumPy, which is used for random simulation parameters and noise, is seeded from the seed of
+    the worker, such that workers do not draw the same values (older versions of PyTorch only seed
+    their own random number generator). Each worker uses a single thread, as parallelism comes
+    from the workers.
+
+    Parameters
+    ----------
+    worker_id : int
+        Worker index.
+    """
+    worker_info = torch.utils.data.get_worker_info()
+    np.random.seed(worker_info.seed % 2**32)
+    torch.set_num_threads(1)
+
+
+def create_dataloader(
+    dataset,
+    batch_size,
+    shuffle=False,
+    pin_memory=False,
+    num_workers=0,
+    persistent_workers=False,
+    prefetch_factor=None,
+):
+    """
+    Create DataLoader for a dataset, with the appropriate collate function
+    (see :py:func:`~lensless.utils.dataset.get_collate_fn`) and worker initialization
+    (see :py:func:`~lensless.utils.dataset.worker_init_fn`).
+
+    Parameters
+    ----------
+    dataset : :py:class:`~torch.utils.data.Dataset`
+        Dataset to load.
+    batch_size : int
+        Batch size.
+    shuffle : bool, optional
+        Whether to shuffle the dataset, by default ``False``. Ignored for an :py:class:`~torch.utils.data.IterableDataset`.
+    pin_memory : bool, optional
+        Whether to use pinned memory, by default ``False``.
+    num_workers : int, optional
+        Number of worker processes for loading (and simulating) data, by default 0 (main process).
+    persistent_workers : bool, optional
+        Whether to keep workers alive between epochs (e.g. to keep opened files and caches), by default ``False``.
+    prefetch_factor : int, optional
+        Number of batches loaded in advance by each worker, by default ``None`` (PyTorch default).
+
+    Returns
+    -------
+    :py:class:`~torch.utils.data.DataLoader`
+        DataLoader.
+    """
+    if isinstance(dataset, IterableDataset):
+        # shuffled by the dataset itself, e.g. HFStreamingDataset
+        shuffle = False
+    kwargs = dict()
+    if num_workers > 0:
+        kwargs["worker_init_fn"] = worker_init_fn
+        kwargs["persistent_workers"] = persistent_workers
+        if prefetch_factor is not None:
+            kwargs["prefetch_factor"] = prefetch_factor
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            # CUDA cannot be used in forked processes, e.g. for simulation on GPU
+            kwargs["multiprocessing_context"] = "spawn"
+    return torch.utils.data.DataLoader(
+        dataset=dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        pin_memory=pin_memory,
+        num_workers=num_workers,
+        collate_fn=get_collate_fn(dataset),
+        **kwargs,
+    )
+
+
 class DualDataset(Dataset):
     """
     Abstract class for defining a dataset of paired lensed and lensless images.
@@ -315,6 +418,13 @@ class DualDataset(Dataset):
             # In this case it should also have applied the downsampling
             pass
 
+        return self._process_pair(lensless, lensed)
+
+    def _process_pair(self, lensless, lensed):
+        """
+        Apply background subtraction, noise, flips and transforms to a pair of images (as tensors).
+        """
+
         # If [H, W, C] -> [D, H, W, C]
         if len(lensless.shape) == 3:
             lensless = lensless.unsqueeze(0)
@@ -365,6 +475,7 @@ class SimulatedFarFieldDataset(DualDataset):
         horizontal_shift=None,
         crop=None,
         downsample=1,
+        batch_simulation=False,
         **kwargs,
     ):
         """
@@ -381,6 +492,10 @@ class SimulatedFarFieldDataset(DualDataset):
             If True, the input dataset is expected to output images with shape [C, H, W], by default ``False``.
         flip : bool, optional
             If True, images are flipped beffore the simulation, by default ``False``.
+        batch_simulation : bool, optional
+            If True, indexing the dataset only returns images at the object plane, and the simulation is done for the whole batch
+            in :py:func:`~lensless.utils.dataset.SimulatedFarFieldDataset.collate_fn`, which should be passed to the DataLoader
+            (see :py:func:`~lensless.utils.dataset.get_collate_fn`). By default ``False``.
         """
 
         # we do the flipping before the simualtion
@@ -392,6 +507,7 @@ class SimulatedFarFieldDataset(DualDataset):
         self.dataset_is_CHW = dataset_is_CHW
         self._pre_transform = pre_transform
         self.flip_pre_sim = flip
+        self.batch_simulation = batch_simulation
 
         self.vertical_shift = vertical_shift
         self.horizontal_shift = horizontal_shift
@@ -421,7 +537,7 @@ class SimulatedFarFieldDataset(DualDataset):
     def get_image(self, index):
         return self.dataset[index]
 
-    def _get_images_pair(self, index):
+    def _load_object(self, index):
         # load image
         img, _ = self.get_image(index)
         # convert to HWC for simulator and transform
@@ -431,22 +547,63 @@ class SimulatedFarFieldDataset(DualDataset):
             img = torch.rot90(img, dims=(-3, -2))
         if self._pre_transform is not None:
             img = self._pre_transform(img)
+        return img
 
-        lensless, lensed = self.sim.propagate_image(img, return_object_plane=True)
-
+    def _get_lensed(self, object_plane, n_channels):
+        lensed = object_plane
         if self.vertical_shift is not None:
             lensed = torch.roll(lensed, self.vertical_shift, dims=-3)
         if self.horizontal_shift is not None:
             lensed = torch.roll(lensed, self.horizontal_shift, dims=-2)
 
-        if lensed.shape[-1] == 1 and lensless.shape[-1] == 3:
+        if lensed.shape[-1] == 1 and n_channels == 3:
             # copy to 3 channels
             lensed = lensed.repeat(1, 1, 3)
         assert (
-            lensed.shape[-1] == lensless.shape[-1]
+            lensed.shape[-1] == n_channels
         ), "Lensed and lensless should have same number of channels"
+        return lensed
 
-        return lensless, lensed
+    def _get_images_pair(self, index):
+        img = self._load_object(index)
+        lensless, lensed = self.sim.propagate_image(img, return_object_plane=True)
+        return lensless, self._get_lensed(lensed, lensless.shape[-1])
+
+    def __getitem__(self, idx):
+        if not self.batch_simulation:
+            return super().__getitem__(idx)
+
+        # only prepare object plane, simulation in `collate_fn`
+        if torch.is_tensor(idx):
+            idx = idx.item()
+        if self.indices is not None:
+            idx = self.indices[idx]
+        object_plane = self.sim.prepare_object_plane(self._load_object(idx))
+        # number of channels after convolution with PSF (CHW)
+        n_channels = max(object_plane.shape[-1], self.sim.psf.shape[0])
+        return object_plane, self._get_lensed(object_plane, n_channels)
+
+    def collate_fn(self, batch):
+        """
+        Collate function for the DataLoader. With ``batch_simulation``, the object planes of the
+        batch are propagated with a single batched FFT
+        (:py:func:`~lensless.utils.simulation.FarFieldSimulator.propagate_batch`), before applying
+        background subtraction, noise, flips and transforms to each pair.
+
+        Parameters
+        ----------
+        batch : list
+            List of pairs returned by indexing the dataset.
+        """
+        if not self.batch_simulation:
+            return default_collate(batch)
+
+        lensless = self.sim.propagate_batch(
+            torch.stack([object_plane for object_plane, _ in batch])
+        )
+        return default_collate(
+            [self._process_pair(lensless[i], lensed) for i, (_, lensed) in enumerate(batch)]
+        )
 
     def __len__(self):
         if self.indices is None:
@@ -455,6 +612,532 @@ class SimulatedFarFieldDataset(DualDataset):
             return len([x for x in self.indices if x < self.n_files])
 
 
+def _presimulate_shard(dataset, indices, fps, dtype, seed):
+    # module-level for simulating shards in worker processes
+    torch.set_num_threads(1)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    # scale of lensless and lensed image, as images are normalized for integer types
+    scales = np.ones((len(indices), 2), dtype=np.float32)
+    arrays = None
+    for i, idx in enumerate(indices):
+        images = [img.detach().cpu().numpy() for img in dataset._get_images_pair(idx)]
+        if arrays is None:
+            # write to temporary files, renamed once complete
+            arrays = [
+                np.lib.format.open_memmap(
+                    fp + ".tmp", mode="w+", dtype=dtype, shape=(len(indices), *img.shape)
+                )
+                for fp, img in zip(fps, images)
+            ]
+        for j, (arr, img) in enumerate(zip(arrays, images)):
+            if dtype == "uint16":
+                if img.max() > 0:
+                    scales[i, j] = img.max()
+                img = np.round(np.clip(img / scales[i, j], 0, 1) * 65535)
+            arr[i] = img
+
+    np.save(fps[2] + ".tmp.npy", scales)
+    os.replace(fps[2] + ".tmp.npy", fps[2])
+    for arr, fp in zip(arrays, fps):
+        arr.flush()
+        del arr
+        os.replace(fp + ".tmp", fp)
+
+
+def presimulate_dataset(
+    dataset, output_dir, n_workers=None, shard_size=1000, dtype="uint16", seed=0, params=None
+):
+    """
+    Simulate a :py:class:`~lensless.utils.dataset.SimulatedFarFieldDataset` once, and write the
+    pairs to shards of memory-mapped files that can be read with
+    :py:class:`~lensless.utils.dataset.PresimulatedDataset`.
+
+    The simulator of ``dataset`` should not add noise or quantize, as it is done when loading.
+    Shards that already exist are not recomputed, such that an interrupted simulation can be resumed.
+
+    Parameters
+    ----------
+    dataset : :py:class:`~lensless.utils.dataset.SimulatedFarFieldDataset`
+        Dataset to simulate.
+    output_dir : str
+        Directory to write the shards.
+    n_workers : int, optional
+        Number of processes, each simulating a shard. Default is the number of CPUs. Processes are
+        started with "spawn" if CUDA has been initialized (e.g. for a PSF on GPU), otherwise forked.
+    shard_size : int, optional
+        Number of pairs per shard. Default is 1000.
+    dtype : str, optional
+        Data type of the stored images: ``"uint16"`` (normalized per image) or ``"float32"``. Default is ``"uint16"``.
+    seed : int, optional
+        Seed for random simulation parameters (e.g. object height), shard ``i`` uses ``seed + i``. Default is 0.
+    params : dict, optional
+        Simulation parameters to store alongside the shards.
+
+    Returns
+    -------
+    str
+        Output directory.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    assert isinstance(dataset, SimulatedFarFieldDataset)
+    assert dtype in ["uint16", "float32"], "dtype should be 'uint16' or 'float32'"
+    assert dataset.sim.snr_db is None, "Noise should be added when loading"
+    assert not dataset.sim.quantize, "Quantization should be done when loading"
+    os.makedirs(output_dir, exist_ok=True)
+
+    n_files = len(dataset)
+    n_shards = int(np.ceil(n_files / shard_size))
+    tasks = []
+    for shard in range(n_shards):
+        fps = [
+            os.path.join(output_dir, f"{key}_{shard}.npy")
+            for key in ["lensless", "lensed", "scale"]
+        ]
+        if np.all([os.path.exists(fp) for fp in fps]):
+            continue
+        indices = range(shard * shard_size, min((shard + 1) * shard_size, n_files))
+        tasks.append((dataset, indices, fps, dtype, seed + shard))
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = min(n_workers, len(tasks))
+    if n_workers <= 1:
+        for task in tqdm(tasks, desc="Simulating shards"):
+            _presimulate_shard(*task)
+    else:
+        mp_context = None
+        if torch.cuda.is_initialized():
+            # CUDA cannot be used in forked processes, e.g. for a PSF on GPU
+            mp_context = get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_presimulate_shard, *task) for task in tasks]
+            for future in tqdm(futures, desc="Simulating shards"):
+                future.result()
+
+    np.save(os.path.join(output_dir, "psf.npy"), dataset.psf.detach().cpu().numpy())
+    with open(os.path.join(output_dir, "params.json"), "w") as f:
+        json.dump(
+            {
+                "n_files": n_files,
+                "shard_size": shard_size,
+                "dtype": dtype,
+                "seed": seed,
+                "simulation": params,
+            },
+            f,
+            indent=4,
+            default=str,
+        )
+    return output_dir
+
+
+class PresimulatedDataset(DualDataset):
+    """
+    Dataset of lensless and lensed images simulated offline with :py:func:`~lensless.utils.dataset.presimulate_dataset`,
+    and streamed from its memory-mapped shards.
+
+    Shot noise and quantization (as in :py:class:`lensless.utils.simulation.FarFieldSimulator`) are applied when loading,
+    such that a new noise realization is drawn for each epoch.
+    """
+
+    def __init__(self, root, snr_db=None, quantize=False, max_val=255, crop=None, **kwargs):
+        """
+        Parameters
+        ----------
+        root : str
+            Directory with the shards, i.e. ``output_dir`` of :py:func:`~lensless.utils.dataset.presimulate_dataset`.
+        snr_db : float, optional
+            Signal-to-noise ratio in dB of shot noise added to lensless images, by default ``None`` (no noise).
+        quantize : bool, optional
+            Whether to quantize lensless images to ``max_val`` levels, by default ``False``.
+        max_val : int, optional
+            Maximum value of quantized images, by default 255.
+        crop : dict, optional
+            Crop of the simulated images (as for :py:class:`lensless.utils.dataset.SimulatedFarFieldDataset`), by default ``None``.
+        """
+        super(PresimulatedDataset, self).__init__(**kwargs)
+
+        params_fp = os.path.join(root, "params.json")
+        assert os.path.isfile(params_fp), f"No simulated dataset found in {root}"
+        with open(params_fp, "r") as f:
+            self.params = json.load(f)
+        self.root = root
+        self.n_files = self.params["n_files"]
+        self.shard_size = self.params["shard_size"]
+        self.dtype = self.params["dtype"]
+
+        self.snr_db = snr_db
+        self.quantize = quantize
+        self.max_val = max_val
+        self.crop = crop
+        self._shards = dict()
+
+    @property
+    def psf(self):
+        return torch.from_numpy(np.load(os.path.join(self.root, "psf.npy")))
+
+    def __getstate__(self):
+        # memory-mapped files are opened again by each process (e.g. dataloader workers)
+        state = self.__dict__.copy()
+        state["_shards"] = dict()
+        return state
+
+    def __len__(self):
+        if self.indices is None:
+            return self.n_files
+        else:
+            return len([x for x in self.indices if x < self.n_files])
+
+    def _get_images_pair(self, idx):
+        shard = idx // self.shard_size
+        if shard not in self._shards:
+            self._shards[shard] = [
+                np.load(os.path.join(self.root, f"{key}_{shard}.npy"), mmap_mode="r")
+                for key in ["lensless", "lensed", "scale"]
+            ]
+        offset = idx % self.shard_size
+        lensless, lensed, scale = [arr[offset] for arr in self._shards[shard]]
+        lensless = lensless.astype(np.float32)
+        lensed = lensed.astype(np.float32)
+        if self.dtype == "uint16":
+            lensless *= scale[0] / 65535
+            lensed *= scale[1] / 65535
+
+        # same as last steps of simulator
+        if self.snr_db is not None:
+            lensless = add_shot_noise(lensless, snr_db=self.snr_db)
+        if self.quantize:
+            lensless = lensless / lensless.max()
+            lensless = lensless * self.max_val
+            lensless = lensless.astype(np.uint8)
+
+        return lensless.astype(np.float32), lensed
+
+
+CONTAINER_MAGIC = b"LPCPAIR1"
+CONTAINER_ALIGN = 64
+_CONTAINER_MAX_VAL = {"uint8": 255, "uint16": 65535}
+
+
+class PairedContainerWriter:
+    """
+    Writer of lensless-lensed pairs to a single file, which can be read with random access by
+    :py:class:`~lensless.utils.dataset.PairedContainerDataset`.
+
+    The file consists of a fixed-size preamble (magic bytes and offset of the header), the
+    image payloads, and a header with an index table that gives the offset, shape and scale of
+    each stored image, and the per-sample metadata (integer, with -1 if missing). Payloads are
+    aligned to 64 bytes, such that they can be memory-mapped.
+
+    Example
+    -------
+
+    .. code-block:: python
+
+        with PairedContainerWriter("dataset.lpc", metadata_keys=["mask_label"]) as writer:
+            for lensless, lensed, label in pairs:
+                writer.add(lensless, lensed, mask_label=label)
+
+    """
+
+    def __init__(self, fp, dtype="uint16", metadata_keys=None, params=None):
+        """
+        Parameters
+        ----------
+        fp : str
+            Path of the file to write. It is written to a temporary file, which is renamed when closed.
+        dtype : str, optional
+            Data type of the stored images: ``"uint16"``, ``"uint8"``, or ``"float32"``. Default is ``"uint16"``.
+            For integer types, images with values larger than 1 are normalized by their maximum (stored as scale),
+            such that images in [0, 1] from 8-bit (resp. 16-bit) files are stored without loss as ``"uint8"``
+            (resp. ``"uint16"``).
+        metadata_keys : list, optional
+            Names of integer metadata stored for each sample, e.g. ``["mask_label", "background_id"]``.
+        params : dict, optional
+            Parameters to store in the header, e.g. to describe the acquisition.
+        """
+        assert dtype in [
+            "uint16",
+            "uint8",
+            "float32",
+        ], "dtype should be 'uint16', 'uint8' or 'float32'"
+        self.fp = fp
+        self.dtype = dtype
+        self.metadata_keys = list(metadata_keys) if metadata_keys is not None else []
+        self.params = params
+        self._samples = []
+        self._arrays = dict()
+        self._f = open(fp + ".tmp", "wb")
+        self._f.write(CONTAINER_MAGIC)
+        self._f.write(np.uint64(0).tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # do not leave an incomplete file
+            self._f.close()
+            os.remove(self.fp + ".tmp")
+
+    def __len__(self):
+        return len(self._samples)
+
+    def _write(self, img, dtype):
+        img = np.asarray(img)
+        assert img.ndim <= 4, "Expected image with at most 4 dimensions"
+        scale = 1.0
+        if dtype in _CONTAINER_MAX_VAL:
+            if img.max() > 1:
+                scale = float(img.max())
+            img = np.round(np.clip(img / scale, 0, 1) * _CONTAINER_MAX_VAL[dtype])
+        data = np.ascontiguousarray(img, dtype=dtype).tobytes()
+
+        # align payload for memory-mapping
+        offset = self._f.tell()
+        pad = -offset % CONTAINER_ALIGN
+        self._f.write(b"\0" * pad)
+        self._f.write(data)
+        return offset + pad, list(img.shape), scale
+
+    def add(self, lensless, lensed, **metadata):
+        """
+        Append a pair of images.
+
+        Parameters
+        ----------
+        lensless : :py:class:`~numpy.ndarray` or :py:class:`~torch.Tensor`
+            Lensless image.
+        lensed : :py:class:`~numpy.ndarray` or :py:class:`~torch.Tensor`
+            Lensed image.
+        **metadata
+            Integer metadata of the sample, for keys in ``metadata_keys``.
+        """
+        for key in metadata:
+            assert key in self.metadata_keys, f"Unknown metadata key: {key}"
+        sample = dict()
+        for key, img in [("lensless", lensless), ("lensed", lensed)]:
+            if torch.is_tensor(img):
+                img = img.detach().cpu().numpy()
+            sample[key] = self._write(img, self.dtype)
+        sample["metadata"] = [int(metadata.get(key, -1)) for key in self.metadata_keys]
+        self._samples.append(sample)
+
+    def add_array(self, name, array):
+        """
+        Store an array once for the whole dataset, e.g. the PSF or a background referenced by the
+        ``background_id`` metadata (as ``background_<id>``). Stored as float32.
+        """
+        assert name not in self._arrays, f"Array {name} already stored"
+        if torch.is_tensor(array):
+            array = array.detach().cpu().numpy()
+        offset, shape, _ = self._write(array, "float32")
+        self._arrays[name] = {"offset": offset, "shape": shape}
+
+    def close(self):
+        """
+        Write the header and index table, and rename to the final file.
+        """
+        n_dims = 4
+        fields = []
+        for key in ["lensless", "lensed"]:
+            fields += [
+                (f"{key}_offset", "<u8"),
+                (f"{key}_ndim", "<u1"),
+                (f"{key}_shape", "<u4", (n_dims,)),
+                (f"{key}_scale", "<f4"),
+            ]
+        fields += [(key, "<i8") for key in self.metadata_keys]
+        index = np.zeros(len(self._samples), dtype=fields)
+        for i, sample in enumerate(self._samples):
+            for key in ["lensless", "lensed"]:
+                offset, shape, scale = sample[key]
+                index[i][f"{key}_offset"] = offset
+                index[i][f"{key}_ndim"] = len(shape)
+                index[i][f"{key}_shape"][: len(shape)] = shape
+                index[i][f"{key}_scale"] = scale
+            for key, val in zip(self.metadata_keys, sample["metadata"]):
+                index[i][key] = val
+
+        header_offset = self._f.tell()
+        header = json.dumps(
+            {
+                "n_samples": len(self._samples),
+                "dtype": self.dtype,
+                "metadata_keys": self.metadata_keys,
+                "arrays": self._arrays,
+                "index_descr": np.lib.format.dtype_to_descr(index.dtype),
+                "params": self.params,
+            },
+            default=str,
+        ).encode()
+        self._f.write(np.uint64(len(header)).tobytes())
+        self._f.write(header)
+        self._f.write(index.tobytes())
+
+        # header offset in preamble
+        self._f.seek(len(CONTAINER_MAGIC))
+        self._f.write(np.uint64(header_offset).tobytes())
+        self._f.close()
+        os.replace(self.fp + ".tmp", self.fp)
+
+
+def write_paired_container(dataset, fp, dtype="uint16", metadata=None, arrays=None, params=None):
+    """
+    Convert a :py:class:`~lensless.utils.dataset.DualDataset` (e.g. :py:class:`~lensless.utils.dataset.MeasuredDataset`)
+    to a single file that can be read with :py:class:`~lensless.utils.dataset.PairedContainerDataset`.
+
+    Pairs are stored as returned by ``_get_images_pair``, i.e. before downsampling, background subtraction,
+    flips and transforms, which should therefore be set when loading the container.
+
+    Parameters
+    ----------
+    dataset : :py:class:`~lensless.utils.dataset.DualDataset`
+        Dataset to convert. Only its ``indices`` (if set) are stored.
+    fp : str
+        Path of the file to write.
+    dtype : str, optional
+        Data type of the stored images, see :py:class:`~lensless.utils.dataset.PairedContainerWriter`. Default is ``"uint16"``.
+    metadata : dict, optional
+        Dictionary from metadata key (e.g. ``"mask_label"``) to a list of integer values, one per sample.
+    arrays : dict, optional
+        Dictionary from name to array to store once, e.g. the PSF or backgrounds.
+    params : dict, optional
+        Parameters to store in the header.
+
+    Returns
+    -------
+    str
+        Path of the written file.
+    """
+    # same mapping as in DualDataset.__getitem__
+    if dataset.indices is None:
+        indices = list(range(len(dataset)))
+    else:
+        indices = [dataset.indices[i] for i in range(len(dataset))]
+    metadata = metadata if metadata is not None else dict()
+    for key, values in metadata.items():
+        assert len(values) == len(indices), f"Expected {len(indices)} values for {key}"
+
+    with PairedContainerWriter(
+        fp, dtype=dtype, metadata_keys=metadata.keys(), params=params
+    ) as writer:
+        if arrays is not None:
+            for name, array in arrays.items():
+                writer.add_array(name, array)
+        for i, idx in enumerate(tqdm(indices, desc="Writing pairs")):
+            lensless, lensed = dataset._get_images_pair(idx)
+            writer.add(lensless, lensed, **{key: values[i] for key, values in metadata.items()})
+    return fp
+
+
+class PairedContainerDataset(DualDataset):
+    """
+    Dataset of lensless and lensed images stored in a single file written with
+    :py:class:`~lensless.utils.dataset.PairedContainerWriter` or :py:func:`~lensless.utils.dataset.write_paired_container`,
+    and read with random access from a memory-mapping of the file.
+    """
+
+    def __init__(self, fp, subtract_background=False, **kwargs):
+        """
+        Parameters
+        ----------
+        fp : str
+            Path to the container file.
+        subtract_background : bool, optional
+            Whether to subtract the stored background ``background_<id>`` given by the ``background_id`` metadata
+            of each sample, by default ``False``.
+        """
+        super(PairedContainerDataset, self).__init__(**kwargs)
+
+        assert os.path.isfile(fp), f"Container file not found: {fp}"
+        self.fp = fp
+        with open(fp, "rb") as f:
+            magic = f.read(len(CONTAINER_MAGIC))
+            assert magic == CONTAINER_MAGIC, f"{fp} is not a paired-sample container"
+            header_offset = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            f.seek(header_offset)
+            header_len = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            header = json.loads(f.read(header_len).decode())
+            index_dtype = np.lib.format.descr_to_dtype(header["index_descr"])
+            self._index = np.frombuffer(
+                f.read(header["n_samples"] * index_dtype.itemsize), dtype=index_dtype
+            )
+        self.n_files = header["n_samples"]
+        self.dtype = header["dtype"]
+        self.metadata_keys = header["metadata_keys"]
+        self.arrays = header["arrays"]
+        self.params = header["params"]
+        if subtract_background:
+            assert "background_id" in self.metadata_keys, "No background_id metadata in container"
+        self.subtract_background = subtract_background
+        self._data = None
+
+    def __getstate__(self):
+        # memory-mapped file is opened again by each process (e.g. dataloader workers)
+        state = self.__dict__.copy()
+        state["_data"] = None
+        return state
+
+    def __len__(self):
+        if self.indices is None:
+            return self.n_files
+        else:
+            return len([x for x in self.indices if x < self.n_files])
+
+    def _read(self, offset, shape, dtype):
+        if self._data is None:
+            self._data = np.memmap(self.fp, dtype=np.uint8, mode="r")
+        return np.ndarray(shape, dtype=dtype, buffer=self._data, offset=offset)
+
+    @property
+    def psf(self):
+        return torch.from_numpy(self.get_array("psf"))
+
+    def get_array(self, name):
+        """
+        Get array stored once for the dataset, e.g. ``"psf"`` or ``"background_0"``.
+        """
+        assert name in self.arrays, f"Array {name} not found, available: {list(self.arrays)}"
+        return np.array(self._get_array(name))
+
+    def _get_array(self, name):
+        info = self.arrays[name]
+        return self._read(info["offset"], tuple(info["shape"]), np.float32)
+
+    def get_metadata(self, idx):
+        """
+        Get metadata of a sample, as dictionary from metadata key to value (-1 if missing).
+        """
+        if self.indices is not None:
+            idx = self.indices[idx]
+        return {key: int(self._index[idx][key]) for key in self.metadata_keys}
+
+    def _get_images_pair(self, idx):
+        entry = self._index[idx]
+        images = []
+        for key in ["lensless", "lensed"]:
+            shape = entry[f"{key}_shape"][: entry[f"{key}_ndim"]]
+            img = self._read(int(entry[f"{key}_offset"]), tuple(shape), self.dtype)
+            img = img.astype(np.float32)
+            if self.dtype in _CONTAINER_MAX_VAL:
+                img *= entry[f"{key}_scale"] / _CONTAINER_MAX_VAL[self.dtype]
+            images.append(img)
+        lensless, lensed = images
+
+        if self.subtract_background and entry["background_id"] >= 0:
+            lensless = lensless - self._get_array(f"background_{entry['background_id']}")
+            lensless = np.clip(lensless, 0, None)
+
+        return lensless, lensed
+
+
 class MeasuredDatasetSimulatedOriginal(DualDataset):
     """
     Abstract class for defining a dataset of paired lensed and lensless images.
@@ -478,6 +1161,7 @@ class MeasuredDatasetSimulatedOriginal(DualDataset):
         downsample=1,
         background=None,
         flip=False,
+        reduced_decoding=False,
         **kwargs,
     ):
         """
@@ -485,11 +1169,15 @@ class MeasuredDatasetSimulatedOriginal(DualDataset):
 
         Parameters
         ----------
+        reduced_decoding : bool, optional
+            Whether to downsample measurements while decoding them, see :py:func:`~lensless.utils.io.load_image`.
+            Default is ``False``.
         """
         super(MeasuredDatasetSimulatedOriginal, self).__init__(
             downsample=1, background=background, flip=flip, **kwargs
         )
         self.pre_downsample = downsample
+        self.reduced_decoding = reduced_decoding
 
         self.measured_dir = measured_dir
         self.original_dir = original_dir
@@ -707,7 +1395,10 @@ class DigiCamCelebA(MeasuredDatasetSimulatedOriginal):
         lensless_fp = os.path.join(self.measured_dir, self.files[idx])
         original_fp = os.path.join(self.original_dir, self.files[idx][:-3] + self.original_ext)
         lensless = load_image(
-            lensless_fp, downsample=self.pre_downsample, flip=self.flip_measurement
+            lensless_fp,
+            downsample=self.pre_downsample,
+            flip=self.flip_measurement,
+            reduced_decoding=self.reduced_decoding,
         )
         original = load_image(original_fp[:-3] + self.original_ext)
 
@@ -749,6 +1440,7 @@ class MeasuredDataset(DualDataset):
         lensless_fn="diffuser",
         lensed_fn="lensed",
         image_ext="npy",
+        reduced_decoding=False,
         **kwargs,
     ):
         """
@@ -765,9 +1457,13 @@ class MeasuredDataset(DualDataset):
             Name of the folder containing the lensed images, by default "lensed".
         image_ext : str, optional
             Extension of the images, by default "npy".
+        reduced_decoding : bool, optional
+            For PNG / JPEG images, whether to downsample while decoding, see :py:func:`~lensless.utils.io.load_image`.
+            Default is ``False``.
         """
 
         super(MeasuredDataset, self).__init__(**kwargs)
+        self.reduced_decoding = reduced_decoding
 
         self.root_dir = root_dir
         self.lensless_dir = os.path.join(root_dir, lensless_fn)
@@ -802,8 +1498,14 @@ class MeasuredDataset(DualDataset):
             # more standard image formats: png, jpg, tiff, etc.
             lensless_fp = os.path.join(self.lensless_dir, self.files[idx])
             lensed_fp = os.path.join(self.lensed_dir, self.files[idx])
-            lensless = load_image(lensless_fp)
-            lensed = load_image(lensed_fp)
+            if self.reduced_decoding:
+                lensless = load_image(
+                    lensless_fp, downsample=self.downsample, reduced_decoding=True
+                )
+                lensed = load_image(lensed_fp, downsample=self.downsample, reduced_decoding=True)
+            else:
+                lensless = load_image(lensless_fp)
+                lensed = load_image(lensed_fp)
 
             # convert to float
             if lensless.dtype == np.uint8:
@@ -814,6 +1516,10 @@ class MeasuredDataset(DualDataset):
                 lensless = lensless.astype(np.float32) / 65535
                 lensed = lensed.astype(np.float32) / 65535
 
+            if self.reduced_decoding:
+                # already downsampled
+                return torch.from_numpy(lensless), torch.from_numpy(lensed)
+
         return lensless, lensed
 
 
@@ -1420,6 +2126,217 @@ class HFSimulated(DualDataset):
         return reconstruction, lensed
 
 
+def _simulate_adafruit_psf(mask_vals, mask_param):
+    # module-level for simulating PSFs in worker processes
+    torch.set_num_threads(1)
+    mask = AdafruitLCD(initial_vals=torch.from_numpy(mask_vals.astype(np.float32)), **mask_param)
+    return mask.get_psf().detach()
+
+
+class PSFBank:
+    """
+    PSFs of multiple mask patterns, stored in a single memory-mapped file and loaded lazily by label.
+
+    Behaves as a (read-only) dictionary from label to PSF, i.e. :py:class:`torch.Tensor` of shape (1, height, width, channels).
+    """
+
+    def __init__(self, fp, labels):
+        """
+        Parameters
+        ----------
+        fp : str
+            Path to ``.npy`` file with PSFs, stacked along the first dimension.
+        labels : list
+            Label of each PSF, in the same order as in the file.
+        """
+        assert os.path.isfile(fp), f"PSF bank not found: {fp}"
+        self.fp = fp
+        self.labels = list(labels)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+        self._data = None
+        self._psfs = dict()
+
+    @classmethod
+    def create(cls, fp, psfs):
+        """
+        Write PSFs to a new PSF bank.
+
+        Parameters
+        ----------
+        fp : str
+            Path to ``.npy`` file to write.
+        psfs : dict
+            Dictionary from label to PSF (:py:class:`torch.Tensor` or :py:class:`~numpy.ndarray`).
+        """
+        labels = list(psfs.keys())
+        shape = tuple(psfs[labels[0]].shape)
+        # write to temporary file, such that an interrupted write is not used
+        data = np.lib.format.open_memmap(
+            fp + ".tmp", mode="w+", dtype=np.float32, shape=(len(labels), *shape)
+        )
+        for i, label in enumerate(labels):
+            assert tuple(psfs[label].shape) == shape, "All PSFs should have the same shape"
+            data[i] = np.asarray(psfs[label])
+        data.flush()
+        del data
+        os.replace(fp + ".tmp", fp)
+        with open(os.path.splitext(fp)[0] + ".json", "w") as f:
+            json.dump(labels, f)
+        return cls(fp, labels)
+
+    @classmethod
+    def load(cls, fp):
+        """Load PSF bank written with :py:meth:`~lensless.utils.dataset.PSFBank.create`."""
+        with open(os.path.splitext(fp)[0] + ".json", "r") as f:
+            labels = json.load(f)
+        return cls(fp, labels)
+
+    def __getitem__(self, label):
+        if label not in self._psfs:
+            if self._data is None:
+                self._data = np.load(self.fp, mmap_mode="r")
+            self._psfs[label] = torch.from_numpy(np.array(self._data[self._index[label]]))
+        return self._psfs[label]
+
+    @property
+    def shape(self):
+        """Shape of each PSF, without loading PSFs."""
+        if self._data is None:
+            self._data = np.load(self.fp, mmap_mode="r")
+        return self._data.shape[1:]
+
+    def __getstate__(self):
+        # memory-mapped file is opened again by each process (e.g. dataloader workers), which
+        # loads its own PSFs
+        state = self.__dict__.copy()
+        state["_data"] = None
+        state["_psfs"] = dict()
+        return state
+
+    def __contains__(self, label):
+        return label in self._index
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def keys(self):
+        return list(self.labels)
+
+    def values(self):
+        return [self[label] for label in self.labels]
+
+    def items(self):
+        return [(label, self[label]) for label in self.labels]
+
+
+class ParquetShards(Dataset):
+    """
+    Examples of a split stored as local Parquet shards, e.g. written by ``scripts/data/upload_dataset_huggingface.py``
+    or downloaded from a Hugging Face dataset repository. Shards are read lazily, one row group at a time,
+    such that the split is not materialized (as with :py:func:`datasets.load_dataset`).
+
+    It can be passed as ``split`` to :py:class:`~lensless.utils.dataset.HFDataset` for random access, which
+    can then be streamed with :py:class:`~lensless.utils.dataset.HFStreamingDataset`.
+    """
+
+    def __init__(self, data_dir, split):
+        """
+        Parameters
+        ----------
+        data_dir : str
+            Directory with shards ``<split>-*.parquet``, or with such shards in a ``data`` sub-directory.
+        split : str
+            Split to read, e.g. "train" or "test".
+        """
+        import pyarrow.parquet as pq
+        from datasets import Features
+
+        files = natural_sort(glob.glob(os.path.join(data_dir, f"{split}-*.parquet")))
+        if len(files) == 0:
+            files = natural_sort(glob.glob(os.path.join(data_dir, "data", f"{split}-*.parquet")))
+        if len(files) == 0:
+            raise FileNotFoundError(f"No Parquet shards found in {data_dir} for split {split}")
+        self.files = files
+        self.split = split
+
+        # row groups from the file footers: (file index, row group index, first row)
+        self.row_groups = []
+        n_rows = 0
+        for i, fp in enumerate(files):
+            metadata = pq.read_metadata(fp)
+            for j in range(metadata.num_row_groups):
+                self.row_groups.append((i, j, n_rows))
+                n_rows += metadata.row_group(j).num_rows
+        self.n_rows = n_rows
+        self._starts = np.array([start for _, _, start in self.row_groups])
+
+        # features (e.g. images) are stored in the schema metadata of the shards
+        self.features = Features.from_arrow_schema(pq.read_schema(files[0]))
+        self._files = dict()
+        self._cache = None
+
+    def __getstate__(self):
+        # files are opened again by each process (e.g. dataloader workers)
+        state = self.__dict__.copy()
+        state["_files"] = dict()
+        state["_cache"] = None
+        return state
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.n_rows
+        assert 0 <= idx < self.n_rows, f"Index {idx} out of range"
+        group = np.searchsorted(self._starts, idx, side="right") - 1
+        # last row group is kept, as examples are typically accessed in order
+        if self._cache is None or self._cache[0] != group:
+            self._cache = (group, self.read_row_group(group))
+        return self.decode(self._cache[1][idx - self._starts[group]])
+
+    def read_row_group(self, group):
+        """
+        Read the (not decoded) examples of a row group.
+
+        Parameters
+        ----------
+        group : int
+            Index in :py:attr:`row_groups`.
+
+        Returns
+        -------
+        list
+            Examples as dictionaries, e.g. images are given as bytes.
+        """
+        import pyarrow.parquet as pq
+
+        i, j, _ = self.row_groups[group]
+        if i not in self._files:
+            self._files[i] = pq.ParquetFile(self.files[i])
+        return self._files[i].read_row_group(j).to_pylist()
+
+    def decode(self, example):
+        """
+        Decode an example from :py:meth:`read_row_group`, e.g. images to :py:class:`PIL.Image.Image`.
+        """
+        return self.features.decode_example(example)
+
+    def column(self, name):
+        """
+        Read all values of a column (e.g. "mask_label"), without reading other columns.
+        """
+        import pyarrow.parquet as pq
+
+        values = []
+        for fp in self.files:
+            values += pq.read_table(fp, columns=[name]).column(name).to_pylist()
+        return values
+
+
 class HFDataset(Dataset):
     def __init__(
         self,
@@ -1448,6 +2365,11 @@ class HFDataset(Dataset):
         random_flip=False,
         bg_snr_range=None,
         bg_fp=None,
+        preprocess_cache=None,
+        preprocess_cache_dtype="uint16",
+        preprocess_cache_shard_size=1000,
+        psf_cache=None,
+        n_workers=None,
         **kwargs,
     ):
         """
@@ -1456,9 +2378,10 @@ class HFDataset(Dataset):
         Parameters
         ----------
         huggingface_repo : str
-            Hugging Face repository ID.
-        split : str or :py:class:`torch.utils.data.Dataset`
-            Split of the dataset to use: 'train', 'test', or 'all'. If a Dataset object is given, it is used directly.
+            Hugging Face repository ID, or local directory with the files of the repository (PSF, masks).
+        split : str or :py:class:`torch.utils.data.Dataset` or :py:class:`datasets.Dataset`
+            Split of the dataset to use: 'train', 'test', or 'all'. If a Dataset object is given, it is used directly,
+            e.g. :py:class:`~lensless.utils.dataset.ParquetShards` to read local shards lazily.
         n_files : int, optional
             Number of files to load from the dataset, by default None, namely all.
         psf : str, optional
@@ -1485,12 +2408,26 @@ class HFDataset(Dataset):
             If multimask dataset, save the simulated PSFs.
         random_flip : bool, optional
             If True, randomly flip the lensless images vertically and horizonally with equal probability. By default, no flipping.
+            The flip flags are returned (after the PSF for multimask datasets), such that the PSF can be flipped accordingly by the reconstruction, see ``flip_lr`` and ``flip_ud`` of :py:meth:`~lensless.recon.trainable_recon.TrainableReconstructionAlgorithm.forward`.
         simulation_config : dict, optional
             Simulation parameters for PSF if using a mask pattern.
         bg_snr_range : list, optional
             List [low, high] of range of possible SNRs for which to add the background. Used in conjunction with 'bg'.
         bg_fp : string, optional
             File path of background to add to the data for simulating a measurement in ambient light.
+        preprocess_cache : str, optional
+            Directory where to cache decoded and downsampled images as memory-mapped files, so that they are not decoded at every access.
+            The cache is built at the first use, and is specific to the dataset revision and the preprocessing parameters. By default, no cache.
+        preprocess_cache_dtype : str, optional
+            Data type of the cache: "uint16" (quantized with 16 bits), "float16", or "float32" (no conversion when reading). By default "uint16".
+        preprocess_cache_shard_size : int, optional
+            Number of examples per cache file, by default 1000.
+        psf_cache : str, optional
+            For datasets with multiple masks, directory where to store the simulated PSFs (see :py:class:`~lensless.utils.dataset.PSFBank`),
+            such that they are only simulated once for a given set of masks and simulation parameters. PSFs are then loaded lazily.
+            By default, PSFs are simulated every time and kept in memory.
+        n_workers : int, optional
+            Number of processes for simulating the PSFs of multiple masks. Default is to simulate sequentially.
 
         """
 
@@ -1498,7 +2435,7 @@ class HFDataset(Dataset):
             if n_files is not None:
                 split = f"{split}[0:{n_files}]"
             self.dataset = load_dataset(huggingface_repo, split=split, cache_dir=cache_dir)
-        elif isinstance(split, Dataset):
+        elif isinstance(split, (Dataset, ArrowDataset)):
             self.dataset = split
         else:
             raise ValueError("split should be a string or a Dataset object")
@@ -1576,7 +2513,7 @@ class HFDataset(Dataset):
         self.huggingface_repo = huggingface_repo
         if psf is not None:
             # download PSF from huggingface
-            psf_fp = hf_hub_download(repo_id=huggingface_repo, filename=psf, repo_type="dataset")
+            psf_fp = self._get_file(psf)
             psf, _ = load_psf(
                 psf_fp,
                 shape=lensless.shape,
@@ -1612,33 +2549,41 @@ class HFDataset(Dataset):
 
         elif "mask_label" in data_0:
             self.multimask = True
-            mask_labels = []
-            for i in range(len(self.dataset)):
-                mask_labels.append(self.dataset[i]["mask_label"])
+            if isinstance(self.dataset, ParquetShards):
+                # only read the column of labels
+                mask_labels = self.dataset.column("mask_label")
+            else:
+                mask_labels = []
+                for i in range(len(self.dataset)):
+                    mask_labels.append(self.dataset[i]["mask_label"])
             mask_labels = list(set(mask_labels))
             self.mask_labels = mask_labels
 
             # simulate all PSFs
-            self.psf = dict()
-            for label in mask_labels:
-
-                mask_vals = self.get_mask_vals(label)
-                self.psf[label] = self.simulate_psf(mask_vals)
+            if psf_cache is not None:
+                self.psf = self._load_psf_bank(psf_cache, n_workers)
+            else:
+                self.psf = self.simulate_psfs(mask_labels, n_workers)
 
+            # PSFs of a bank are not loaded, as they have the same shape
+            if isinstance(self.psf, PSFBank):
+                psf_shapes = [self.psf.shape]
+            else:
+                psf_shapes = [psf.shape for psf in self.psf.values()]
+            for psf_shape in psf_shapes:
                 assert (
-                    self.psf[label].shape[-3:-1] == lensless.shape[:2]
-                ), f"PSF shape should match lensless shape: PSF {self.psf[label].shape[-3:-1]} vs lensless {lensless.shape[:2]}"
+                    psf_shape[-3:-1] == lensless.shape[:2]
+                ), f"PSF shape should match lensless shape: PSF {psf_shape[-3:-1]} vs lensless {lensless.shape[:2]}"
 
-                if save_psf:
+            if save_psf:
+                for label in mask_labels:
                     # same viewable image of PSF
                     save_image(self.psf[label].squeeze().cpu().numpy(), f"psf_{label}.png")
 
         else:
 
             # single mask pattern
-            mask_fp = hf_hub_download(
-                repo_id=huggingface_repo, filename="mask_pattern.npy", repo_type="dataset"
-            )
+            mask_fp = self._get_file("mask_pattern.npy")
             mask_vals = np.load(mask_fp)
             self.psf = self.simulate_psf(mask_vals)
             assert (
@@ -1694,39 +2639,233 @@ class HFDataset(Dataset):
             self.bg_snr_range = None
             self.background_var = None
 
+        # cache of preprocessed images
+        self.preprocess_cache = None
+        self._cache_shards = dict()
+        if preprocess_cache is not None:
+            assert preprocess_cache_dtype in [
+                "uint16",
+                "float16",
+                "float32",
+            ], "Cache dtype should be 'uint16', 'float16', or 'float32'"
+            self.preprocess_cache_dtype = preprocess_cache_dtype
+            self.preprocess_cache_shard_size = preprocess_cache_shard_size
+            self.preprocess_cache = self._build_preprocess_cache(preprocess_cache)
+
     def __len__(self):
         return len(self.dataset)
 
+    def __getstate__(self):
+        # memory-mapped files are opened again by each process (e.g. dataloader workers)
+        state = self.__dict__.copy()
+        state["_cache_shards"] = dict()
+        return state
+
+    def _preprocess_cache_params(self):
+        # everything that has an influence on the output of `_preprocess_images`
+        fingerprint = getattr(self.dataset, "_fingerprint", None)
+        if fingerprint is None:
+            warnings.warn(
+                "Dataset has no fingerprint, preprocessing cache only identified by repository and number of files."
+            )
+        return {
+            "huggingface_repo": self.huggingface_repo,
+            "fingerprint": fingerprint,
+            "n_files": len(self.dataset),
+            "downsample_lensless": self.downsample_lensless,
+            "downsample_lensed": self.downsample_lensed,
+            "alignment": [self.alignment["height"], self.alignment["width"]]
+            if self.alignment is not None
+            else None,
+            "display_res": list(self.display_res) if self.display_res is not None else None,
+            "simulator": self.simulator is not None,
+            "force_rgb": self.force_rgb,
+            "measured_bg": self.measured_bg,
+            "dtype": self.preprocess_cache_dtype,
+            "shard_size": self.preprocess_cache_shard_size,
+        }
+
+    def _build_preprocess_cache(self, cache_dir):
+        """
+        Write preprocessed images to memory-mapped files (one per shard and image type),
+        in a sub-directory specific to the dataset and preprocessing parameters.
+        Shards that already exist are not recomputed.
+        """
+        params = self._preprocess_cache_params()
+        key = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        cache_dir = os.path.join(cache_dir, key)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+            with open(os.path.join(cache_dir, "params.json"), "w") as f:
+                json.dump(params, f, indent=4)
+
+        keys = ["lensless", "lensed"] + (["ambient"] if self.measured_bg else [])
+        shard_size = self.preprocess_cache_shard_size
+        n_shards = int(np.ceil(len(self.dataset) / shard_size))
+        for shard in range(n_shards):
+            shard_fps = [os.path.join(cache_dir, f"{key}_{shard}.npy") for key in keys]
+            if np.all([os.path.exists(fp) for fp in shard_fps]):
+                continue
+
+            indices = range(shard * shard_size, min((shard + 1) * shard_size, len(self.dataset)))
+            shard_arrays = None
+            for i, idx in enumerate(tqdm(indices, desc=f"Caching shard {shard + 1}/{n_shards}")):
+                images = self._preprocess_images(idx)[: len(keys)]
+                if shard_arrays is None:
+                    # write to temporary files, renamed once complete
+                    shard_arrays = [
+                        np.lib.format.open_memmap(
+                            fp + ".tmp",
+                            mode="w+",
+                            dtype=self.preprocess_cache_dtype,
+                            shape=(len(indices), *img.shape),
+                        )
+                        for fp, img in zip(shard_fps, images)
+                    ]
+                for arr, img in zip(shard_arrays, images):
+                    assert (
+                        arr.shape[1:] == img.shape
+                    ), f"Image {idx} has shape {img.shape}, expected {arr.shape[1:]}"
+                    if self.preprocess_cache_dtype == "uint16":
+                        img = np.round(np.clip(img, 0, 1) * 65535)
+                    arr[i] = img
+            for arr, fp in zip(shard_arrays, shard_fps):
+                arr.flush()
+                del arr
+                os.replace(fp + ".tmp", fp)
+
+        return cache_dir
+
+    def _read_preprocess_cache(self, idx):
+        shard = idx // self.preprocess_cache_shard_size
+        if shard not in self._cache_shards:
+            keys = ["lensless", "lensed"] + (["ambient"] if self.measured_bg else [])
+            # copy-on-write, such that arrays are writable without modifying the cache
+            self._cache_shards[shard] = [
+                np.load(os.path.join(self.preprocess_cache, f"{key}_{shard}.npy"), mmap_mode="c")
+                for key in keys
+            ]
+        offset = idx % self.preprocess_cache_shard_size
+        images = []
+        for arr in self._cache_shards[shard]:
+            img = arr[offset]
+            if self.preprocess_cache_dtype == "uint16":
+                img = img.astype(np.float32) / 65535
+            elif self.preprocess_cache_dtype == "float16":
+                img = img.astype(np.float32)
+            images.append(img)
+        if not self.measured_bg:
+            images.append(None)
+        return images
+
+    def _get_file(self, filename):
+        """
+        Path to a file of the dataset repository, downloaded from Hugging Face unless the
+        repository is a local directory (e.g. with Parquet shards).
+        """
+        if os.path.isdir(self.huggingface_repo):
+            return os.path.join(self.huggingface_repo, filename)
+        return hf_hub_download(
+            repo_id=self.huggingface_repo, filename=filename, repo_type="dataset"
+        )
+
     def get_mask_vals(self, idx):
         assert self.multimask
         assert idx in self.mask_labels
-        mask_fp = hf_hub_download(
-            repo_id=self.huggingface_repo,
-            filename=f"masks/mask_{idx}.npy",
-            repo_type="dataset",
-        )
+        mask_fp = self._get_file(f"masks/mask_{idx}.npy")
         return np.load(mask_fp)
 
+    def _mask_param(self):
+        return {
+            "sensor": self.sensor,
+            "slm": self.slm,
+            "downsample": self.downsample_fact,
+            "flipud": self.rotate or self.flipud,  # TODO separate commands?
+            "use_waveprop": self.simulation_config.get("use_waveprop", False),
+            "scene2mask": self.simulation_config.get("scene2mask", None),
+            "mask2sensor": self.simulation_config.get("mask2sensor", None),
+            "deadspace": self.simulation_config.get("deadspace", True),
+        }
+
     def simulate_psf(self, mask_vals):
         mask = AdafruitLCD(
-            initial_vals=torch.from_numpy(mask_vals.astype(np.float32)),
-            sensor=self.sensor,
-            slm=self.slm,
-            downsample=self.downsample_fact,
-            flipud=self.rotate or self.flipud,  # TODO separate commands?
-            use_waveprop=self.simulation_config.get("use_waveprop", False),
-            scene2mask=self.simulation_config.get("scene2mask", None),
-            mask2sensor=self.simulation_config.get("mask2sensor", None),
-            deadspace=self.simulation_config.get("deadspace", True),
+            initial_vals=torch.from_numpy(mask_vals.astype(np.float32)), **self._mask_param()
         )
         return mask.get_psf().detach()
 
-    def _get_images_pair(self, idx):
+    def simulate_psfs(self, labels, n_workers=None):
+        """
+        Simulate PSFs of multiple masks in parallel.
+
+        Parameters
+        ----------
+        labels : list
+            Mask labels.
+        n_workers : int, optional
+            Number of processes. Default is to simulate sequentially.
+
+        Returns
+        -------
+        psfs : dict
+            Dictionary from label to PSF.
+        """
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if n_workers is None:
+            n_workers = 1
+        n_workers = min(n_workers, len(labels))
+
+        # download masks concurrently
+        with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as pool:
+            mask_vals = list(pool.map(self.get_mask_vals, labels))
+
+        if n_workers <= 1:
+            psfs = [self.simulate_psf(vals) for vals in mask_vals]
+        else:
+            mask_param = self._mask_param()
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [
+                    pool.submit(_simulate_adafruit_psf, vals, mask_param) for vals in mask_vals
+                ]
+                psfs = [future.result() for future in tqdm(futures, desc="Simulating PSFs")]
+        return dict(zip(labels, psfs))
+
+    def _load_psf_bank(self, cache_dir, n_workers=None):
+        """
+        Load PSFs from bank specific to the mask labels and simulation parameters, and create it if
+        necessary.
+        """
+        params = self._mask_param()
+        params.update(
+            {
+                "huggingface_repo": self.huggingface_repo,
+                "mask_labels": sorted(self.mask_labels),
+                "simulation_config": {
+                    key: val
+                    for key, val in self.simulation_config.items()
+                    if isinstance(val, (int, float, str, bool, type(None)))
+                },
+            }
+        )
+        key = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        bank_fp = os.path.join(cache_dir, f"psf_bank_{key}.npy")
+        if os.path.exists(bank_fp):
+            return PSFBank.load(bank_fp)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        psfs = self.simulate_psfs(self.mask_labels, n_workers)
+        with open(os.path.join(cache_dir, f"psf_bank_{key}_params.json"), "w") as f:
+            json.dump(params, f, indent=4, default=str)
+        return PSFBank.create(bank_fp, psfs)
+
+    def _preprocess_images(self, idx, example=None):
 
         # load images
-        lensless_np = np.array(self.dataset[idx]["lensless"])
-        lensed_np = np.array(self.dataset[idx]["lensed"])
-        background_np = np.array(self.dataset[idx]["ambient"]) if self.measured_bg else None
+        if example is None:
+            example = self.dataset[idx]
+        lensless_np = np.array(example["lensless"])
+        lensed_np = np.array(example["lensed"])
+        background_np = np.array(example["ambient"]) if self.measured_bg else None
 
         if self.force_rgb:
             if len(lensless_np.shape) == 2:
@@ -1781,47 +2920,62 @@ class HFDataset(Dataset):
                 else None
             )
 
-        lensless = lensless_np
-        lensed = lensed_np
-        background = background_np if background_np is not None else None
-
+        # lensed is projected to lensless space by simulator in `_get_images_pair`
         if self.simulator is not None:
-            # convert to torch
-            lensless = torch.from_numpy(lensless_np)
-            lensed = torch.from_numpy(lensed_np)
-
-            # project original image to lensed space
-            with torch.no_grad():
-
-                if self.simulate_lensless:
-                    lensless, lensed = self.simulator.propagate_image(
-                        lensed, return_object_plane=True
-                    )
-                else:
-                    lensed = self.simulator.propagate_image(lensed, return_object_plane=True)
-
+            pass
         elif self.alignment is not None:
-            lensed = resize(
+            lensed_np = resize(
                 lensed_np,
                 shape=(self.alignment["height"], self.alignment["width"], 3),
                 interpolation=cv2.INTER_NEAREST,
             )
         elif self.display_res is not None:
-            lensed = resize(
+            lensed_np = resize(
                 lensed_np, shape=(*self.display_res, 3), interpolation=cv2.INTER_NEAREST
             )
         elif self.downsample_lensed != 1.0:
-            lensed = resize(
+            lensed_np = resize(
                 lensed_np,
                 factor=1 / self.downsample_lensed,
                 interpolation=cv2.INTER_NEAREST,
             )
 
-        return lensless, lensed, background if background is not None else None
+        return lensless_np, lensed_np, background_np
+
+    def _get_images_pair(self, idx, example=None):
+
+        if self.preprocess_cache is not None:
+            lensless, lensed, background = self._read_preprocess_cache(idx)
+        else:
+            lensless, lensed, background = self._preprocess_images(idx, example)
+
+        if self.simulator is not None:
+            # convert to torch
+            lensless = torch.from_numpy(lensless)
+            lensed = torch.from_numpy(lensed)
+
+            # project original image to lensed space
+            with torch.no_grad():
+
+                if self.simulate_lensless:
+                    lensless, lensed = self.simulator.propagate_image(
+                        lensed, return_object_plane=True
+                    )
+                else:
+                    lensed = self.simulator.propagate_image(lensed, return_object_plane=True)
+
+        return lensless, lensed, background
 
     def __getitem__(self, idx):
+        return self._get_item(idx)
+
+    def _get_item(self, idx, example=None):
+        """
+        Get item at index ``idx``, or from an already loaded ``example`` (e.g. when streaming,
+        see :py:class:`~lensless.utils.dataset.HFStreamingDataset`).
+        """
 
-        lensless, lensed, background = self._get_images_pair(idx)
+        lensless, lensed, background = self._get_images_pair(idx, example)
 
         if isinstance(lensless, np.ndarray):
             # to torch
@@ -1852,29 +3006,28 @@ class HFDataset(Dataset):
                 lensed = torch.flip(lensed, dims=(-3,))
 
         if self.multimask:
-            mask_label = self.dataset[idx]["mask_label"]
+            if example is None:
+                example = self.dataset[idx]
+            mask_label = example["mask_label"]
 
+        # PSF is not flipped here, but by the reconstruction according to the returned flags,
+        # such that flipped PSFs (and their FFTs) are not computed per sample
         flip_lr = False
         flip_ud = False
         if self.random_flip:
             flip_lr = torch.rand(1) > 0.5
             flip_ud = torch.rand(1) > 0.5
 
-            if self.multimask:
-                psf_aug = self.psf[mask_label].clone()
-            else:
-                psf_aug = self.psf.clone()
-
             if flip_lr:
                 lensless = torch.flip(lensless, dims=(-2,))
                 lensed = torch.flip(lensed, dims=(-2,))
-                psf_aug = torch.flip(psf_aug, dims=(-2,))
-                background = torch.flip(background, dims=(-2,))
+                if background is not None:
+                    background = torch.flip(background, dims=(-2,))
             if flip_ud:
                 lensless = torch.flip(lensless, dims=(-3,))
                 lensed = torch.flip(lensed, dims=(-3,))
-                psf_aug = torch.flip(psf_aug, dims=(-3,))
-                background = torch.flip(background, dims=(-3,))
+                if background is not None:
+                    background = torch.flip(background, dims=(-3,))
 
         return_items = [lensless, lensed]
         if self.multimask:
@@ -1882,14 +3035,9 @@ class HFDataset(Dataset):
                 return_items.append(mask_label)
             else:
                 return_items.append(self.psf[mask_label])
-            if self.random_flip:
-                return_items.append(flip_lr)
-                return_items.append(flip_ud)
-        else:
-            if self.random_flip:
-                return_items.append(psf_aug)
-                return_items.append(flip_lr)
-                return_items.append(flip_ud)
+        if self.random_flip:
+            return_items.append(flip_lr)
+            return_items.append(flip_ud)
 
         # Add background to achieve desired SNR
         if self.bg_sim is not None:
@@ -2065,6 +3213,150 @@ class HFDataset(Dataset):
             return reconstruction
 
 
+def _prefetch(iterable, size):
+    """
+    Iterate over ``iterable`` in a background thread, with up to ``size`` items read in advance.
+    """
+    import queue
+    import threading
+
+    if size <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    end = object()
+    errors = []
+
+    def put(item):
+        # give up if the consumer has stopped
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(end)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is end:
+                break
+            yield item
+        if len(errors) > 0:
+            raise errors[0]
+    finally:
+        stop.set()
+
+
+def _shuffle_buffer(iterable, size, rng):
+    """
+    Approximately shuffle ``iterable`` by randomly drawing items from a buffer of ``size`` items.
+    """
+    buffer = []
+    for item in iterable:
+        if len(buffer) < size:
+            buffer.append(item)
+            continue
+        i = rng.integers(size)
+        yield buffer[i]
+        buffer[i] = item
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+class HFStreamingDataset(IterableDataset):
+    """
+    Stream examples of a :py:class:`~lensless.utils.dataset.HFDataset` whose split is given as
+    :py:class:`~lensless.utils.dataset.ParquetShards`, such that training can start without
+    materializing the split and memory stays bounded.
+
+    Row groups of the shards are split among the DataLoader workers, and read in a background thread
+    (``prefetch`` row groups in advance). Examples are shuffled by randomly ordering the row groups at
+    every epoch, and with a buffer of ``shuffle_buffer`` (not decoded) examples.
+
+    Other attributes (e.g. ``psf``, ``multimask``, ``extract_roi``) are those of the wrapped dataset.
+    """
+
+    def __init__(self, dataset, shuffle=True, shuffle_buffer=1000, prefetch=2):
+        """
+        Parameters
+        ----------
+        dataset : :py:class:`~lensless.utils.dataset.HFDataset`
+            Dataset to stream, with ``split`` given as :py:class:`~lensless.utils.dataset.ParquetShards`.
+        shuffle : bool, optional
+            Whether to shuffle the examples, by default ``True``.
+        shuffle_buffer : int, optional
+            Number of examples in the shuffle buffer, by default 1000.
+        prefetch : int, optional
+            Number of row groups read in advance by each worker, by default 2. Set to 0 to read in the worker itself.
+        """
+        assert isinstance(
+            dataset.dataset, ParquetShards
+        ), "Split of dataset should be given as ParquetShards"
+        assert dataset.preprocess_cache is None, "Preprocessing cache is not used when streaming"
+        self.dataset = dataset
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.prefetch = prefetch
+        self._epoch = 0
+
+    def __getattr__(self, name):
+        if name == "dataset":
+            # not yet set, e.g. when unpickling
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __iter__(self):
+        shards = self.dataset.dataset
+        groups = np.arange(len(shards.row_groups))
+
+        # the order of the row groups should be the same for all workers: worker seeds only
+        # differ by their id, and change at every epoch unless workers are persistent, for which
+        # each worker counts the epochs
+        epoch = self._epoch
+        self._epoch += 1
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+            seed = int(torch.randint(2**31, (1,)))
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+            seed = worker_info.seed - worker_info.id
+        if self.shuffle:
+            groups = np.random.default_rng([seed, epoch]).permutation(groups)
+        groups = groups[worker_id::num_workers]
+
+        def read(group):
+            start = shards.row_groups[group][2]
+            return [(start + i, example) for i, example in enumerate(shards.read_row_group(group))]
+
+        examples = (
+            example for rows in _prefetch(map(read, groups), self.prefetch) for example in rows
+        )
+        if self.shuffle:
+            rng = np.random.default_rng([seed, epoch, worker_id + 1])
+            examples = _shuffle_buffer(examples, self.shuffle_buffer, rng)
+        for idx, example in examples:
+            yield self.dataset._get_item(idx, shards.decode(example))
+
+
 def simulate_dataset(config, generator=None):
     """
     Prepare datasets for training and testing.
@@ -2099,6 +3391,7 @@ def simulate_dataset(config, generator=None):
 
         # drop depth dimension
         psf = psf.to(device)
+        mask = None
 
     else:
         # training mask / PSF
@@ -2194,6 +3487,7 @@ def simulate_dataset(config, generator=None):
             crop=crop,
             downsample=config.files.downsample,
             pre_transform=pre_transform,
+            batch_simulation=config.simulation.get("batch_simulation", False),
         )
         test_ds_prop = SimulatedFarFieldDataset(
             dataset=test_ds,
@@ -2206,7 +3500,55 @@ def simulate_dataset(config, generator=None):
             crop=crop,
             downsample=config.files.downsample,
             pre_transform=pre_transform,
+            batch_simulation=config.simulation.get("batch_simulation", False),
         )
+
+        presimulate_dir = config.simulation.get("presimulate_dir", None)
+        if presimulate_dir is not None:
+            # simulate once, noise and quantization are applied when loading
+            # on CPU, as shards are simulated in (forked) worker processes
+            offline_simulator = FarFieldSimulator(
+                psf=psf.cpu(),
+                is_torch=True,
+                **{**config.simulation, "snr_db": None, "quantize": False, "device_conv": "cpu"},
+            )
+            params = {
+                "simulation": dict(config.simulation),
+                "dataset": config.files.dataset,
+                "psf": config.files.psf,
+                "downsample": config.files.downsample,
+                "vertical_shift": config.files.vertical_shift,
+                "horizontal_shift": config.files.horizontal_shift,
+            }
+            presimulated = []
+            for split, ds_prop in [("train", train_ds_prop), ("test", test_ds_prop)]:
+                ds_prop.sim = offline_simulator
+                ds_prop.batch_simulation = False
+                params["n_files"] = len(ds_prop)
+                if isinstance(ds_prop.dataset, Subset):
+                    params["indices"] = hashlib.md5(
+                        np.asarray(ds_prop.dataset.indices).tobytes()
+                    ).hexdigest()
+                key = hashlib.md5(
+                    json.dumps(params, sort_keys=True, default=str).encode()
+                ).hexdigest()
+                root = presimulate_dataset(
+                    ds_prop,
+                    os.path.join(get_original_cwd(), presimulate_dir, key, split),
+                    n_workers=config.simulation.get("presimulate_workers", None),
+                    params=params,
+                )
+                presimulated.append(
+                    PresimulatedDataset(
+                        root,
+                        snr_db=config.simulation.snr_db,
+                        quantize=config.simulation.quantize,
+                        max_val=config.simulation.max_val,
+                        crop=ds_prop.crop,
+                    )
+                )
+            train_ds_prop, test_ds_prop = presimulated
+
     else:
         if config.measure is not None:
 
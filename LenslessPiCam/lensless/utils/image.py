@@ -8,16 +8,15 @@
 
 
 import cv2
-import scipy.signal
+import importlib.util
 import numpy as np
 from lensless.hardware.constants import RPI_HQ_CAMERA_CCM_MATRIX, RPI_HQ_CAMERA_BLACK_LEVEL
 
 try:
     import torch
-    import torchvision.transforms as tf
-    from torchvision.transforms.functional import rgb_to_grayscale, rotate
 
-    torch_available = True
+    # torchvision is slow to import, so only imported when needed
+    torch_available = importlib.util.find_spec("torchvision") is not None
 except ImportError:
     torch_available = False
 
@@ -57,6 +56,8 @@ def resize(img, factor=None, shape=None, interpolation=cv2.INTER_CUBIC):
         return img
 
     if torch_available:
+        import torchvision.transforms as tf
+
         # torch resize expects an input of form [color, depth, width, height]
         tmp = np.moveaxis(img, -1, 0)
         tmp = torch.from_numpy(tmp.copy())
@@ -79,6 +80,7 @@ def resize(img, factor=None, shape=None, interpolation=cv2.INTER_CUBIC):
 
 
 def rotate_HWC(img, angle):
+    from torchvision.transforms.functional import rotate
 
     # to CHW
     img = img.movedim(-1, -3)
@@ -101,6 +103,33 @@ def rotate_HWC(img, angle):
     return img_rot
 
 
+def flip_HWC(img, flip_lr=None, flip_ud=None):
+    """
+    Flip each sample of a batch according to per-sample flags.
+
+    Parameters
+    ----------
+    img : :py:class:`~torch.Tensor`
+        Data of shape (batch, ..., height, width, channels). A batch size of 1 is broadcast
+        to the number of flags, e.g. to flip a single PSF for each sample of a batch.
+    flip_lr : :py:class:`~torch.Tensor`, optional
+        Boolean flags of length batch, whether to flip left-right.
+    flip_ud : :py:class:`~torch.Tensor`, optional
+        Boolean flags of length batch, whether to flip up-down.
+
+    Returns
+    -------
+    :py:class:`~torch.Tensor`
+        Flipped data.
+    """
+    for flags, dim in zip([flip_lr, flip_ud], [-2, -3]):
+        if flags is None:
+            continue
+        flags = torch.as_tensor(flags, device=img.device).reshape(-1, *[1] * (len(img.shape) - 1))
+        img = torch.where(flags, torch.flip(img, dims=(dim,)), img)
+    return img
+
+
 def shift_with_pad(img, shift, pad_mode="constant", axis=(0, 1)):
     n_dim = len(img.shape)
 
@@ -181,6 +210,7 @@ def rgb2gray(rgb, weights=None, keepchanneldim=True):
             use_torch = True
 
     if use_torch:
+        from torchvision.transforms.functional import rgb_to_grayscale
 
         # move channel dimension to third to last
         if len(rgb.shape) == 4:
@@ -287,11 +317,14 @@ def bayer2rgb_cc(
     black_level=RPI_HQ_CAMERA_BLACK_LEVEL,
     ccm=RPI_HQ_CAMERA_CCM_MATRIX,
     nbits_out=None,
+    binning=False,
+    float_dtype=np.float32,
+    out=None,
 ):
     """
     Convert raw Bayer data to RGB with the following steps:
 
-    #. Demosaic with bi-linear interpolation, mapping the Bayer array to RGB.
+    #. Demosaic with bi-linear interpolation, mapping the Bayer array to RGB. If ``binning`` and ``down`` are set, the reduced RGB image is directly obtained by binning the Bayer array (see :py:func:`~lensless.utils.image.bayer_binning`).
     #. Black level removal.
     #. White balancing, applying gains to red and blue channels.
     #. Color correction matrix.
@@ -303,6 +336,8 @@ def bayer2rgb_cc(
         2D Bayer data to convert to RGB.
     nbits : int
         Bit depth of input data.
+    down : int, optional
+        Downsampling factor.
     blue_gain : float
         Blue gain.
     red_gain : float
@@ -313,6 +348,15 @@ def bayer2rgb_cc(
         Color correction matrix. Default is to use that of Raspberry Pi HQ camera.
     nbits_out : int
         Output bit depth. Default is to use that of input.
+    binning : bool, optional
+        Whether to downsample by binning the Bayer array rather than demosaicing at full resolution
+        and then resizing, which is much faster. Only used if ``down`` is set.
+    float_dtype : type, optional
+        Floating point type for color correction. Default is ``np.float32``, which is faster than
+        ``np.float64`` and may differ from it by one quantization level for a few pixels.
+    out : :py:class:`~numpy.ndarray`, optional
+        Pre-allocated output array, of shape (height, width, 3) and of type ``np.uint8`` if
+        ``nbits_out`` is at most 8, otherwise ``np.uint16``.
 
     Returns
     -------
@@ -327,26 +371,82 @@ def bayer2rgb_cc(
     else:
         dtype = np.uint8
 
-    # demosaic Bayer data
-    img = cv2.cvtColor(img, cv2.COLOR_BayerRG2RGB)
+    if down is not None and binning:
+        img = bayer_binning(img, down)
 
-    # downsample
-    if down is not None:
-        img = resize(img[None, ...], factor=1 / down, interpolation=cv2.INTER_CUBIC)[0]
+    else:
+        # demosaic Bayer data
+        img = cv2.cvtColor(img, cv2.COLOR_BayerRG2RGB)
 
-    # correction
-    img = img - black_level
+        # downsample
+        if down is not None:
+            img = resize(img[None, ...], factor=1 / down, interpolation=cv2.INTER_CUBIC)[0]
+
+    # correction, in place on a single (C-contiguous) float buffer
+    img = np.subtract(img, black_level, dtype=float_dtype)
     if red_gain:
         img[:, :, 0] *= red_gain
     if blue_gain:
         img[:, :, 2] *= blue_gain
-    img = img / (2**nbits - 1 - black_level)
-    img[img > 1] = 1
+    np.divide(img, 2**nbits - 1 - black_level, out=img, casting="unsafe")
+    np.minimum(img, 1, out=img)
+
+    # color correction, one pixel per row
+    rgb = np.matmul(img.reshape(-1, 3), ccm.T.astype(float_dtype)).reshape(img.shape)
+    np.clip(rgb, 0, 1, out=rgb)
+    rgb *= 2**nbits_out - 1
+
+    if out is None:
+        return rgb.astype(dtype)
+    assert out.shape == rgb.shape, f"Output buffer of shape {out.shape}, expected {rgb.shape}"
+    assert out.dtype == dtype, f"Output buffer of type {out.dtype}, expected {dtype}"
+    np.copyto(out, rgb, casting="unsafe")
+    return out
 
-    img = (img.reshape(-1, 3, order="F") @ ccm.T).reshape(img.shape, order="F")
-    img[img < 0] = 0
-    img[img > 1] = 1
-    return (img * (2**nbits_out - 1)).astype(dtype)
+
+def bayer_binning(img, down):
+    """
+    Downsample raw Bayer data to RGB by binning, i.e. without demosaicing at full resolution:
+
+    #. Each 2x2 Bayer quad gives one RGB pixel: red and blue values, and average of the two greens.
+    #. If ``down`` is a multiple of 2, blocks of ``down / 2`` x ``down / 2`` pixels are averaged. Otherwise, the binned image is resized with area interpolation.
+
+    The Bayer pattern is the one of :py:func:`~lensless.utils.image.bayer2rgb_cc`, i.e. ``cv2.COLOR_BayerRG2RGB``
+    (blue at the top-left pixel and red at the bottom-right one of each quad).
+
+    Parameters
+    ----------
+    img : :py:class:`~numpy.ndarray`
+        2D Bayer data.
+    down : int or float
+        Downsampling factor, at least 2.
+
+    Returns
+    -------
+    rgb : :py:class:`~numpy.ndarray`
+        RGB data of shape (height / down, width / down, 3), in float32.
+    """
+    assert len(img.shape) == 2, img.shape
+    assert down >= 2, "Binning requires a downsampling factor of at least 2"
+    new_shape = (int(img.shape[0] / down), int(img.shape[1] / down))
+    n_rows, n_cols = img.shape[0] // 2 * 2, img.shape[1] // 2 * 2
+    img = img[:n_rows, :n_cols]
+
+    # 2x2 Bayer quads to RGB
+    rgb = np.empty((n_rows // 2, n_cols // 2, 3), dtype=np.float32)
+    rgb[:, :, 0] = img[1::2, 1::2]
+    np.add(img[0::2, 1::2], img[1::2, 0::2], out=rgb[:, :, 1], dtype=np.float32)
+    rgb[:, :, 1] *= 0.5
+    rgb[:, :, 2] = img[0::2, 0::2]
+
+    # remaining downsampling
+    if down % 2 == 0:
+        block = int(down // 2)
+        rgb = rgb[: new_shape[0] * block, : new_shape[1] * block]
+        rgb = rgb.reshape(new_shape[0], block, new_shape[1], block, 3).mean(axis=(1, 3))
+    elif new_shape != rgb.shape[:2]:
+        rgb = cv2.resize(rgb, dsize=new_shape[::-1], interpolation=cv2.INTER_AREA)
+    return rgb
 
 
 def print_image_info(img):
@@ -410,6 +510,8 @@ def corr2d(im1, im2):
     im2_gray -= np.mean(im2_gray)
 
     # calculate the correlation image; note the flipping of onw of the images
+    import scipy.signal
+
     return scipy.signal.fftconvolve(im1_gray, im2_gray[::-1, ::-1], mode="same")
 
 
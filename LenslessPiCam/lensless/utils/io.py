@@ -39,6 +39,8 @@ def load_image(
     dtype=None,
     normalize=True,
     bgr_input=True,
+    binning=False,
+    reduced_decoding=False,
 ):
     """
     Load image as numpy array.
@@ -80,6 +82,22 @@ def load_image(
         Data type of returned data. Default is to use that of input.
     normalize : bool, default True
         If ``return_float``, whether to normalize data to maximum value of 1.
+    binning : bool, optional
+        If ``bayer`` and ``downsample``, whether to downsample by binning the Bayer data rather than
+        demosaicing at full resolution. See :py:func:`~lensless.utils.image.bayer_binning`.
+    reduced_decoding : bool, optional
+        If ``downsample`` is 2, 4 or 8, whether to downsample PNG / JPEG files while decoding
+        (OpenCV's ``IMREAD_REDUCED_*`` flags), which is faster and uses less memory than decoding
+        at full resolution and then resizing. Default is ``False``. JPEG files are downsampled
+        with DCT scaling, and PNG files with bilinear interpolation without antialiasing, rather
+        than with the antialiased interpolation of :py:func:`~lensless.utils.image.resize`. For
+        natural images, values differ by about 1% of the maximum value on average. For sparse
+        images such as PSFs, peaks are sampled rather than blurred: values can differ by more
+        than the maximum value of the resized image at factors 4 and 8, while the total intensity
+        differs by up to about 10%. It should therefore not be used for PSFs. As downsampling is
+        done first, before any flipping or background subtraction, the pixel grid of odd-sized
+        images can be shifted by a fraction of a pixel. Not used for Bayer data, for a
+        background image (rather than levels), or for images with an alpha channel or a palette.
 
     Returns
     -------
@@ -122,7 +140,15 @@ def load_image(
     elif "npy" in fp or "npz" in fp:
         img = np.load(fp)
     else:
-        img = cv2.imread(fp, cv2.IMREAD_UNCHANGED)
+        img = None
+        if reduced_decoding and downsample is not None and shape is None and not bayer:
+            if np.ndim(bg) <= 1:
+                img = _imread_reduced(fp, downsample)
+        if img is None:
+            img = cv2.imread(fp, cv2.IMREAD_UNCHANGED)
+        else:
+            # already downsampled
+            downsample = None
 
     if bayer:
         assert len(img.shape) == 2, img.shape
@@ -142,14 +168,22 @@ def load_image(
         if nbits_out is None:
             nbits_out = nbits
 
+        down = None
+        if binning and downsample is not None:
+            # downsample before color correction
+            down = downsample
+            downsample = None
+
         img = bayer2rgb_cc(
             img,
             nbits=nbits,
+            down=down,
             blue_gain=blue_gain,
             red_gain=red_gain,
             black_level=black_level,
             ccm=ccm,
             nbits_out=nbits_out,
+            binning=binning,
         )
 
     else:
@@ -207,6 +241,86 @@ def load_image(
     return img
 
 
+def _imread_reduced(fp, downsample):
+    """
+    Decode PNG / JPEG image downsampled by 2, 4 or 8 with OpenCV's reduced decoding, or return
+    None if not possible for this file.
+    """
+    flags = {
+        2: (cv2.IMREAD_REDUCED_GRAYSCALE_2, cv2.IMREAD_REDUCED_COLOR_2),
+        4: (cv2.IMREAD_REDUCED_GRAYSCALE_4, cv2.IMREAD_REDUCED_COLOR_4),
+        8: (cv2.IMREAD_REDUCED_GRAYSCALE_8, cv2.IMREAD_REDUCED_COLOR_8),
+    }
+    if downsample not in flags or os.path.splitext(fp)[1].lower() not in [".png", ".jpg", ".jpeg"]:
+        return None
+
+    # only reads header
+    with Image.open(fp) as header:
+        mode = header.mode
+        width, height = header.size
+    if mode in ["L", "I", "I;16", "I;16B"]:
+        flag = flags[downsample][0]
+    elif mode == "RGB":
+        flag = flags[downsample][1]
+    else:
+        # e.g. alpha channel or palette
+        return None
+    img = cv2.imread(fp, flag | cv2.IMREAD_ANYDEPTH)
+
+    # libjpeg rounds up size, while resizing rounds down
+    new_shape = (int(height / downsample), int(width / downsample))
+    img = img[: new_shape[0], : new_shape[1]]
+    if img.shape[:2] != new_shape:
+        return None
+    return img
+
+
+def load_images(fps, n_workers=None, use_processes=False, **kwargs):
+    """
+    Load multiple images in parallel, with the same options as :py:func:`~lensless.utils.io.load_image`.
+
+    Decoding with ``rawpy`` and OpenCV releases the GIL, so that threads are typically enough.
+    Processes can be used for the remaining processing (e.g. demosaicing and color correction
+    of Bayer data).
+
+    Parameters
+    ----------
+    fps : list of str
+        Full paths to files.
+    n_workers : int, optional
+        Number of threads / processes. Default is the number of CPUs.
+    use_processes : bool, optional
+        Whether to use a process pool instead of a thread pool.
+    **kwargs
+        Options for :py:func:`~lensless.utils.io.load_image`. The output shape must be the same
+        for all files, e.g. by setting ``shape``.
+
+    Returns
+    -------
+    imgs : :py:class:`~numpy.ndarray`
+        Images stacked along the first dimension, in the same order as ``fps``.
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from functools import partial
+
+    assert len(fps) > 0, "No files to load"
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    n_workers = min(n_workers, len(fps))
+
+    load_func = partial(load_image, **kwargs)
+    if n_workers == 1:
+        imgs = [load_func(fp) for fp in fps]
+    else:
+        executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor(max_workers=n_workers) as pool:
+            imgs = list(pool.map(load_func, fps))
+
+    shapes = set(img.shape for img in imgs)
+    assert len(shapes) == 1, f"Images have different shapes {shapes}, set `shape` to resize."
+    return np.stack(imgs)
+
+
 def load_psf(
     fp,
     downsample=1,
@@ -642,6 +756,168 @@ def save_image(img, fp, max_val=255, normalize=True):
     img_tmp.save(fp)
 
 
+def image_stats(fp, saturation_value=255, percentiles=(1, 50, 99)):
+    """
+    Statistics of an image, e.g. to check measurements of a dataset for underexposure and
+    saturation.
+
+    Parameters
+    ----------
+    fp : str
+        Full path to file.
+    saturation_value : int, optional
+        Pixel values at or above this value are counted as saturated.
+    percentiles : tuple, optional
+        Percentiles of the pixel values to compute.
+
+    Returns
+    -------
+    stats : dict
+        Modification time and size of the file (to detect changes), image shape, maximum value,
+        percentiles, number of saturated values, and mean value per channel.
+    """
+    stat = os.stat(fp)
+    img = np.array(Image.open(fp))
+    if len(img.shape) == 2:
+        img = img[..., np.newaxis]
+    return {
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "shape": list(img.shape),
+        "max": img.max().item(),
+        "percentiles": np.percentile(img, percentiles).tolist(),
+        "n_saturated": int(np.sum(img >= saturation_value)),
+        "mean": img.reshape(-1, img.shape[-1]).mean(axis=0).tolist(),
+    }
+
+
+def load_stats_index(index_fp):
+    """
+    Load statistics index of a dataset, as computed by :py:func:`~lensless.utils.io.update_stats_index`.
+
+    Parameters
+    ----------
+    index_fp : str
+        Path to index file.
+
+    Returns
+    -------
+    stats : dict
+        Statistics (see :py:func:`~lensless.utils.io.image_stats`) and matching background
+        file for each file, with paths relative to the directory of the index.
+    params : dict
+        Parameters with which the statistics were computed.
+    """
+    import json
+
+    with open(index_fp, "r") as f:
+        index = json.load(f)
+    return index["files"], index["params"]
+
+
+def update_stats_index(
+    fps,
+    index_fp,
+    n_workers=None,
+    saturation_value=255,
+    percentiles=(1, 50, 99),
+    background_prefix="black_background",
+):
+    """
+    Compute statistics of images with :py:func:`~lensless.utils.io.image_stats` and store them
+    in an index file. Only new or changed files (according to their modification time and size)
+    are processed, such that growing datasets can be analyzed incrementally. Entries of files
+    that no longer exist are removed.
+
+    Parameters
+    ----------
+    fps : list of str
+        Full paths to files.
+    index_fp : str
+        Path to index file (JSON), created if it does not exist. Files are indexed by their path
+        relative to the directory of the index, e.g. the dataset directory.
+    n_workers : int, optional
+        Number of processes. Default is the number of CPUs.
+    saturation_value : int, optional
+        Pixel values at or above this value are counted as saturated.
+    percentiles : tuple, optional
+        Percentiles of the pixel values to compute.
+    background_prefix : str, optional
+        Prefix of the background measurement corresponding to a file, in the same directory.
+
+    Returns
+    -------
+    stats : dict
+        Statistics and matching background file (``None`` if not found) for each file of the
+        index, see :py:func:`~lensless.utils.io.load_stats_index`.
+    """
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    from tqdm import tqdm
+
+    root = os.path.dirname(os.path.abspath(index_fp))
+    params = {"saturation_value": saturation_value, "percentiles": list(percentiles)}
+    files = dict()
+    if os.path.isfile(index_fp):
+        files, index_params = load_stats_index(index_fp)
+        if index_params != params:
+            # recompute all statistics
+            files = dict()
+
+    def save_index():
+        with open(index_fp + ".tmp", "w") as f:
+            json.dump({"params": params, "files": files}, f)
+        os.replace(index_fp + ".tmp", index_fp)
+
+    # remove files that no longer exist
+    files = {k: v for k, v in files.items() if os.path.exists(os.path.join(root, k))}
+
+    # new or changed files
+    keys = [os.path.relpath(os.path.abspath(fp), root) for fp in fps]
+    to_process = []
+    for fp, key in zip(fps, keys):
+        stat = os.stat(fp)
+        entry = files.get(key)
+        if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            to_process.append((fp, key))
+    print(f"Computing statistics of {len(to_process)} / {len(fps)} files...")
+
+    def collect(results):
+        results = tqdm(results, total=len(to_process))
+        for i, ((_, key), stats) in enumerate(zip(to_process, results)):
+            files[key] = stats
+            # save progress regularly, such that an interrupted run can be resumed
+            if (i + 1) % 1000 == 0:
+                save_index()
+
+    if len(to_process) > 0:
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        n_workers = min(n_workers, len(to_process))
+        stats_func = partial(
+            image_stats, saturation_value=saturation_value, percentiles=percentiles
+        )
+        fps_process = [fp for fp, _ in to_process]
+        if n_workers == 1:
+            collect(map(stats_func, fps_process))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                collect(pool.map(stats_func, fps_process, chunksize=16))
+
+    # matching background measurements
+    for key in files:
+        bn = os.path.basename(key)
+        if bn.startswith(background_prefix):
+            files[key]["background"] = None
+            continue
+        bg_key = os.path.join(os.path.dirname(key), background_prefix + bn)
+        files[key]["background"] = bg_key if os.path.exists(os.path.join(root, bg_key)) else None
+
+    save_index()
+    return files
+
+
 def get_dtype(dtype=None, is_torch=False):
     """
     Get dtype for numpy or torch.
@@ -9,7 +9,6 @@
 
 import numpy as np
 import warnings
-import matplotlib.pyplot as plt
 import os
 import json
 
@@ -36,6 +35,7 @@ def plot_image(img, ax=None, gamma=None, normalize=True):
     ax : :py:class:`~matplotlib.axes.Axes`
         Axes on which image is plot.
     """
+    import matplotlib.pyplot as plt
 
     # if we have only 1 depth, remove the axis
     if img.shape[0] == 1:
@@ -138,6 +138,8 @@ def pixel_histogram(img, nbits=None, ax=None, log_scale=True):
     ax : :py:class:`~matplotlib.axes.Axes`
         Axes on which histogram is plot.
     """
+    import matplotlib.pyplot as plt
+
     if ax is None:
         _, ax = plt.subplots()
 
@@ -198,6 +200,7 @@ def plot_cross_section(
     ax : :py:class:`~matplotlib.axes.Axes`
         Axes on which cross-section is plot.
     """
+    import matplotlib.pyplot as plt
 
     if ax is None:
         _, ax = plt.subplots()
@@ -279,6 +282,7 @@ def plot_autocorr2d(vals, pad_mode="reflect", ax=None):
     autocorr : py:class:`~numpy.ndarray`
         Auto-correlation.
     """
+    import matplotlib.pyplot as plt
 
     nbit_plot = 8
     max_val_plot = 2**nbit_plot - 1
@@ -312,6 +316,7 @@ def plot_autocorr_rgb(img, width=3, figsize=None, plot_psf=False, psf_gamma=2.2)
         Width of cross-section to plot. Default is 3dB.
 
     """
+    import matplotlib.pyplot as plt
 
     assert len(img.shape) == 3, "Image must be 3D"
     assert img.shape[2] == 3, "Image must have 3 color channels"
@@ -370,6 +375,7 @@ def compare_models(model_paths, max_epoch=None, linewidth=2, fontsize=18, metric
     metrics : list, optional
         List of metrics to print. Default is ["PSNR", "SSIM", "LPIPS_Vgg"].
     """
+    import matplotlib.pyplot as plt
 
     if metrics is None:
         metrics = ["PSNR", "SSIM", "LPIPS_Vgg"]
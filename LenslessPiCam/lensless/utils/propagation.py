@@ -0,0 +1,179 @@
+# #############################################################################
+# propagation.py
+# =================
+# Authors :
+# Eric BEZZAM [ebezzam@gmail.com]
+# #############################################################################
+
+"""
+Free-space propagation utilities shared by mask design (:py:mod:`lensless.hardware.mask`) and
+programmable masks (:py:mod:`lensless.hardware.slm`).
+"""
+
+
+from collections import OrderedDict
+import numpy as np
+from waveprop.rs import angular_spectrum
+
+try:
+    import torch
+
+    torch_available = True
+except ImportError:
+    torch_available = False
+
+
+# cache of transfer functions for angular spectrum propagation, see `get_transfer_function`
+_transfer_functions = OrderedDict()
+max_cached_transfer_functions = 16
+
+
+def get_transfer_function(shape, d1, wv, dz, bandlimit=True, dtype=np.float32, device=None):
+    """
+    Get transfer function for (band-limited) angular spectrum propagation of a field of a given
+    shape, as used by :py:func:`waveprop.rs.angular_spectrum` (i.e. for the zero-padded field).
+
+    Transfer functions are cached, with up to ``max_cached_transfer_functions`` entries (least
+    recently used are removed first). Returned arrays are shared, so they should not be modified.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape (Ny, Nx) of the field to propagate, without padding.
+    d1 : float or array_like
+        Sampling period (m) of the field.
+    wv : float
+        Wavelength (m).
+    dz : float
+        Propagation distance (m).
+    bandlimit : bool, optional
+        Whether to band-limit the transfer function. Default is True.
+    dtype : type, optional
+        ``np.float32`` or ``np.float64``, for a transfer function in the corresponding complex type.
+    device : str, optional
+        If provided, return a :py:class:`torch.Tensor` on this device. Otherwise a NumPy array.
+
+    Returns
+    -------
+    H : :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`
+        Transfer function of shape (2 * Ny, 2 * Nx).
+    """
+    if torch_available and isinstance(dtype, torch.dtype):
+        dtype = np.float64 if dtype in [torch.float64, torch.complex128] else np.float32
+    d1 = np.broadcast_to(np.array(d1, dtype=float), (2,))
+    key = (
+        tuple(int(n) for n in shape),
+        tuple(d1),
+        float(wv),
+        float(dz),
+        bool(bandlimit),
+        np.dtype(dtype).name,
+        str(device) if device is not None else None,
+    )
+    if key in _transfer_functions:
+        _transfer_functions.move_to_end(key)
+        return _transfer_functions[key]
+
+    H = angular_spectrum(
+        u_in=np.zeros(key[0], dtype=dtype),
+        wv=wv,
+        d1=list(d1),
+        dz=dz,
+        bandlimit=bandlimit,
+        dtype=dtype,
+        return_H=True,
+    )
+    if device is not None:
+        H = torch.from_numpy(H).to(device)
+
+    _transfer_functions[key] = H
+    while len(_transfer_functions) > max_cached_transfer_functions:
+        _transfer_functions.popitem(last=False)
+    return H
+
+
+def clear_transfer_function_cache():
+    """Clear cache of :py:func:`~lensless.utils.propagation.get_transfer_function`."""
+    _transfer_functions.clear()
+
+
+def angular_spectrum_batch(
+    u_in, wavelengths, d1, dz, bandlimit=True, dtype=np.float32, device=None
+):
+    """
+    Band-limited angular spectrum propagation for multiple wavelengths, with a single (stacked) FFT
+    and cached transfer functions (see :py:func:`~lensless.utils.propagation.get_transfer_function`).
+
+    Same output as :py:func:`waveprop.rs.angular_spectrum` for each wavelength.
+
+    Parameters
+    ----------
+    u_in : :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`
+        Input field, of shape (Ny, Nx) if the same for all wavelengths, or of shape (n_wavelengths, Ny, Nx).
+    wavelengths : array_like
+        Wavelengths (m).
+    d1 : float or array_like
+        Sampling period (m) of the input field.
+    dz : float
+        Propagation distance (m).
+    bandlimit : bool, optional
+        Whether to band-limit the transfer function. Default is True.
+    dtype : type, optional
+        ``np.float32`` or ``np.float64``.
+    device : str, optional
+        Device for PyTorch input.
+
+    Returns
+    -------
+    u_out : :py:class:`~numpy.ndarray` or :py:class:`torch.Tensor`
+        Output fields of shape (n_wavelengths, Ny, Nx).
+    """
+    is_torch = torch_available and torch.is_tensor(u_in)
+    d1 = np.broadcast_to(np.array(d1, dtype=float), (2,))
+    Ny, Nx = u_in.shape[-2:]
+    dims = (-2, -1)
+
+    # zero-pad as in `waveprop.util.zero_pad`
+    pad_y = (Ny // 2 + 1 if Ny % 2 else Ny // 2, Ny // 2)
+    pad_x = (Nx // 2 + 1 if Nx % 2 else Nx // 2, Nx // 2)
+    Ny_pad, Nx_pad = Ny + sum(pad_y), Nx + sum(pad_x)
+    if is_torch:
+        device = device if device is not None else u_in.device
+        u_in_pad = torch.nn.functional.pad(u_in.to(device), pad_x + pad_y)
+    else:
+        u_in_pad = np.pad(u_in, [(0, 0)] * (u_in.ndim - 2) + [pad_y, pad_x])
+
+    # transfer functions, stacked along the wavelength dimension
+    H = [
+        get_transfer_function(
+            (Ny, Nx), d1, wv, dz, bandlimit, dtype, device=device if is_torch else None
+        )
+        for wv in wavelengths
+    ]
+
+    # FFT (as `waveprop.util.ft2`), once for all wavelengths
+    fact = d1[0] * d1[1]
+    if is_torch:
+        H = torch.stack(H)
+        U1 = torch.fft.fftshift(
+            torch.fft.fft2(torch.fft.fftshift(u_in_pad * fact, dim=dims)), dim=dims
+        )
+    else:
+        H = np.stack(H)
+        U1 = np.fft.fftshift(np.fft.fft2(np.fft.fftshift(u_in_pad, axes=dims)), axes=dims) * fact
+        U1 = U1.astype(H.dtype)
+
+    # inverse FFT (as `waveprop.util.ift2`)
+    fact = Ny_pad * Nx_pad * (1.0 / (d1[0] * float(Ny_pad))) * (1.0 / (d1[1] * float(Nx_pad)))
+    if is_torch:
+        u_out = torch.fft.ifftshift(
+            torch.fft.ifft2(torch.fft.ifftshift(H * U1 * fact, dim=dims)), dim=dims
+        )
+    else:
+        u_out = np.fft.ifftshift(
+            np.fft.ifft2(np.fft.ifftshift(H * U1 * fact, axes=dims)), axes=dims
+        )
+        u_out = u_out.astype(H.dtype)
+
+    # remove padding
+    return u_out[..., Ny // 2 : Ny // 2 + Ny, Nx // 2 : Nx // 2 + Nx]
@@ -7,6 +7,11 @@
 # #############################################################################
 
 from waveprop.simulation import FarFieldSimulator as FarFieldSimulator_wp
+from waveprop.simulation import resize_torch
+from waveprop.util import prepare_object_plane
+from waveprop.devices import SensorParam
+from waveprop.noise import add_shot_noise
+import numpy as np
 import torch
 
 
@@ -58,6 +63,9 @@ class FarFieldSimulator(FarFieldSimulator_wp):
             Whether to quantize image, by default True.
         """
 
+        # PSF spectrum of `propagate_batch`, computed at first use
+        self._batch_filter_freq = None
+
         if psf is not None:
             assert len(psf.shape) == 4, "PSF must be of shape (depth, height, width, channels)"
 
@@ -138,8 +146,33 @@ class FarFieldSimulator(FarFieldSimulator_wp):
             psf = psf[0]
             assert psf.shape[-1] == 1 or psf.shape[-1] == 3, "PSF must have 1 or 3 channels"
 
+        return self.set_psf(psf)
+
+    def set_psf(self, psf):
+        # reset PSF spectrum of `propagate_batch`
+        self._batch_filter_freq = None
         return super().set_psf(psf)
 
+    def _convolve_batch(self, x):
+        """
+        Convolution with the PSF as done by waveprop, but with FFT shape padded to a size with small
+        prime factors and cropped at the same offsets (instead of 2N-1 which can be a large prime).
+        """
+        from scipy.fft import next_fast_len
+
+        fast_shape = [next_fast_len(int(n), real=True) for n in self.fft_shape]
+        if self._batch_filter_freq is None:
+            self._batch_filter_freq = torch.fft.rfft2(self.psf.to(self.device_conv), s=fast_shape)
+
+        orig_device = x.device
+        x_freq = torch.fft.rfft2(x.to(self.device_conv), s=fast_shape)
+        y = torch.fft.irfft2(self._batch_filter_freq * x_freq, s=fast_shape)
+
+        top = int((self.fft_shape[0] - self.conv_dim[0]) / 2)
+        left = int((self.fft_shape[1] - self.conv_dim[1]) / 2)
+        y = y[..., top : top + self.conv_dim[0], left : left + self.conv_dim[1]]
+        return y.to(orig_device)
+
     def propagate_image(self, obj, return_object_plane=False):
         """
         Parameters
@@ -165,3 +198,86 @@ class FarFieldSimulator(FarFieldSimulator_wp):
             # TODO: not tested, but normally don't need to move dimensions for numpy
             res = super().propagate(obj, return_object_plane)
             return res
+
+    def prepare_object_plane(self, obj):
+        """
+        Resize image to the PSF dimensions for the object height of the simulator, and shift it,
+        i.e. the first step of :py:func:`~lensless.utils.simulation.FarFieldSimulator.propagate_image`
+        without the convolution with the PSF.
+
+        Parameters
+        ----------
+        obj : torch.Tensor
+            Single image to propagate of format HWC.
+
+        Returns
+        -------
+        torch.Tensor
+            Image at object plane of format HWC.
+        """
+
+        assert self.is_torch, "Only supported for pytorch simulator"
+        assert obj.shape[-1] == 1 or obj.shape[-1] == 3, "Image must have 1 or 3 channels"
+
+        if hasattr(self.object_height, "__len__"):
+            object_height = np.random.uniform(low=self.object_height[0], high=self.object_height[1])
+        else:
+            object_height = self.object_height
+
+        object_plane = prepare_object_plane(
+            obj=obj.moveaxis(-1, 0),
+            object_height=object_height,
+            scene2mask=self.scene2mask,
+            mask2sensor=self.mask2sensor,
+            sensor_size=self.sensor[SensorParam.SIZE],
+            sensor_dim=self.conv_dim,
+            random_shift=self.random_shift,
+        )
+        if self.vertical_shift is not None:
+            object_plane = torch.roll(object_plane, self.vertical_shift, dims=1)
+        if self.horizontal_shift is not None:
+            object_plane = torch.roll(object_plane, self.horizontal_shift, dims=2)
+        return object_plane.moveaxis(-3, -1)
+
+    def propagate_batch(self, object_planes):
+        """
+        Propagate a batch of object planes, as returned by
+        :py:func:`~lensless.utils.simulation.FarFieldSimulator.prepare_object_plane`, i.e. the
+        remaining steps of :py:func:`~lensless.utils.simulation.FarFieldSimulator.propagate_image`.
+
+        The convolution with the PSF is done for the whole batch with a single FFT (with a cached PSF
+        spectrum), while noise and quantization are applied per image (as for single images).
+
+        Parameters
+        ----------
+        object_planes : torch.Tensor
+            Images at object plane of format [..., H, W, C].
+
+        Returns
+        -------
+        torch.Tensor
+            Images at sensor plane of format [..., H, W, C].
+        """
+
+        assert self.is_torch, "Only supported for pytorch simulator"
+        assert self.fft_shape is not None, "Simulator should have a psf"
+
+        # channel in third to last dimension as expected by waveprop for pytorch
+        image_plane = self._convolve_batch(object_planes.moveaxis(-1, -3))
+        if self.output_dim is not None:
+            image_plane = resize_torch(image_plane, size=self.output_dim)
+
+        batch_shape = image_plane.shape[:-3]
+        image_plane = image_plane.reshape(-1, *image_plane.shape[-3:])
+        if self.snr_db is not None:
+            image_plane = torch.stack(
+                [add_shot_noise(img, snr_db=self.snr_db) for img in image_plane]
+            )
+        if self.quantize:
+            image_plane = image_plane / image_plane.amax(dim=(-3, -2, -1), keepdim=True)
+            image_plane = image_plane * self.max_val
+            image_plane = image_plane.to(torch.uint8)
+        image_plane = image_plane.to(self.output_dtype)
+
+        image_plane = image_plane.reshape(*batch_shape, *image_plane.shape[-3:])
+        return image_plane.moveaxis(-3, -1)
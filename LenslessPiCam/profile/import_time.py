@@ -0,0 +1,70 @@
+"""
+Benchmark of the time to import lensless, which fails if start-up time regresses.
+
+Each import is done in a fresh interpreter, and the best time over several trials is kept.
+In addition to the (machine-dependent) time limits, we check that heavy dependencies are
+not loaded by imports that do not need them.
+
+```
+python profile/import_time.py
+```
+"""
+
+import json
+import subprocess
+import sys
+
+n_trials = 5
+
+# statement, maximum time (s), modules that should not be loaded
+import_checks = [
+    (
+        "import lensless",
+        0.1,
+        ["torch", "torchvision", "matplotlib", "cv2", "scipy", "wandb", "waveprop"],
+    ),
+    (
+        "import lensless.hardware.constants",
+        0.5,
+        ["torch", "torchvision", "matplotlib", "cv2", "scipy", "wandb", "waveprop"],
+    ),
+    ("from lensless.utils.io import load_image", 3.0, ["torchvision", "matplotlib", "wandb"]),
+    ("from lensless import ADMM", 4.0, ["torchvision", "matplotlib", "wandb"]),
+]
+
+script = """
+import json, sys, time
+start_time = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start_time
+print(json.dumps({{"time": elapsed, "modules": list(sys.modules.keys())}}))
+"""
+
+
+def time_import(statement):
+    out = subprocess.run(
+        [sys.executable, "-c", script.format(statement=statement)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().split("\n")[-1])
+
+
+failures = []
+for statement, max_time, forbidden in import_checks:
+    res = [time_import(statement) for _ in range(n_trials)]
+    best_time = min(r["time"] for r in res)
+    loaded = [mod for mod in forbidden if mod in res[0]["modules"]]
+    print(f"{statement:45} : {best_time:.3f} s (max {max_time} s)")
+
+    if best_time > max_time:
+        failures.append(f"'{statement}' took {best_time:.3f} s (max {max_time} s)")
+    if len(loaded) > 0:
+        failures.append(f"'{statement}' loaded {loaded}")
+
+if len(failures) > 0:
+    print("\nImport time regression:")
+    for failure in failures:
+        print(f"- {failure}")
+    sys.exit(1)
@@ -0,0 +1,289 @@
+"""
+Profile start-up of our tools, i.e. what happens before the first useful work:
+
+- import time per module, by parsing the output of ``python -X importtime`` when loading the script,
+- Hydra config composition time,
+- PSF load time,
+- model construction time.
+
+Results are printed and written to a JSON report. Note that dependencies which are imported lazily
+(e.g. torchvision) are counted in the stage which first needs them.
+
+```
+python profile/startup.py
+python profile/startup.py --tools demo --overrides camera.psf=data/psf/tape_rgb.png recon.torch_device=cpu
+python profile/startup.py --overrides demo:recon.torch_device=cpu train_learning_based:torch_device=cpu
+python profile/startup.py --psf data/psf/diffusercam_psf.tiff --output startup_report.json
+```
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# script, config directory, and config name (as in the `hydra.main` decorator of each script)
+tools = {
+    "demo": {
+        "script": "scripts/recon/demo.py",
+        "config_dir": "configs",
+        "config_name": "demo",
+    },
+    "on_device_capture": {
+        "script": "scripts/measure/on_device_capture.py",
+        "config_dir": "configs",
+        "config_name": "capture",
+    },
+    "train_learning_based": {
+        "script": "scripts/recon/train_learning_based.py",
+        "config_dir": "configs/train",
+        "config_name": "defaults",
+    },
+}
+
+# load script as a module, i.e. run imports and definitions but not the main function
+load_script = """
+import importlib.util
+spec = importlib.util.spec_from_file_location("tool", {script!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Parse output of ``-X importtime``, whose lines are of the form:
+    ``import time: self [us] | cumulative | imported package``
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header
+            continue
+        name = fields[2].rstrip()
+        modules.append(
+            {
+                "module": name.strip(),
+                "level": (len(name) - len(name.lstrip())) // 2,
+                "self_s": int(fields[0]) * 1e-6,
+                "cumulative_s": int(fields[1]) * 1e-6,
+            }
+        )
+    return modules
+
+
+def profile_imports(script, n_top):
+    start_time = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", load_script.format(script=script)],
+        capture_output=True,
+        text=True,
+        cwd=root_dir,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([root_dir, os.environ.get("PYTHONPATH", "")]),
+        },
+    )
+    wall_time = time.perf_counter() - start_time
+    modules = parse_importtime(out.stderr)
+    res = {
+        "wall_time_s": wall_time,
+        "total_s": sum(mod["self_s"] for mod in modules),
+        "n_modules": len(modules),
+        # direct imports of the script
+        "top_level": [mod for mod in modules if mod["level"] == 0],
+        "slowest": sorted(modules, key=lambda mod: mod["cumulative_s"], reverse=True)[:n_top],
+    }
+    if out.returncode != 0:
+        res["error"] = out.stderr.strip().splitlines()[-1]
+    return res
+
+
+def compose_config(tool, overrides):
+    from hydra import compose, initialize_config_dir
+
+    config_dir = os.path.join(root_dir, tools[tool]["config_dir"])
+    start_time = time.perf_counter()
+    with initialize_config_dir(config_dir=config_dir, version_base=None):
+        config = compose(config_name=tools[tool]["config_name"], overrides=overrides)
+    return config, time.perf_counter() - start_time
+
+
+def load_tool_psf(tool, config, psf_fp):
+    """Load PSF as done by the tool, return None if the tool does not need one."""
+    import numpy as np
+    import omegaconf
+    from lensless.utils.io import load_psf
+
+    if tool == "demo":
+        if isinstance(config.camera.psf, omegaconf.dictconfig.DictConfig) and psf_fp is None:
+            import torch
+            from lensless.hardware.trainable_mask import AdafruitLCD
+
+            start_time = time.perf_counter()
+            np.random.seed(config.camera.psf.seed % (2**32 - 1))
+            mask_vals = np.random.uniform(0, 1, config.camera.psf.mask_shape)
+            mask = AdafruitLCD(
+                initial_vals=torch.from_numpy(mask_vals.astype(np.float32)),
+                sensor=config.capture.sensor,
+                slm=config.camera.psf.device,
+                downsample=config.recon.downsample,
+                flipud=config.camera.psf.flipud,
+            )
+            psf = mask.get_psf().detach().numpy()
+            return psf, time.perf_counter() - start_time
+        psf_fp = psf_fp if psf_fp is not None else config.camera.psf
+        downsample = config.recon.downsample
+        dtype = config.recon.dtype
+    elif tool == "train_learning_based":
+        if psf_fp is None:
+            raise ValueError("PSF of training dataset is downloaded, pass a local copy with --psf")
+        downsample = config.files.downsample
+        dtype = "float32"
+    else:
+        return None, None
+
+    start_time = time.perf_counter()
+    psf = load_psf(os.path.join(root_dir, psf_fp), downsample=downsample, dtype=dtype)
+    return psf, time.perf_counter() - start_time
+
+
+def construct_model(tool, config, psf):
+    """Construct reconstruction model as done by the tool, return None if the tool does not have one."""
+    import torch
+
+    if tool == "demo":
+        from lensless import ADMM, FISTA
+
+        if config.recon.use_torch:
+            psf = torch.from_numpy(psf).to(config.recon.torch_device)
+        start_time = time.perf_counter()
+        if config.recon.algo == "fista":
+            FISTA(psf, **config.recon.fista)
+        elif config.recon.algo == "admm":
+            ADMM(psf, **config.recon.admm)
+        elif config.recon.algo == "unrolled":
+            from lensless import UnrolledADMM
+
+            UnrolledADMM(psf, **config.recon.unrolled_admm)
+        else:
+            raise ValueError(f"Unsupported algorithm: {config.recon.algo}")
+        return time.perf_counter() - start_time
+
+    elif tool == "train_learning_based":
+        from lensless import UnrolledADMM
+        from lensless.recon.utils import create_process_network
+
+        device = config.torch_device if torch.cuda.is_available() else "cpu"
+        psf = torch.from_numpy(psf).to(device)
+        start_time = time.perf_counter()
+        processors = dict()
+        for name in ["pre_process", "post_process"]:
+            param = config.reconstruction[name]
+            processors[name], _ = create_process_network(
+                network=param.network,
+                depth=param.depth,
+                nc=param.nc,
+                device=device,
+            )
+        UnrolledADMM(
+            psf,
+            n_iter=config.reconstruction.unrolled_admm.n_iter,
+            **processors,
+        ).to(device)
+        return time.perf_counter() - start_time
+
+    return None
+
+
+def tool_overrides(tool, overrides):
+    """Overrides can be restricted to a tool with the prefix ``tool:``, e.g. ``demo:recon.algo=fista``."""
+    tool_overrides = []
+    for override in overrides:
+        key = override.split("=")[0]
+        if ":" in key:
+            if key.split(":")[0] == tool:
+                tool_overrides.append(override[len(tool) + 1 :])
+        else:
+            tool_overrides.append(override)
+    return tool_overrides
+
+
+def profile_tool(tool, overrides, psf_fp, n_top):
+    report = {"script": tools[tool]["script"], "errors": dict()}
+    overrides = tool_overrides(tool, overrides)
+
+    print(f"\n-- {tool}")
+    report["import"] = profile_imports(tools[tool]["script"], n_top)
+    print(f"import : {report['import']['wall_time_s']:.3f} s")
+    if "error" in report["import"]:
+        report["errors"]["import"] = report["import"].pop("error")
+
+    # remaining stages run in this process, such that import times are not counted again
+    stages = [
+        ("hydra_compose_s", lambda: compose_config(tool, overrides)),
+        ("psf_load_s", lambda: load_tool_psf(tool, report["config"], psf_fp)),
+        ("model_construction_s", lambda: construct_model(tool, report["config"], report["psf"])),
+    ]
+    for stage, func in stages:
+        report[stage] = None
+        try:
+            out = func()
+            if stage == "hydra_compose_s":
+                report["config"], report[stage] = out
+            elif stage == "psf_load_s":
+                report["psf"], report[stage] = out
+            else:
+                report[stage] = out
+        except Exception as e:
+            report["errors"][stage] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(limit=1)
+            break
+        if report[stage] is not None:
+            print(f"{stage[:-2]} : {report[stage]:.3f} s")
+
+    # not serializable
+    report.pop("config", None)
+    psf = report.pop("psf", None)
+    report["psf_shape"] = list(psf.shape) if psf is not None else None
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--tools", nargs="+", default=list(tools.keys()), choices=tools.keys())
+    parser.add_argument(
+        "--overrides",
+        nargs="*",
+        default=[],
+        help="Hydra overrides, optionally prefixed by 'tool:'.",
+    )
+    parser.add_argument("--psf", default=None, help="PSF file (relative to repository root).")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest modules to report.")
+    parser.add_argument("--output", default="startup_report.json")
+    args = parser.parse_args()
+
+    # in-process stages import from the repository
+    sys.path.insert(0, root_dir)
+
+    report = {
+        "date": datetime.now().isoformat(),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "tools": {
+            tool: profile_tool(tool, args.overrides, args.psf, args.top) for tool in args.tools
+        },
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nReport written to {args.output}")
@@ -12,6 +12,12 @@ pip install huggingface_hub
 python scripts/data/upload_dataset_huggingface.py \
 hf_token=... \
 ```
+
+Images are preprocessed (downsampling, 8-bit conversion) with a process pool, and the
+splits are written to Parquet shards one at a time, such that memory does not grow with
+the dataset size. Both stages are resumable: files / shards whose sources have not changed
+(according to their modification time and size) are skipped. Set ``push=False`` to only
+prepare the dataset locally.
 """
 
 import hydra
@@ -19,14 +25,163 @@ from hydra.utils import to_absolute_path
 import time
 import os
 import glob
+import json
+import hashlib
 import numpy as np
-from datasets import Dataset, DatasetDict, Image
-from huggingface_hub import upload_file
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datasets import Features, Image, Value
+from huggingface_hub import upload_file, upload_folder
 from lensless.utils.dataset import natural_sort
 from tqdm import tqdm
 from lensless.utils.io import save_image
 import cv2
-from joblib import Parallel, delayed
+
+
+def file_key(fp):
+    """Key to check whether a file has changed since it was processed."""
+    stat = os.stat(fp)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_manifest(fp):
+    if os.path.exists(fp):
+        with open(fp, "r") as f:
+            return json.load(f)
+    return dict()
+
+
+def save_manifest(manifest, fp):
+    with open(fp + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(fp + ".tmp", fp)
+
+
+def preprocess_image(fp, output_fp, downsample=None, eight_norm=False):
+    # module-level for processing in worker processes
+    img = cv2.imread(fp, cv2.IMREAD_UNCHANGED)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    if downsample is not None:
+        img = cv2.resize(
+            img,
+            (0, 0),
+            fx=1 / downsample,
+            fy=1 / downsample,
+            interpolation=cv2.INTER_LINEAR,
+        )
+
+    # write to temporary file, renamed once complete
+    base, ext = os.path.splitext(output_fp)
+    tmp_fp = base + ".tmp" + ext
+    save_image(img, tmp_fp, normalize=eight_norm)
+    os.replace(tmp_fp, output_fp)
+
+
+def preprocess_images(files, output_dir, ext, n_jobs=1, downsample=None, eight_norm=False):
+    """
+    Downsample and / or convert images to 8-bit with a process pool, skipping files that
+    have already been processed with the same parameters.
+
+    Returns the paths of the processed files, in the same order as ``files``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_fp = os.path.join(output_dir, "preprocess.json")
+    manifest = load_manifest(manifest_fp)
+
+    output_files = []
+    tasks = []
+    for f in files:
+        output_fp = os.path.join(output_dir, os.path.basename(f).split(".")[0] + ext)
+        output_files.append(output_fp)
+        key = file_key(f) + [downsample, eight_norm]
+        if manifest.get(output_fp) != key or not os.path.exists(output_fp):
+            tasks.append((f, output_fp, key))
+    print(f"Preprocessing {len(tasks)} files ({len(files) - len(tasks)} already done)...")
+
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {
+            pool.submit(preprocess_image, f, output_fp, downsample, eight_norm): (output_fp, key)
+            for f, output_fp, key in tasks
+        }
+        for i, future in enumerate(tqdm(as_completed(futures), total=len(futures))):
+            future.result()
+            output_fp, key = futures[future]
+            manifest[output_fp] = key
+            # save progress regularly for resuming
+            if (i + 1) % 500 == 0:
+                save_manifest(manifest, manifest_fp)
+    save_manifest(manifest, manifest_fp)
+
+    return output_files
+
+
+def write_parquet_shards(
+    columns, output_dir, split, image_columns, shard_size=1000, manifest_dir=None
+):
+    """
+    Write split to Parquet shards (in the layout of the Hugging Face Hub), with images
+    embedded as bytes. Only one shard is in memory at a time, and shards whose content
+    has not changed are skipped.
+
+    The manifest of written shards is stored in ``manifest_dir`` (by default the parent of
+    ``output_dir``), such that ``output_dir`` only contains shards and can be loaded with
+    ``load_dataset("parquet", data_dir=output_dir)``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if manifest_dir is None:
+        manifest_dir = os.path.dirname(os.path.abspath(output_dir))
+    manifest_fp = os.path.join(manifest_dir, f"{split}.json")
+    manifest = load_manifest(manifest_fp)
+
+    # features of other columns (e.g. attributes, mask label) inferred from values
+    features = Features(
+        {
+            k: Image() if k in image_columns else Value(str(pa.array(v[:1]).type))
+            for k, v in columns.items()
+        }
+    )
+    schema = features.arrow_schema
+
+    n_files = len(columns[image_columns[0]])
+    n_shards = max(int(np.ceil(n_files / shard_size)), 1)
+    for shard in tqdm(range(n_shards), desc=f"Writing {split} shards"):
+        fn = f"{split}-{shard:05d}-of-{n_shards:05d}.parquet"
+        fp = os.path.join(output_dir, fn)
+        rows = slice(shard * shard_size, (shard + 1) * shard_size)
+        shard_columns = {k: list(v[rows]) for k, v in columns.items()}
+
+        key_data = {
+            k: [file_key(f) + [f] for f in v] if k in image_columns else v
+            for k, v in shard_columns.items()
+        }
+        key = hashlib.md5(json.dumps(key_data, default=str).encode()).hexdigest()
+        if manifest.get(fn) == key and os.path.exists(fp):
+            continue
+
+        for k in image_columns:
+            shard_columns[k] = [
+                {"bytes": open(f, "rb").read(), "path": os.path.basename(f)}
+                for f in shard_columns[k]
+            ]
+        table = pa.Table.from_pydict(shard_columns, schema=schema)
+        # small row groups (as on the Hub), such that examples can be read or streamed
+        # without loading the whole shard
+        pq.write_table(table, fp + ".tmp", row_group_size=100)
+        os.replace(fp + ".tmp", fp)
+        del table, shard_columns
+
+        manifest[fn] = key
+        save_manifest(manifest, manifest_fp)
+
+    # remove shards of a previous run with a different number of shards
+    for fp in glob.glob(os.path.join(output_dir, f"{split}-*.parquet")):
+        if not fp.endswith(f"-of-{n_shards:05d}.parquet"):
+            os.remove(fp)
+
+    return n_files
 
 
 @hydra.main(
@@ -42,8 +197,10 @@ def upload_dataset(config):
     n_files = config.n_files
     multimask = config.multimask
     n_jobs = config.n_jobs
-    assert hf_token is not None, "Please provide a HuggingFace token."
-    assert repo_id is not None, "Please provide a HuggingFace repo_id."
+    push = config.get("push", True)
+    if push:
+        assert hf_token is not None, "Please provide a HuggingFace token."
+        assert repo_id is not None, "Please provide a HuggingFace repo_id."
     assert config.lensless.dir is not None, "Please provide a lensless directory."
     assert config.lensed.dir is not None, "Please provide a lensed directory."
     assert (
@@ -97,50 +254,26 @@ def upload_dataset(config):
             assert os.path.exists(ambient_f), f"File {ambient_f} does not exist."
             background_files.append(ambient_f)
 
-    if config.lensless.downsample is not None:
-
-        if config.lensless.ambient:
-            raise NotImplementedError("Downsampling not implemented for ambient files.")
-
+    # local directory for preprocessed files and Parquet shards
+    tmp_dir = config.get("output_dir", None)
+    if tmp_dir is None:
         tmp_dir = config.lensless.dir + "_tmp"
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        def downsample(f, output_dir):
-            img = cv2.imread(f, cv2.IMREAD_UNCHANGED)
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            img = cv2.resize(
-                img,
-                (0, 0),
-                fx=1 / config.lensless.downsample,
-                fy=1 / config.lensless.downsample,
-                interpolation=cv2.INTER_LINEAR,
-            )
-            new_fp = os.path.join(output_dir, os.path.basename(f))
-            new_fp = new_fp.split(".")[0] + config.lensless.ext
-            save_image(img, new_fp, normalize=False)
+    tmp_dir = to_absolute_path(tmp_dir)
 
-        Parallel(n_jobs=n_jobs)(delayed(downsample)(f, tmp_dir) for f in tqdm(lensless_files))
-        lensless_files = glob.glob(os.path.join(tmp_dir, f"*{config.lensless.ext[1:]}"))
-
-    # convert to normalized 8 bit
-    if config.lensless.eight_norm:
+    # downsample and / or convert to normalized 8 bit
+    if config.lensless.downsample is not None or config.lensless.eight_norm:
 
         if config.lensless.ambient:
-            raise NotImplementedError("Normalized 8-bit not implemented for ambient files.")
-
-        tmp_dir = config.lensless.dir + "_tmp"
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        # -- parallelize with joblib
-        def save_8bit(f, output_dir, normalize=True):
-            img = cv2.imread(f, cv2.IMREAD_UNCHANGED)
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            new_fp = os.path.join(output_dir, os.path.basename(f))
-            new_fp = new_fp.split(".")[0] + config.lensless.ext
-            save_image(img, new_fp, normalize=normalize)
-
-        Parallel(n_jobs=n_jobs)(delayed(save_8bit)(f, tmp_dir) for f in tqdm(lensless_files))
-        lensless_files = glob.glob(os.path.join(tmp_dir, f"*{config.lensless.ext[1:]}"))
+            raise NotImplementedError("Preprocessing not implemented for ambient files.")
+
+        lensless_files = preprocess_images(
+            lensless_files,
+            output_dir=tmp_dir,
+            ext=config.lensless.ext,
+            n_jobs=n_jobs,
+            downsample=config.lensless.downsample,
+            eight_norm=config.lensless.eight_norm,
+        )
 
     # check for attribute
     df_attr = None
@@ -168,7 +301,7 @@ def upload_dataset(config):
         else:
             df_attr = {"mask_label": mask_labels}
 
-    # step 1: create Dataset objects
+    # step 1: create columns of each split
     def create_dataset(lensless_files, lensed_files, df_attr=None, ambient_files=None):
         dataset_dict = {
             "lensless": lensless_files,
@@ -179,12 +312,7 @@ def upload_dataset(config):
             dataset_dict = {**dataset_dict, **df_attr}
         if ambient_files is not None:
             dataset_dict["ambient"] = ambient_files
-        dataset = Dataset.from_dict(dataset_dict)
-        dataset = dataset.cast_column("lensless", Image())
-        dataset = dataset.cast_column("lensed", Image())
-        if ambient_files is not None:
-            dataset = dataset.cast_column("ambient", Image())
-        return dataset
+        return dataset_dict
 
     # train-test split
     test_size = config.test_size
@@ -261,16 +389,26 @@ def upload_dataset(config):
             df_attr_train,
             ambient_files=background_files[n_test:] if config.lensless.ambient else None,
         )
-    print(f"Train size: {len(train_dataset)}")
-    print(f"Test size: {len(test_dataset)}")
+    print(f"Train size: {len(train_dataset['lensless'])}")
+    print(f"Test size: {len(test_dataset['lensless'])}")
 
-    # step 2: create DatasetDict
-    dataset_dict = DatasetDict(
-        {
-            "train": train_dataset,
-            "test": test_dataset,
-        }
-    )
+    # step 2: write Parquet shards
+    image_columns = ["lensless", "lensed"]
+    if config.lensless.ambient:
+        image_columns.append("ambient")
+    data_dir = os.path.join(tmp_dir, "data")
+    for split, dataset in [("train", train_dataset), ("test", test_dataset)]:
+        write_parquet_shards(
+            dataset,
+            output_dir=data_dir,
+            split=split,
+            image_columns=image_columns,
+            shard_size=config.get("shard_size", 1000),
+        )
+
+    if not push:
+        print(f"Dataset prepared in {tmp_dir}, not pushed to the hub.")
+        return
 
     # step 3: push to hub
     if config.files is not None:
@@ -300,7 +438,16 @@ def upload_dataset(config):
                     token=hf_token,
                 )
 
-    dataset_dict.push_to_hub(repo_id, token=hf_token)
+    upload_folder(
+        folder_path=data_dir,
+        path_in_repo="data",
+        repo_id=repo_id,
+        repo_type="dataset",
+        token=hf_token,
+        allow_patterns="*.parquet",
+        # remove shards of a previous upload with a different number of shards
+        delete_patterns="*.parquet",
+    )
 
     upload_file(
         path_or_fileobj=lensless_files[0],
@@ -338,8 +485,8 @@ def upload_dataset(config):
     # total time in minutes
     print(f"Total time: {(time.time() - start_time) / 60} minutes")
 
-    # delete PNG files
-    if config.lensless.eight_norm or config.lensless.downsample:
+    # delete preprocessed files and shards
+    if config.get("output_dir", None) is None:
         os.system(f"rm -rf {tmp_dir}")
 
 
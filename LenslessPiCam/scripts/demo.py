@@ -17,6 +17,7 @@ import omegaconf
 from lensless.hardware.slm import set_programmable_mask, adafruit_sub2full
 from lensless.hardware.trainable_mask import AdafruitLCD
 from torch import from_numpy
+from contextlib import nullcontext
 
 
 @hydra.main(version_base=None, config_path="../configs", config_name="demo")
@@ -68,6 +69,42 @@ def demo(config):
             flipud=flipud,
         )
 
+    # -- PSF for reconstruction
+    if mask is not None:
+        psf = mask.get_psf().detach().numpy()
+        bg = np.zeros(psf.shape[-1])
+    else:
+        psf, bg = load_psf(
+            to_absolute_path(config.camera.psf),
+            downsample=config.recon.downsample,
+            return_float=True,
+            return_bg=True,
+            dtype=config.recon.dtype,
+        )
+        psf = np.array(psf, dtype=config.recon.dtype)
+
+    if config.recon.use_torch:
+        import torch
+
+        if config.recon.dtype == "float32":
+            torch_dtype = torch.float32
+        elif config.recon.dtype == "float64":
+            torch_dtype = torch.float64
+        else:
+            raise ValueError("dtype must be float32 or float64")
+        psf_torch = torch.from_numpy(psf).type(torch_dtype).to(config.recon.torch_device)
+
+    # -- (If trained model) load model in the background while taking the picture
+    model_path = None
+    if config.recon.algo.startswith("hf:"):
+        from lensless.recon.model_dict import download_model, get_model, preload_models
+
+        assert config.recon.use_torch, "Trained models require PyTorch"
+        param = config.recon.algo.split(":")
+        assert len(param) == 4, "hf model requires following format: hf:camera:dataset:model_name"
+        model_path = download_model(camera=param[1], dataset=param[2], model=param[3])
+        preload_models([model_path], psf_torch, device=config.recon.torch_device)
+
     # 3) Take picture
     time.sleep(config.capture.delay)  # for picture to display
 
@@ -212,18 +249,6 @@ def demo(config):
     # 4) Reconstruct
 
     # -- prepare data
-    if mask is not None:
-        psf = mask.get_psf().detach().numpy()
-        bg = np.zeros(psf.shape[-1])
-    else:
-        psf, bg = load_psf(
-            to_absolute_path(config.camera.psf),
-            downsample=config.recon.downsample,
-            return_float=True,
-            return_bg=True,
-            dtype=config.recon.dtype,
-        )
-        psf = np.array(psf, dtype=config.recon.dtype)
     ax = plot_image(psf[0], gamma=config.recon.gamma)
     ax.set_title("PSF")
     if save:
@@ -241,20 +266,15 @@ def demo(config):
     if data.shape != psf.shape:
         # in DiffuserCam dataset, images are already reshaped
         data = resize(data, shape=psf.shape)
-    data /= np.linalg.norm(data.ravel())
+    if model_path is not None:
+        # trained models expect data normalized by its maximum
+        data /= data.max()
+    else:
+        data /= np.linalg.norm(data.ravel())
     data = np.array(data, dtype=config.recon.dtype)
 
     if config.recon.use_torch:
-        import torch
-
-        if config.recon.dtype == "float32":
-            torch_dtype = torch.float32
-        elif config.recon.dtype == "float64":
-            torch_dtype = torch.float64
-        else:
-            raise ValueError("dtype must be float32 or float64")
-
-        psf = torch.from_numpy(psf).type(torch_dtype).to(config.recon.torch_device)
+        psf = psf_torch
         data = torch.from_numpy(data).type(torch_dtype).to(config.recon.torch_device)
         if flipud:
             data = torch.rot90(data, dims=(-3, -2), k=2)
@@ -277,16 +297,21 @@ def demo(config):
             psf,
             **algo_params,
         )
+    elif model_path is not None:
+        # immediate if already loaded in the background
+        algo_params = {"disp_iter": -1}
+        recon = get_model(model_path, psf, device=config.recon.torch_device, verbose=False)
     else:
         raise ValueError(f"Unsupported algorithm: {config.recon.algo}")
 
     recon.set_data(data)
-    res = recon.apply(
-        gamma=config.recon.gamma,
-        save=save,
-        plot=config.plot,
-        disp_iter=algo_params["disp_iter"],
-    )
+    with torch.no_grad() if model_path is not None else nullcontext():
+        res = recon.apply(
+            gamma=config.recon.gamma,
+            save=save,
+            plot=config.plot,
+            disp_iter=algo_params["disp_iter"],
+        )
     print(f"Processing time : {time.time() - start_time} s")
 
     if config.plot:
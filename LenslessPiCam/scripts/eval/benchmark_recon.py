@@ -30,7 +30,7 @@ from lensless import ADMM, FISTA, GradientDescent, NesterovGradientDescent
 from lensless.utils.dataset import DiffuserCamTestDataset, DigiCamCelebA, HFDataset
 from lensless.utils.io import save_image
 from lensless.utils.image import gamma_correction
-from lensless.recon.model_dict import download_model, load_model
+from lensless.recon.model_dict import download_model, get_model, preload_models
 
 import torch
 from torch.utils.data import Subset
@@ -73,6 +73,7 @@ def benchmark_recon(config):
             horizontal_shift=config.files.horizontal_shift,
             simulation_config=config.simulation,
             crop=config.files.crop,
+            reduced_decoding=config.files.get("reduced_decoding", False),
         )
         dataset.psf = dataset.psf.to(device)
         psf = dataset.psf
@@ -133,6 +134,8 @@ def benchmark_recon(config):
             alignment=config.huggingface.alignment,
             simulation_config=config.simulation,
             single_channel_psf=config.huggingface.single_channel_psf,
+            psf_cache=config.huggingface.psf_cache,
+            n_workers=config.huggingface.get("psf_workers", None),
         )
         if benchmark_dataset.multimask:
             # get first PSF for initialization
@@ -147,6 +150,7 @@ def benchmark_recon(config):
     print(f"Data shape :  {benchmark_dataset[0][0].shape}")
 
     model_list = []  # list of algoritms to benchmark
+    hf_options = dict()  # loading options of trained models
     for algo in config.algorithms:
         if algo == "ADMM":
             model_list.append(
@@ -219,6 +223,16 @@ def benchmark_recon(config):
 
             model_path = download_model(camera=camera, dataset=dataset, model=model_name)
             model_list.append((algo, model_path))
+            hf_options[algo] = dict(
+                skip_pre=skip_pre,
+                skip_post=skip_post,
+                return_intermediate=config.save_intermediate,
+            )
+
+    # load trained models in the background, while other algorithms are benchmarked
+    for algo, model_path in model_list:
+        if algo in hf_options:
+            preload_models([model_path], psf, device, **hf_options[algo])
 
     results = {}
     output_dir = None
@@ -287,14 +301,13 @@ def benchmark_recon(config):
             # trained algorithm
             print(f"Running benchmark for {model_name}")
 
-            # -- load model
-            model_obj = load_model(
+            # -- load model (copy, as the PSF is set by the benchmark for multimask datasets)
+            model_obj = get_model(
                 model,  # model path
                 psf,
                 device,
-                skip_pre=skip_pre,
-                skip_post=skip_post,
-                return_intermediate=config.save_intermediate,
+                copy=True,
+                **hf_options[model_name],
             )
             model_obj.eval()
 
@@ -313,6 +326,7 @@ def benchmark_recon(config):
                 snr=config.snr,
                 pnp=pnp,
                 swap_channels=config.swap_channels,
+                num_workers=config.num_workers,
             )
             results[model_name] = result
 
@@ -346,6 +360,7 @@ def benchmark_recon(config):
                     use_background=config.huggingface.use_background,
                     snr=config.snr,
                     swap_channels=config.swap_channels,
+                    num_workers=config.num_workers,
                 )
                 results[model_name][int(n_iter)] = result
 
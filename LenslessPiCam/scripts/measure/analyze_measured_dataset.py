@@ -1,6 +1,10 @@
 """
 Check maximum pixel value of images and check for saturation / underexposure.
 
+Statistics of each file are stored in an index (by default ``stats_index.json`` in the dataset
+folder), such that only new or changed files are loaded in subsequent runs. The index can be
+loaded from Python with :py:func:`lensless.utils.io.load_stats_index`.
+
 ```
 python scripts/measure/analyze_measured_dataset.py dataset_path=PATH
 ```
@@ -10,12 +14,10 @@ import hydra
 from hydra.utils import to_absolute_path
 import glob
 import os
-from PIL import Image
-import numpy as np
 import matplotlib.pyplot as plt
 import time
-import tqdm
 import re
+from lensless.utils.io import update_stats_index
 
 
 def convert(text):
@@ -33,16 +35,15 @@ def natural_sort(arr):
 @hydra.main(version_base=None, config_path="../../configs", config_name="analyze_dataset")
 def analyze_dataset(config):
 
-    folder = config.dataset_path
+    assert (
+        config.dataset_path is not None
+    ), "Must specify folder to analyze in config or through command line (folder=PATH)."
+    folder = to_absolute_path(config.dataset_path)
     desired_range = config.desired_range
     delete_bad = config.delete_bad
     start_idx = config.start_idx
     saturation_percent = config.saturation_percent
 
-    assert (
-        folder is not None
-    ), "Must specify folder to analyze in config or through command line (folder=PATH)."
-
     # get all PNG files in folder
     files = natural_sort(glob.glob(os.path.join(folder, "*.png")))
     print("Found {} files".format(len(files)))
@@ -53,16 +54,33 @@ def analyze_dataset(config):
         files = files[: config.n_files]
         print("Analyzing first {} files".format(len(files)))
 
+    # statistics of new or changed files, and matching background measurements
+    background_prefix = "black_background"
+    index_fp = config.get("index_fp", None)
+    if index_fp is None:
+        index_fp = os.path.join(folder, "stats_index.json")
+    else:
+        index_fp = to_absolute_path(index_fp)
+    start_time = time.time()
+    stats = update_stats_index(
+        files,
+        index_fp,
+        n_workers=config.get("n_workers", None),
+        saturation_value=desired_range[1],
+        background_prefix=background_prefix,
+    )
+    root = os.path.dirname(index_fp)
+
     # loop over files for maximum value
     max_vals = []
     n_bad_files = 0
     bad_files = []
-    start_time = time.time()
-    for fn in tqdm.tqdm(files):
-        im = np.array(Image.open(fn))
-        max_val = im.max()
+    for fn in files:
+        file_stats = stats[os.path.relpath(fn, root)]
+        max_val = file_stats["max"]
         max_vals.append(max_val)
-        saturation_ratio = np.sum(im >= desired_range[1]) / im.size
+        n_values = file_stats["shape"][0] * file_stats["shape"][1] * file_stats["shape"][2]
+        saturation_ratio = file_stats["n_saturated"] / n_values
 
         if max_val < desired_range[0]:
             n_bad_files += 1
@@ -123,19 +141,18 @@ def analyze_dataset(config):
         else:
             print("Not deleting bad files")
 
-    # check for matching background file
-    files_bg = natural_sort(glob.glob(os.path.join(folder, "black_background*.png")))
+    # check for matching background file, as found when indexing
+    files_bg = [fn for fn in files if os.path.basename(fn).startswith(background_prefix)]
     # -- remove files_bg from files
     files = [fn for fn in files if fn not in files_bg]
 
     if len(files_bg) > 0:
         print("Found {} background files".format(len(files_bg)))
-        # detect files that don't have background
+        # detect files that don't have background (or whose background was just deleted)
         files_no_bg = []
         for fn in files:
-            bn = os.path.basename(fn).split(".")[0]
-            _bg_file = os.path.join(folder, "black_background{}.png".format(bn))
-            if _bg_file not in files_bg:
+            bg_key = stats[os.path.relpath(fn, root)]["background"]
+            if bg_key is None or not os.path.exists(os.path.join(root, bg_key)):
                 files_no_bg.append(fn)
 
         print("Found {} files without background".format(len(files_no_bg)))
@@ -387,6 +387,7 @@ def capture_screen(
                 black_level=RPI_HQ_CAMERA_BLACK_LEVEL,
                 ccm=RPI_HQ_CAMERA_CCM_MATRIX,
                 nbits_out=8,
+                binning=config.capture.binning,
             )
 
             # if down:
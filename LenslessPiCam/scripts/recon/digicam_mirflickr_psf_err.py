@@ -6,7 +6,7 @@ from lensless.utils.dataset import HFDataset
 import os
 from lensless.utils.io import save_image
 from tqdm import tqdm
-from lensless.recon.model_dict import download_model, load_model
+from lensless.recon.model_dict import download_model, get_model
 import numpy as np
 from torchmetrics import StructuralSimilarityIndexMeasure
 from torchmetrics.image import lpip, psnr
@@ -101,6 +101,8 @@ def apply_pretrained(config):
         for mask_label in test_set.psf.keys():
             psf_norms.append(np.mean(test_set.psf[mask_label].cpu().numpy().flatten() ** 2))
         psf_norms = np.array(psf_norms)
+        # PSF to load model with, replaced by the perturbed PSFs
+        psf_ref = next(iter(test_set.psf.values())).to(device)
 
         n_files = config.n_files
         if n_files is None:
@@ -184,8 +186,9 @@ def apply_pretrained(config):
                 if model_name == "admm":
                     recon = ADMM(psf, n_iter=config.n_iter)
                 else:
-                    # load best model
-                    recon = load_model(model_path, psf, device, verbose=False)
+                    # copy of best model (loaded once), with perturbed PSF
+                    recon = get_model(model_path, psf_ref, device, copy=True, verbose=False)
+                    recon._set_psf(psf)
 
                 # reconstruct
                 with torch.no_grad():
@@ -22,7 +22,7 @@ from hydra.utils import get_original_cwd, to_absolute_path
 import os
 import numpy as np
 import time
-from lensless.utils.image import shift_with_pad
+from lensless.utils.image import flip_HWC, shift_with_pad
 from lensless.hardware.trainable_mask import prep_trainable_mask
 from lensless import ADMM, UnrolledFISTA, UnrolledADMM, TrainableInversion, SVDeconvNet
 from lensless.recon.multi_wiener import MultiWiener
@@ -31,7 +31,9 @@ from lensless.utils.dataset import (
     DiffuserCamMirflickr,
     DigiCamCelebA,
     HFDataset,
+    HFStreamingDataset,
     MyDataParallel,
+    ParquetShards,
     simulate_dataset,
     HFSimulated,
 )
@@ -143,6 +145,7 @@ def train_learned(config):
             horizontal_shift=config.files.horizontal_shift,
             simulation_config=config.simulation,
             crop=config.files.crop,
+            reduced_decoding=config.files.get("reduced_decoding", False),
             input_snr=config.files.input_snr,
         )
         crop = dataset.crop
@@ -208,6 +211,15 @@ def train_learned(config):
                 dataset, [train_size, test_size], generator=generator
             )
 
+        parquet_dir = config.files.get("parquet_dir", None)
+        if parquet_dir is not None:
+            # read local shards lazily, and stream the train split
+            assert config.files.split_seed is None, "Local shards are read with their own split"
+            assert config.files.n_files is None, "Number of files cannot be set for local shards"
+            assert not config.files.hf_simulated, "Streaming not supported for simulated dataset"
+            split_train = ParquetShards(to_absolute_path(parquet_dir), "train")
+            split_test = ParquetShards(to_absolute_path(parquet_dir), "test")
+
         if config.files.hf_simulated:
             # simulate lensless by using measured PSF
             train_set = HFSimulated(
@@ -258,7 +270,17 @@ def train_learned(config):
                 ),
                 input_snr=config.files.input_snr,
                 psf_snr=config.files.psf_snr,
+                preprocess_cache=config.files.preprocess_cache,
+                preprocess_cache_dtype=config.files.preprocess_cache_dtype,
+                psf_cache=config.files.psf_cache,
+                n_workers=config.files.get("psf_workers", None),
             )
+            if parquet_dir is not None:
+                train_set = HFStreamingDataset(
+                    train_set,
+                    shuffle_buffer=config.files.get("shuffle_buffer", 1000),
+                    prefetch=config.files.get("stream_prefetch", 2),
+                )
 
         test_set = HFDataset(
             huggingface_repo=config.files.dataset,
@@ -285,6 +307,10 @@ def train_learned(config):
             force_rgb=config.files.force_rgb,
             simulate_lensless=False,  # in general evaluate on measured (set to False)
             input_snr=config.files.input_snr,
+            preprocess_cache=config.files.preprocess_cache,
+            preprocess_cache_dtype=config.files.preprocess_cache_dtype,
+            psf_cache=config.files.psf_cache,
+            n_workers=config.files.get("psf_workers", None),
         )
 
         if config.files.psf_snr is not None:
@@ -358,14 +384,15 @@ def train_learned(config):
                 lensed = return_items[1]
                 if test_set.bg_sim is not None or test_set.measured_bg:
                     background = return_items[-1]
-                if test_set.multimask or test_set.random_flip:
+                if test_set.multimask:
                     psf_recon = return_items[2]
                     psf_recon = psf_recon.to(device)
                 else:
                     psf_recon = psf.clone()
                 if test_set.random_flip:
-                    flip_lr = return_items[3]
-                    flip_ud = return_items[4]
+                    flip_lr = return_items[3 if test_set.multimask else 2]
+                    flip_ud = return_items[4 if test_set.multimask else 3]
+                    psf_recon = flip_HWC(psf_recon, flip_lr=flip_lr, flip_ud=flip_ud)
 
                 rotate_angle = False
                 if config.files.random_rotate:
@@ -751,6 +778,9 @@ def train_learned(config):
         n_epoch=config.training.epoch,
         random_rotate=config.files.random_rotate,
         random_shift=config.files.random_shifts,
+        num_workers=config.training.num_workers,
+        persistent_workers=config.training.persistent_workers,
+        prefetch_factor=config.training.prefetch_factor,
     )
 
     trainer.train(n_epoch=config.training.epoch, save_pt=save, disp=config.eval_disp_idx)
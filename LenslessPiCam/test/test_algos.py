@@ -1,4 +1,5 @@
 import pytest
+import os
 from lensless.utils.io import load_data
 import numpy as np
 
@@ -227,3 +228,234 @@ def test_trainable_batch(algorithm):
         assert res1.dtype == psf.dtype, f"Got {res1.dtype}, expected {dtype}"
         assert recon._n_iter == _n_iter
         assert len(psf.shape) == 4
+
+
+@pytest.mark.parametrize("algorithm", trainable_algos)
+def test_trainable_random_flip(algorithm):
+    # test if flip flags give the same result as flipped PSFs
+    if not torch_is_available:
+        return
+    psf = torch.rand(1, 34, 64, 3)
+    data = torch.rand(4, 1, 34, 64, 3)
+    flip_lr = torch.tensor([[False], [True], [False], [True]])
+    flip_ud = torch.tensor([[False], [False], [True], [True]])
+    psfs = torch.stack(
+        [
+            psf,
+            torch.flip(psf, dims=(-2,)),
+            torch.flip(psf, dims=(-3,)),
+            torch.flip(psf, dims=(-3, -2)),
+        ]
+    )
+
+    recon = algorithm(psf, n_iter=_n_iter)
+    res1 = recon.forward(data, psfs=psfs)
+    res2 = recon.forward(data, flip_lr=flip_lr, flip_ud=flip_ud)
+    torch.testing.assert_close(res1, res2)
+
+
+@pytest.mark.parametrize("window", ["hann", "linear"])
+def test_tiled_denoiser(window):
+    # tiled inference should be close to processing the whole image at once
+    if not torch_is_available:
+        return
+    from lensless.recon.utils import apply_denoiser
+    from lensless.recon.drunet.network_unet import UNetRes
+
+    torch.manual_seed(0)
+    model = UNetRes(in_nc=4, out_nc=3, nc=[8, 16, 32, 64], nb=1).eval()
+    image = torch.rand(2, 1, 256, 256, 3)
+    res_full = apply_denoiser(model, image)
+    res_tiled = apply_denoiser(
+        model, image, tile_size=128, tile_overlap=32, tile_window=window, tile_batch_size=3
+    )
+    assert res_tiled.shape == res_full.shape
+    torch.testing.assert_close(res_tiled, res_full, atol=2e-2, rtol=0)
+
+
+@pytest.mark.parametrize("zipfile", [True, False])
+def test_load_state_dict(tmp_path, zipfile):
+    # zipfile checkpoints are memory-mapped, legacy ones are read as a whole
+    if not torch_is_available:
+        return
+    from lensless.recon.model_dict import load_state_dict
+    from lensless.recon.drunet.network_unet import UNetRes
+
+    torch.manual_seed(0)
+    model = UNetRes(in_nc=4, out_nc=3, nc=[8, 16, 32, 64], nb=1)
+    checkpoint = str(tmp_path / "model.pt")
+    torch.save(model.state_dict(), checkpoint, _use_new_zipfile_serialization=zipfile)
+
+    state_dict = load_state_dict(checkpoint, mmap=True)
+    assert state_dict.keys() == model.state_dict().keys()
+    for key, val in model.state_dict().items():
+        torch.testing.assert_close(state_dict[key], val)
+
+    # parameters are copied out of the memory-mapped file
+    model_loaded = UNetRes(in_nc=4, out_nc=3, nc=[8, 16, 32, 64], nb=1)
+    model_loaded.load_state_dict(state_dict)
+    os.remove(checkpoint)
+    for key, val in model.state_dict().items():
+        torch.testing.assert_close(model_loaded.state_dict()[key], val)
+
+
+def test_model_registry(tmp_path, monkeypatch):
+    if not torch_is_available:
+        return
+    from omegaconf import OmegaConf
+    from lensless.recon import model_dict
+
+    # model folder as written by the training script
+    config = OmegaConf.load(
+        os.path.join(os.path.dirname(__file__), "..", "configs", "train", "defaults.yaml")
+    )
+    config.reconstruction.unrolled_admm.n_iter = 2
+    model_path = str(tmp_path / "model")
+    os.makedirs(os.path.join(model_path, ".hydra"))
+    OmegaConf.save(config, os.path.join(model_path, ".hydra", "config.yaml"))
+    torch.manual_seed(0)
+    psf = torch.rand(1, 32, 48, 3)
+    model = UnrolledADMM(psf, n_iter=2)
+    with torch.no_grad():
+        model._mu1_p.mul_(2)
+    torch.save(model.state_dict(), os.path.join(model_path, "recon_epochBEST"))
+
+    n_loads = []
+
+    def load_model(*args, **kwargs):
+        n_loads.append(kwargs)
+        return model_dict_load_model(*args, **kwargs)
+
+    model_dict_load_model = model_dict.load_model
+    monkeypatch.setattr(model_dict, "load_model", load_model)
+    model_dict.clear_model_cache()
+
+    # loaded once, then same object
+    recon = model_dict.get_model(model_path, psf, verbose=False)
+    torch.testing.assert_close(recon._mu1_p, model._mu1_p)
+    assert model_dict.get_model(model_path, psf) is recon
+    assert len(n_loads) == 1
+
+    # copy for callers modifying the model
+    recon_copy = model_dict.get_model(model_path, psf, copy=True)
+    assert recon_copy is not recon
+    recon_modified = model_dict.get_model(model_path, psf, copy=True)
+    with torch.no_grad():
+        recon_modified._mu1_p.zero_()
+    torch.testing.assert_close(recon._mu1_p, model._mu1_p)
+    assert len(n_loads) == 1
+
+    # other options or PSF are loaded again
+    assert model_dict.get_model(model_path, psf, skip_post=True) is not recon
+    assert len(n_loads) == 2
+    psf_new = torch.rand(1, 32, 48, 3)
+    recon_new = model_dict.get_model(model_path, psf_new)
+    torch.testing.assert_close(recon_new._psf, psf_new)
+    assert len(n_loads) == 3
+
+    # setting the PSF of a copy is the same as loading with that PSF
+    recon_copy._set_psf(psf_new)
+    data = torch.rand(1, 32, 48, 3)
+    with torch.no_grad():
+        res = []
+        for _recon in [recon_copy, recon_new]:
+            _recon.set_data(data)
+            res.append(_recon.apply(disp_iter=-1, save=False, gamma=None, plot=False))
+    torch.testing.assert_close(res[0], res[1])
+    assert len(n_loads) == 3
+
+    # preloading in background
+    model_dict.clear_model_cache()
+    model_dict.preload_models([model_path], psf).join()
+    assert len(n_loads) == 4 and n_loads[-1]["verbose"] is False
+    model_dict.get_model(model_path, psf)
+    assert len(n_loads) == 4
+    model_dict.clear_model_cache()
+
+
+@pytest.mark.parametrize("backend", ["fbgemm", "qnnpack"])
+def test_quantize_process_network(backend):
+    if not torch_is_available or backend not in torch.backends.quantized.supported_engines:
+        return
+    from lensless.recon.utils import QuantizedProcess, quantize_process_network
+    from lensless.recon.drunet.network_unet import UNetRes
+
+    def get_input(batch_size):
+        # image and noise level channel
+        image = torch.rand(batch_size, 3, 64, 64)
+        return torch.cat([image, torch.full((batch_size, 1, 64, 64), 0.05)], dim=1)
+
+    torch.manual_seed(0)
+    model = UNetRes(in_nc=4, out_nc=3, nc=[8, 16, 32, 64], nb=1).eval()
+    calibration_data = [get_input(2) for _ in range(8)]
+    original_engine = torch.backends.quantized.engine
+    quantized = quantize_process_network(model, calibration_data, backend=backend)
+    assert isinstance(quantized, QuantizedProcess)
+    assert torch.backends.quantized.engine == original_engine
+    assert any("quantized" in type(m).__module__ for m in quantized.modules())
+
+    x = get_input(2)
+    with torch.no_grad():
+        res_float = model(x)
+        res_quantized = quantized(x)
+    assert res_quantized.shape == res_float.shape
+    assert torch.norm(res_quantized - res_float) / torch.norm(res_float) < 0.1
+
+
+def test_quantize_recon_process():
+    if not torch_is_available or "fbgemm" not in torch.backends.quantized.supported_engines:
+        return
+    from torch.nn import MSELoss
+    from lensless.recon.utils import (
+        QuantizedProcess,
+        benchmark_quantization,
+        create_process_network,
+        quantize_recon_process,
+    )
+
+    class PairDataset(torch.utils.data.Dataset):
+        # minimal dataset of (lensless, lensed) pairs, as expected by `benchmark`
+        measured_bg = False
+        multimask = False
+        random_flip = False
+
+        def __init__(self, n_files, shape):
+            self.lensless = torch.rand(n_files, 1, *shape)
+            self.lensed = torch.rand(n_files, 1, *shape)
+
+        def __len__(self):
+            return len(self.lensless)
+
+        def __getitem__(self, idx):
+            return self.lensless[idx], self.lensed[idx]
+
+    torch.manual_seed(0)
+    shape = (32, 48, 3)
+    psf = torch.rand(1, *shape)
+    dataset = PairDataset(2, shape)
+    post_process, _ = create_process_network("UnetRes", depth=1, nc=[8, 16, 32, 64])
+    recon = UnrolledADMM(psf, n_iter=2, post_process=post_process)
+    original_engine = torch.backends.quantized.engine
+
+    # benchmark before and after quantization, original processor restored
+    metrics = {"MSE": MSELoss()}
+    results = benchmark_quantization(recon, dataset, n_calibration=2, metrics=metrics)
+    assert set(results.keys()) == {"float32", "int8"}
+    for res in results.values():
+        assert res["time"] > 0
+        assert np.isfinite(res["MSE"])
+    assert abs(results["int8"]["MSE"] - results["float32"]["MSE"]) < 0.1 * results["float32"]["MSE"]
+    assert recon.post_process_model is post_process
+    assert torch.backends.quantized.engine == original_engine
+
+    # quantization in place
+    lensless = dataset[0][0][None]
+    with torch.no_grad():
+        res_float = recon.forward(lensless)
+    quantize_recon_process(recon, dataset, n_calibration=2)
+    assert isinstance(recon.post_process_model, QuantizedProcess)
+    assert torch.backends.quantized.engine == original_engine
+    with torch.no_grad():
+        res_quantized = recon.forward(lensless)
+    assert res_quantized.shape == res_float.shape
+    assert torch.norm(res_quantized - res_float) / torch.norm(res_float) < 0.1
@@ -0,0 +1,561 @@
+import os
+import glob
+import pickle
+import cv2
+import numpy as np
+import torch
+from lensless.utils.simulation import FarFieldSimulator
+from lensless.utils.dataset import (
+    HFDataset,
+    HFStreamingDataset,
+    MeasuredDataset,
+    ParquetShards,
+    PairedContainerDataset,
+    PairedContainerWriter,
+    PresimulatedDataset,
+    PSFBank,
+    SimulatedFarFieldDataset,
+    create_dataloader,
+    presimulate_dataset,
+    write_paired_container,
+)
+
+
+def test_propagate_batch():
+    # batch simulation should match per-image simulation, also after changing the PSF
+    torch.manual_seed(0)
+    simulator = FarFieldSimulator(
+        psf=torch.rand(1, 32, 48, 3),
+        object_height=0.3,
+        scene2mask=0.4,
+        mask2sensor=0.002,
+        sensor="rpi_hq",
+        is_torch=True,
+        quantize=False,
+    )
+    obj = torch.rand(40, 50, 3)
+    for _ in range(2):
+        res = simulator.propagate_image(obj)
+        res_batch = simulator.propagate_batch(simulator.prepare_object_plane(obj)[None])
+        assert res_batch.shape == (1, *res.shape)
+        torch.testing.assert_close(res_batch[0], res, atol=1e-3, rtol=1e-4)
+
+        simulator.set_point_spread_function(torch.rand(1, 32, 48, 3))
+
+
+def test_psf_bank(tmp_path):
+    psfs = {label: torch.rand(1, 12, 16, 3) for label in [3, 10, 7]}
+    fp = str(tmp_path / "psf_bank.npy")
+    PSFBank.create(fp, psfs)
+
+    bank = PSFBank.load(fp)
+    assert len(bank) == 3
+    assert bank.keys() == [3, 10, 7]
+    assert 10 in bank and 4 not in bank
+    assert bank.shape == (1, 12, 16, 3)
+    # PSFs are only loaded when accessed
+    assert len(bank._psfs) == 0
+    torch.testing.assert_close(bank[10], psfs[10])
+    assert list(bank._psfs.keys()) == [10]
+
+    # memory-mapped file and loaded PSFs are not pickled
+    bank = pickle.loads(pickle.dumps(bank))
+    assert bank._data is None
+    assert len(bank._psfs) == 0
+    for label, psf in bank.items():
+        torch.testing.assert_close(psf, psfs[label])
+
+
+def _write_shards(data_dir, n_files, shard_size, row_group_size):
+    # local dataset repository: Parquet shards (as on the Hub) and PSF
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from datasets import Features, Image, Value
+
+    features = Features({"lensless": Image(), "lensed": Image(), "index": Value("int64")})
+    os.makedirs(os.path.join(data_dir, "data"))
+    for start in range(0, n_files, shard_size):
+        indices = range(start, min(start + shard_size, n_files))
+        # index encoded in pixel values
+        images = [
+            {"bytes": cv2.imencode(".png", np.full((12, 16, 3), i, dtype=np.uint8))[1].tobytes()}
+            for i in indices
+        ]
+        table = pa.Table.from_pydict(
+            {"lensless": images, "lensed": images, "index": list(indices)},
+            schema=features.arrow_schema,
+        )
+        fp = os.path.join(data_dir, "data", f"train-{start // shard_size:05d}.parquet")
+        pq.write_table(table, fp, row_group_size=row_group_size)
+    psf = np.zeros((12, 16, 3), dtype=np.uint8)
+    psf[4:8, 6:10] = 255
+    cv2.imwrite(os.path.join(data_dir, "psf.png"), psf)
+
+
+def _indices(batches):
+    return [int(i) for lensless, *_ in batches for i in torch.round(lensless[:, 0, 0, 0, 0] * 255)]
+
+
+def test_parquet_streaming(tmp_path):
+    n_files = 45
+    _write_shards(str(tmp_path), n_files, shard_size=20, row_group_size=8)
+
+    # lazy random access
+    shards = ParquetShards(str(tmp_path), "train")
+    assert len(shards) == n_files
+    assert len(shards.row_groups) == 7
+    assert shards.column("index") == list(range(n_files))
+    for i in [0, 17, 44, 3]:
+        assert shards[i]["index"] == i
+        assert np.all(np.array(shards[i]["lensless"]) == i)
+    dataset = HFDataset(str(tmp_path), split=shards, psf="psf.png")
+    assert len(dataset) == n_files
+
+    # in order without shuffling
+    stream = HFStreamingDataset(dataset, shuffle=False, prefetch=0)
+    assert _indices([(lensless[None], lensed) for lensless, lensed in stream]) == list(
+        range(n_files)
+    )
+
+    # row groups are split among workers
+    dataloader = create_dataloader(
+        HFStreamingDataset(dataset, shuffle=False), batch_size=4, num_workers=2
+    )
+    assert sorted(_indices(dataloader)) == list(range(n_files))
+
+    # new order at every epoch, also with persistent workers
+    for persistent_workers in [False, True]:
+        stream = HFStreamingDataset(dataset, shuffle_buffer=10)
+        dataloader = create_dataloader(
+            stream, batch_size=4, num_workers=2, persistent_workers=persistent_workers
+        )
+        orders = [_indices(dataloader) for _ in range(3)]
+        for order in orders:
+            assert sorted(order) == list(range(n_files))
+        assert orders[0] != orders[1] and orders[1] != orders[2]
+
+
+def test_upload_dataset(tmp_path, monkeypatch):
+    # preprocessing, Parquet shards and resuming, with the upload to the Hub stubbed
+    import sys
+    from datasets import load_dataset
+    from omegaconf import OmegaConf
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "data"))
+    import upload_dataset_huggingface as upload
+
+    uploads = []
+    monkeypatch.setattr(upload, "upload_file", lambda **kwargs: uploads.append(kwargs))
+    monkeypatch.setattr(upload, "upload_folder", lambda **kwargs: uploads.append(kwargs))
+
+    n_files = 12
+    lensless_dir = tmp_path / "lensless"
+    lensed_dir = tmp_path / "lensed"
+    os.makedirs(lensless_dir)
+    os.makedirs(lensed_dir)
+    rng = np.random.default_rng(0)
+    for i in range(n_files):
+        cv2.imwrite(
+            str(lensless_dir / f"{i}.png"),
+            rng.integers(0, 4096, (24, 32, 3), dtype=np.uint16),
+        )
+        cv2.imwrite(str(lensed_dir / f"{i}.png"), np.full((12, 16, 3), i, dtype=np.uint8))
+
+    config = OmegaConf.load(
+        os.path.join(
+            os.path.dirname(__file__), "..", "configs", "dataset", "upload_dataset_huggingface.yaml"
+        )
+    )
+    config.repo_id = "user/dataset"
+    config.hf_token = "token"
+    config.n_jobs = 2
+    config.shard_size = 5
+    config.output_dir = str(tmp_path / "output")
+    config.lensless.dir = str(lensless_dir)
+    config.lensless.ext = ".png"
+    config.lensless.downsample = 2
+    config.lensless.eight_norm = True
+    config.lensed.dir = str(lensed_dir)
+    config.lensed.ext = ".png"
+    upload.upload_dataset(config)
+
+    # only shards in data directory, which is uploaded with removal of stale shards
+    data_dir = os.path.join(config.output_dir, "data")
+    assert sorted(os.listdir(data_dir)) == [
+        "test-00000-of-00001.parquet",
+        "train-00000-of-00003.parquet",
+        "train-00001-of-00003.parquet",
+        "train-00002-of-00003.parquet",
+    ]
+    assert os.path.exists(os.path.join(config.output_dir, "train.json"))
+    assert os.path.exists(os.path.join(config.output_dir, "test.json"))
+    folder_upload = [kwargs for kwargs in uploads if "folder_path" in kwargs]
+    assert len(folder_upload) == 1
+    assert folder_upload[0]["folder_path"] == data_dir
+    assert folder_upload[0]["delete_patterns"] == "*.parquet"
+
+    dataset = load_dataset("parquet", data_dir=data_dir, cache_dir=str(tmp_path / "cache"))
+    assert len(dataset["test"]) == 1
+    assert len(dataset["train"]) == n_files - 1
+    for i, example in enumerate(dataset["train"]):
+        lensless = np.array(example["lensless"])
+        assert lensless.shape == (12, 16, 3)
+        assert lensless.dtype == np.uint8
+        assert np.all(np.array(example["lensed"]) == i + 1)
+
+    # resume: nothing is rewritten
+    def mtimes():
+        files = glob.glob(os.path.join(config.output_dir, "*.png"))
+        files += glob.glob(os.path.join(data_dir, "*.parquet"))
+        return {f: os.stat(f).st_mtime_ns for f in files}
+
+    mtimes_first = mtimes()
+    upload.upload_dataset(config)
+    assert mtimes() == mtimes_first
+
+    # only shard with a modified file is rewritten
+    cv2.imwrite(str(lensed_dir / "7.png"), np.full((12, 16, 3), 100, dtype=np.uint8))
+    upload.upload_dataset(config)
+    mtimes_second = mtimes()
+    changed = [f for f in mtimes_first if mtimes_first[f] != mtimes_second[f]]
+    assert changed == [os.path.join(data_dir, "train-00001-of-00003.parquet")]
+
+    # shards of previous run are removed when number of shards changes
+    config.shard_size = 20
+    upload.upload_dataset(config)
+    assert sorted(os.listdir(data_dir)) == [
+        "test-00000-of-00001.parquet",
+        "train-00000-of-00001.parquet",
+    ]
+
+
+class _RandomImages(torch.utils.data.Dataset):
+    def __init__(self, n_files, shape):
+        self.images = torch.rand(n_files, *shape, generator=torch.Generator().manual_seed(0))
+
+    def __len__(self):
+        return len(self.images)
+
+    def __getitem__(self, idx):
+        return self.images[idx], 0
+
+
+def test_presimulate_dataset(tmp_path, monkeypatch):
+    n_files = 25
+    simulator = FarFieldSimulator(
+        psf=torch.rand(1, 32, 48, 3, generator=torch.Generator().manual_seed(1)),
+        object_height=0.3,
+        scene2mask=0.4,
+        mask2sensor=0.002,
+        sensor="rpi_hq",
+        is_torch=True,
+        quantize=False,
+    )
+    dataset = SimulatedFarFieldDataset(_RandomImages(n_files, (40, 50, 3)), simulator)
+    root = str(tmp_path / "presimulated")
+    presimulate_dataset(dataset, root, n_workers=2, shard_size=10)
+
+    # same as simulating on the fly, up to uint16 precision
+    presimulated = PresimulatedDataset(root)
+    assert len(presimulated) == n_files
+    torch.testing.assert_close(presimulated.psf, dataset.psf)
+    for i in range(n_files):
+        for img, img_ref in zip(presimulated[i], dataset[i]):
+            assert img.shape == img_ref.shape
+            assert torch.max(torch.abs(img - img_ref)) <= img_ref.max() / 65535
+
+    # resume: existing shards are kept, missing shard is simulated again
+    fps = [
+        os.path.join(root, f"{key}_{shard}.npy")
+        for key in ["lensless", "lensed", "scale"]
+        for shard in range(3)
+    ]
+    mtimes = {fp: os.stat(fp).st_mtime_ns for fp in fps}
+    lensless_1 = np.load(os.path.join(root, "lensless_1.npy"))
+    os.remove(os.path.join(root, "lensless_1.npy"))
+    presimulate_dataset(dataset, root, n_workers=2, shard_size=10)
+    for fp in fps:
+        if os.path.basename(fp).endswith("_1.npy"):
+            assert os.stat(fp).st_mtime_ns != mtimes[fp]
+        else:
+            assert os.stat(fp).st_mtime_ns == mtimes[fp]
+    np.testing.assert_array_equal(np.load(os.path.join(root, "lensless_1.npy")), lensless_1)
+    assert not glob.glob(os.path.join(root, "*.tmp*"))
+
+    # PSF on GPU (if available): worker processes cannot be forked once CUDA is initialized
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    simulator_device = FarFieldSimulator(psf=simulator.get_psf().to(device), **simulator.params)
+    dataset_device = SimulatedFarFieldDataset(_RandomImages(n_files, (40, 50, 3)), simulator_device)
+    if device == "cpu":
+        # as if CUDA was initialized, to check that workers are spawned
+        monkeypatch.setattr(torch.cuda, "is_initialized", lambda: True)
+    root_device = str(tmp_path / "presimulated_device")
+    presimulate_dataset(dataset_device, root_device, n_workers=2, shard_size=10)
+    monkeypatch.undo()
+    presimulated_device = PresimulatedDataset(root_device)
+    for i in range(n_files):
+        for img, img_ref in zip(presimulated_device[i], presimulated[i]):
+            torch.testing.assert_close(img, img_ref, atol=2 * img_ref.max() / 65535, rtol=0)
+
+    # new noise realization at each load, quantization
+    noisy = PresimulatedDataset(root, snr_db=20, quantize=True, max_val=255)
+    lensless_a, lensed_a = noisy[3]
+    lensless_b, lensed_b = noisy[3]
+    assert not torch.equal(lensless_a, lensless_b)
+    torch.testing.assert_close(lensed_a, lensed_b)
+    assert torch.equal(lensless_a, torch.round(lensless_a))
+    assert lensless_a.max() == 255
+
+
+class _RandomValues(torch.utils.data.Dataset):
+    # values drawn with NumPy, as for random simulation parameters and noise
+    def __len__(self):
+        return 16
+
+    def __getitem__(self, idx):
+        worker_id = torch.utils.data.get_worker_info().id
+        return torch.tensor([np.random.rand(), worker_id, torch.get_num_threads()])
+
+
+def test_worker_init_fn():
+    dataloader = create_dataloader(_RandomValues(), batch_size=2, num_workers=2)
+    epochs = [torch.cat(list(dataloader)) for _ in range(2)]
+    for values in epochs:
+        # single thread per worker
+        assert torch.all(values[:, 2] == 1)
+        # workers draw different values
+        values_0 = values[values[:, 1] == 0, 0]
+        values_1 = values[values[:, 1] == 1, 0]
+        assert len(values_0) == len(values_1) == 8
+        assert len(np.intersect1d(values_0.numpy(), values_1.numpy())) == 0
+    # and new values at each epoch
+    assert not torch.equal(epochs[0], epochs[1])
+
+
+def test_trainer_num_workers_trainable_mask(tmp_path, monkeypatch):
+    # simulation with a trainable mask should remain in the main process
+    import pytest
+    from omegaconf import OmegaConf
+    from lensless import UnrolledFISTA
+    from lensless.hardware.trainable_mask import TrainablePSF
+    from lensless.recon.utils import Trainer
+    from lensless.utils.dataset import SimulatedDatasetTrainableMask
+
+    monkeypatch.chdir(tmp_path)
+    psf = torch.rand(1, 32, 48, 3, generator=torch.Generator().manual_seed(1))
+    mask = TrainablePSF(psf.clone())
+    simulator = FarFieldSimulator(
+        psf=psf,
+        object_height=0.3,
+        scene2mask=0.4,
+        mask2sensor=0.002,
+        sensor="rpi_hq",
+        is_torch=True,
+        quantize=False,
+    )
+    dataset = SimulatedDatasetTrainableMask(mask, _RandomImages(8, (40, 50, 3)), simulator)
+    optimizer = OmegaConf.load(
+        os.path.join(os.path.dirname(__file__), "..", "configs", "train", "defaults.yaml")
+    ).optimizer
+    optimizer.cosine_decay_warmup = False
+
+    # also when the test set is split from the train set
+    for test_dataset in [dataset, None]:
+        with pytest.warns(UserWarning, match="num_workers=0"):
+            trainer = Trainer(
+                recon=UnrolledFISTA(psf, n_iter=2),
+                train_dataset=dataset,
+                test_dataset=test_dataset,
+                mask=mask,
+                batch_size=2,
+                optimizer=optimizer,
+                n_epoch=1,
+                num_workers=2,
+            )
+        assert trainer.num_workers == 0
+        assert trainer.train_dataloader.num_workers == 0
+
+
+def test_paired_container(tmp_path):
+    n_files = 10
+    rng = np.random.default_rng(0)
+    # lensless in arbitrary range (stored with scale), lensed in [0, 1]
+    lensless = [rng.uniform(0, 3, (12, 16, 3)).astype(np.float32) for _ in range(n_files)]
+    lensed = [rng.uniform(0, 1, (12, 16, 3)).astype(np.float32) for _ in range(n_files)]
+    backgrounds = [np.full((12, 16, 3), 0.5, dtype=np.float32), np.ones((12, 16, 3), np.float32)]
+    psf = rng.uniform(0, 1, (1, 12, 16, 3)).astype(np.float32)
+
+    fp = str(tmp_path / "dataset.lpc")
+    with PairedContainerWriter(
+        fp, metadata_keys=["mask_label", "background_id"], params={"camera": "test"}
+    ) as writer:
+        writer.add_array("psf", psf)
+        for i, background in enumerate(backgrounds):
+            writer.add_array(f"background_{i}", background)
+        for i in range(n_files):
+            # last sample without background
+            metadata = {"mask_label": i % 3}
+            if i < n_files - 1:
+                metadata["background_id"] = i % 2
+            writer.add(lensless[i], torch.from_numpy(lensed[i]), **metadata)
+    assert not os.path.exists(fp + ".tmp")
+
+    # round trip within uint16 precision
+    dataset = PairedContainerDataset(fp)
+    assert len(dataset) == n_files
+    assert dataset.params == {"camera": "test"}
+    torch.testing.assert_close(dataset.psf, torch.from_numpy(psf))
+    for i in range(n_files):
+        lensless_i, lensed_i = dataset[i]
+        assert lensless_i.shape == (1, 12, 16, 3)
+        assert torch.max(torch.abs(lensless_i[0] - lensless[i])) <= lensless[i].max() / 65535
+        assert torch.max(torch.abs(lensed_i[0] - lensed[i])) <= 1 / 65535
+        assert dataset.get_metadata(i) == {
+            "mask_label": i % 3,
+            "background_id": i % 2 if i < n_files - 1 else -1,
+        }
+
+    # background subtraction
+    dataset_bg = PairedContainerDataset(fp, subtract_background=True)
+    for i in range(n_files):
+        expected = dataset[i][0]
+        if i < n_files - 1:
+            expected = torch.clamp(expected - backgrounds[i % 2], min=0)
+        torch.testing.assert_close(dataset_bg[i][0], expected)
+
+    # subset to a new container, with the same images and metadata
+    dataset.indices = [7, 2, 9]
+    fp_subset = str(tmp_path / "subset.lpc")
+    write_paired_container(
+        dataset,
+        fp_subset,
+        metadata={"mask_label": [dataset.get_metadata(i)["mask_label"] for i in range(3)]},
+        arrays={"psf": psf},
+    )
+    subset = PairedContainerDataset(fp_subset)
+    assert len(subset) == 3
+    for i in range(3):
+        for img, img_ref in zip(subset[i], dataset[i]):
+            torch.testing.assert_close(img, img_ref, atol=1e-5 * img_ref.max(), rtol=0)
+        assert subset.get_metadata(i)["mask_label"] == dataset.get_metadata(i)["mask_label"]
+
+    # loading in worker processes, which open the file again
+    dataset_bg = pickle.loads(pickle.dumps(dataset_bg))
+    assert dataset_bg._data is None
+    dataloader = create_dataloader(dataset_bg, batch_size=4, num_workers=2)
+    lensless_batches = torch.cat([lensless_b for lensless_b, _ in dataloader])
+    for i in range(n_files):
+        torch.testing.assert_close(lensless_batches[i], dataset_bg[i][0])
+
+
+def test_measured_dataset_reduced_decoding(tmp_path):
+    # downsampling while decoding should give the same shapes and similar values as resizing
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 1, 96)
+    for folder in ["lensless", "lensed"]:
+        os.makedirs(tmp_path / folder)
+        for i in range(2):
+            img = np.stack([np.outer(x[:64], x) * (c + 1) / 3 for c in range(3)], axis=-1)
+            img = img + 0.05 * rng.uniform(size=img.shape)
+            cv2.imwrite(
+                str(tmp_path / folder / f"{i}.png"), (img / img.max() * 255).astype(np.uint8)
+            )
+
+    kwargs = dict(lensless_fn="lensless", lensed_fn="lensed", image_ext="png", downsample=2)
+    dataset = MeasuredDataset(tmp_path, **kwargs)
+    dataset_reduced = MeasuredDataset(tmp_path, reduced_decoding=True, **kwargs)
+    assert len(dataset_reduced) == len(dataset)
+    for i in range(len(dataset)):
+        for img_reduced, img in zip(dataset_reduced[i], dataset[i]):
+            assert img_reduced.shape == img.shape == (1, 32, 48, 3)
+            assert img_reduced.dtype == img.dtype
+            assert (img_reduced - img).abs().mean() < 0.01
+
+
+def test_preprocess_cache(tmp_path, monkeypatch):
+    from datasets import Dataset, Features, Image
+
+    # small local dataset with random images
+    rng = np.random.default_rng(0)
+    n_files = 5
+    images = [
+        {
+            "bytes": cv2.imencode(".png", rng.integers(0, 256, (24, 32, 3), dtype=np.uint8))[
+                1
+            ].tobytes()
+        }
+        for _ in range(2 * n_files)
+    ]
+    features = Features({"lensless": Image(), "lensed": Image()})
+    split = Dataset.from_dict(
+        {"lensless": images[:n_files], "lensed": images[n_files:]}, features=features
+    )
+    psf = np.zeros((24, 32, 3), dtype=np.uint8)
+    psf[8:16, 12:20] = 255
+    cv2.imwrite(str(tmp_path / "psf.png"), psf)
+
+    cache_dir = str(tmp_path / "cache")
+    kwargs = dict(split=split, psf="psf.png", downsample=2, downsample_lensed=2)
+    dataset = HFDataset(str(tmp_path), **kwargs)
+    for dtype, atol in [("uint16", 1 / 65535), ("float16", 1e-3)]:
+        dataset_cached = HFDataset(
+            str(tmp_path),
+            preprocess_cache=cache_dir,
+            preprocess_cache_dtype=dtype,
+            preprocess_cache_shard_size=2,
+            **kwargs,
+        )
+        assert os.path.dirname(dataset_cached.preprocess_cache) == cache_dir
+        for i in range(n_files):
+            cached = dataset_cached._read_preprocess_cache(i)
+            for img_cached, img in zip(cached, dataset._preprocess_images(i)):
+                if img is None:
+                    assert img_cached is None
+                else:
+                    np.testing.assert_allclose(img_cached, img, atol=atol, rtol=0)
+    assert len(os.listdir(cache_dir)) == 2
+
+    # existing shards (and parameters) are reused
+    cache_fps = sorted(glob.glob(os.path.join(dataset_cached.preprocess_cache, "*")))
+    assert len(cache_fps) == 2 * 3 + 1
+    mtimes = [os.path.getmtime(fp) for fp in cache_fps]
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("Images should not be preprocessed again")
+
+    with monkeypatch.context() as m:
+        m.setattr(HFDataset, "_preprocess_images", _fail)
+        dataset_cached = HFDataset(
+            str(tmp_path),
+            preprocess_cache=cache_dir,
+            preprocess_cache_dtype="float16",
+            preprocess_cache_shard_size=2,
+            **kwargs,
+        )
+        assert sorted(glob.glob(os.path.join(dataset_cached.preprocess_cache, "*"))) == cache_fps
+        assert [os.path.getmtime(fp) for fp in cache_fps] == mtimes
+        items = [dataset_cached[i] for i in range(n_files)]
+
+    # other preprocessing parameters, other directory
+    dataset_other = HFDataset(
+        str(tmp_path), preprocess_cache=cache_dir, **{**kwargs, "downsample_lensed": 1}
+    )
+    assert dataset_other.preprocess_cache != dataset_cached.preprocess_cache
+    assert len(os.listdir(cache_dir)) == 3
+
+    # memory-mapped shards are not pickled, but opened again in worker processes
+    assert len(dataset_cached._cache_shards) > 0
+    dataset_pickled = pickle.loads(pickle.dumps(dataset_cached))
+    assert len(dataset_pickled._cache_shards) == 0
+    for i in range(n_files):
+        for img_pickled, img in zip(dataset_pickled[i], items[i]):
+            torch.testing.assert_close(img_pickled, img)
+    dataloader = create_dataloader(dataset_cached, batch_size=2, num_workers=2)
+    lensless_batches = torch.cat([lensless_b for lensless_b, *_ in dataloader])
+    for i in range(n_files):
+        torch.testing.assert_close(lensless_batches[i], items[i][0])
+
+
+if __name__ == "__main__":
+    test_propagate_batch()
+    test_worker_init_fn()
@@ -1,4 +1,8 @@
-from lensless.utils.io import load_data, rgb2gray
+from lensless.utils.io import load_data, load_image, load_images, rgb2gray, update_stats_index
+import cv2
+import numpy as np
+from lensless.hardware.constants import RPI_HQ_CAMERA_BLACK_LEVEL, RPI_HQ_CAMERA_CCM_MATRIX
+from lensless.utils.image import bayer2rgb_cc, bayer_binning, resize
 
 psf_fp = "data/psf/tape_rgb.png"
 data_fp = "data/raw_data/thumbs_up_rgb.png"
@@ -50,6 +54,176 @@ def test_rgb2gray():
         assert len(data_gray.shape) == 3
 
 
+def test_load_images():
+    fps = [psf_fp, data_fp, psf_fp]
+    for use_processes in [False, True]:
+        imgs = load_images(
+            fps,
+            n_workers=2,
+            use_processes=use_processes,
+            downsample=downsample,
+            return_float=True,
+        )
+        assert imgs.shape[0] == len(fps)
+        for img, fp in zip(imgs, fps):
+            np.testing.assert_array_equal(
+                img, load_image(fp, downsample=downsample, return_float=True)
+            )
+
+
+def test_bayer_binning():
+    rng = np.random.default_rng(0)
+    bayer = rng.integers(256, 4096, size=(120, 162), dtype=np.uint16)
+    for down in [2, 3, 4, 8]:
+        ref = bayer2rgb_cc(bayer, nbits=12, down=down, red_gain=1.9, blue_gain=1.2)
+        binned = bayer2rgb_cc(bayer, nbits=12, down=down, red_gain=1.9, blue_gain=1.2, binning=True)
+        assert binned.shape == ref.shape
+        assert binned.dtype == ref.dtype
+
+    # close to demosaicing and resizing for a smooth image
+    y, x = np.mgrid[:120, :162]
+    bayer = (256 + 3000 * (0.5 + 0.5 * np.sin(x / 15) * np.cos(y / 20))).astype(np.uint16)
+    for down in [2, 3, 4, 8]:
+        ref = bayer2rgb_cc(bayer, nbits=12, down=down, red_gain=1.9, blue_gain=1.2)
+        binned = bayer2rgb_cc(bayer, nbits=12, down=down, red_gain=1.9, blue_gain=1.2, binning=True)
+        assert np.abs(binned.astype(np.float32) - ref).mean() < 0.02 * 4095
+
+    # same color as demosaicing for a constant color per Bayer channel, at every factor
+    bayer = np.zeros((120, 162), dtype=np.uint16)
+    bayer[1::2, 1::2] = 800  # red
+    bayer[0::2, 1::2] = 1000  # green
+    bayer[1::2, 0::2] = 1200  # green
+    bayer[0::2, 0::2] = 900  # blue
+    color = bayer2rgb_cc(bayer, nbits=12, red_gain=1.9, blue_gain=1.2)[60, 80]
+    assert np.all(color < 4095)
+    for down in [2, 3, 4, 8]:
+        binned = bayer2rgb_cc(bayer, nbits=12, down=down, red_gain=1.9, blue_gain=1.2, binning=True)
+        diff = binned.astype(np.float32) - np.broadcast_to(color, binned.shape)
+        assert np.abs(diff).max() <= 1
+
+    # uniform color per Bayer channel
+    bayer = np.zeros((16, 16), dtype=np.uint16)
+    bayer[1::2, 1::2] = 1000  # red
+    bayer[0::2, 1::2] = 500  # green
+    bayer[1::2, 0::2] = 700  # green
+    bayer[0::2, 0::2] = 300  # blue
+    rgb = bayer_binning(bayer, down=4)
+    assert rgb.shape == (4, 4, 3)
+    np.testing.assert_array_equal(rgb, np.broadcast_to([1000, 600, 300], rgb.shape))
+
+
+def _bayer2rgb_cc_reference(img, nbits, red_gain, blue_gain, black_level, ccm, nbits_out):
+    # previous (float64, out-of-place) implementation of `bayer2rgb_cc`
+    dtype = np.uint16 if nbits_out > 8 else np.uint8
+    img = cv2.cvtColor(img, cv2.COLOR_BayerRG2RGB)
+    img = img - black_level
+    img[:, :, 0] *= red_gain
+    img[:, :, 2] *= blue_gain
+    img = img / (2**nbits - 1 - black_level)
+    img[img > 1] = 1
+    img = (img.reshape(-1, 3, order="F") @ ccm.T).reshape(img.shape, order="F")
+    img[img < 0] = 0
+    img[img > 1] = 1
+    return (img * (2**nbits_out - 1)).astype(dtype)
+
+
+def test_bayer2rgb_cc():
+    rng = np.random.default_rng(0)
+    bayer = rng.integers(0, 4096, size=(120, 162), dtype=np.uint16)
+    param = dict(red_gain=1.9, blue_gain=1.2, black_level=RPI_HQ_CAMERA_BLACK_LEVEL)
+
+    for nbits_out in [8, 12]:
+        for ccm in [RPI_HQ_CAMERA_CCM_MATRIX, RPI_HQ_CAMERA_CCM_MATRIX.astype(np.float32)]:
+            ref = _bayer2rgb_cc_reference(bayer, 12, ccm=ccm, nbits_out=nbits_out, **param)
+
+            # bit-exact in double precision
+            rgb = bayer2rgb_cc(
+                bayer, 12, ccm=ccm, nbits_out=nbits_out, float_dtype=np.float64, **param
+            )
+            assert rgb.dtype == ref.dtype
+            np.testing.assert_array_equal(rgb, ref)
+
+            # at most one quantization level in single precision
+            out = np.empty_like(ref)
+            rgb = bayer2rgb_cc(bayer, 12, ccm=ccm, nbits_out=nbits_out, out=out, **param)
+            assert rgb is out
+            assert np.abs(rgb.astype(int) - ref).max() <= 1
+
+    # per-channel black level in single precision (as for DNG files): bit-exact
+    black_level = np.array([256, 257, 255], dtype=np.float32)
+    ccm = RPI_HQ_CAMERA_CCM_MATRIX.astype(np.float32)
+    param.update(black_level=black_level)
+    ref = _bayer2rgb_cc_reference(bayer, 12, ccm=ccm, nbits_out=8, **param)
+    np.testing.assert_array_equal(bayer2rgb_cc(bayer, 12, ccm=ccm, nbits_out=8, **param), ref)
+
+
+def test_load_image_reduced_decoding():
+    for down in [2, 4, 8]:
+        img = load_image(data_fp, downsample=down, as_4d=True, reduced_decoding=True)
+        img_ref = load_image(data_fp, downsample=down, as_4d=True)
+        assert img.shape == img_ref.shape
+        assert img.dtype == img_ref.dtype
+        assert np.mean(np.abs(img.astype(np.float32) - img_ref)) < 0.01 * img_ref.max()
+
+
+def test_load_image_reduced_decoding_sparse(tmp_path):
+    # sparse 16-bit image, as a PSF
+    rng = np.random.default_rng(0)
+    img = np.zeros((380, 508, 3), dtype=np.uint16)
+    img.reshape(-1, 3)[rng.integers(0, 380 * 508, 500)] = rng.integers(1000, 65535, (500, 3))
+    img = cv2.GaussianBlur(img, (0, 0), 1.0)
+    fp = str(tmp_path / "psf.png")
+    cv2.imwrite(fp, img)
+    img = np.ascontiguousarray(img[..., ::-1])
+
+    for down in [2, 4, 8]:
+        # not used by default
+        img_ref = load_image(fp, downsample=down, as_4d=True)
+        np.testing.assert_array_equal(img_ref, resize(img[np.newaxis], factor=1 / down))
+
+        # peaks can differ by more than the maximum, but not the total intensity
+        img_reduced = load_image(fp, downsample=down, as_4d=True, reduced_decoding=True)
+        assert img_reduced.shape == img_ref.shape
+        assert (
+            abs(img_reduced.astype(np.float32).sum() / img_ref.astype(np.float32).sum() - 1) < 0.1
+        )
+
+    # bilinear interpolation without antialiasing
+    img_reduced = load_image(fp, downsample=2, reduced_decoding=True)
+    img_linear = cv2.resize(img, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_LINEAR_EXACT)
+    img_linear = img_linear[: img_reduced.shape[0], : img_reduced.shape[1]]
+    assert np.abs(img_reduced.astype(np.float32) - img_linear).max() <= 1
+
+
+def test_update_stats_index(tmp_path):
+    fps = []
+    for i, max_val in enumerate([100, 255]):
+        fp = str(tmp_path / f"{i}.png")
+        img = np.zeros((10, 20, 3), dtype=np.uint8)
+        img[0, 0] = max_val
+        cv2.imwrite(fp, img)
+        fps.append(fp)
+    cv2.imwrite(str(tmp_path / "black_background0.png"), np.zeros((10, 20, 3), dtype=np.uint8))
+
+    index_fp = str(tmp_path / "stats_index.json")
+    stats = update_stats_index(fps, index_fp, n_workers=1)
+    assert stats["0.png"]["max"] == 100
+    assert stats["1.png"]["n_saturated"] == 3
+    assert stats["0.png"]["background"] == "black_background0.png"
+    assert stats["1.png"]["background"] is None
+
+    # only changed files are recomputed
+    img = np.full((10, 20, 3), 50, dtype=np.uint8)
+    cv2.imwrite(fps[0], img)
+    stats = update_stats_index(fps, index_fp, n_workers=1)
+    assert stats["0.png"]["max"] == 50
+    assert stats["0.png"]["mean"] == [50, 50, 50]
+
+
 if __name__ == "__main__":
     test_load_data()
     test_rgb2gray()
+    test_load_images()
+    test_bayer_binning()
+    test_bayer2rgb_cc()
+    test_load_image_reduced_decoding()
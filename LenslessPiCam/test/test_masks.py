@@ -3,6 +3,13 @@ from lensless.hardware.mask import CodedAperture, PhaseContour, FresnelZoneApert
 from lensless.eval.metric import mse, psnr, ssim
 from waveprop.fresnel import fresnel_conv
 
+try:
+    from lensless.hardware.fabrication import Mask3DModel
+
+    cadquery_available = True
+except ImportError:
+    cadquery_available = False
+
 
 resolution = np.array([380, 507])
 d1 = 3e-6
@@ -92,8 +99,296 @@ def test_classmethod():
     assert np.all(mask3.psf.shape == desired_psf_shape)
 
 
+def _place_spheres_reference(mask, radius, max_attempts=1000):
+    # compare each candidate with all lenses placed so far
+    loc, r_placed = [], []
+    for r in sorted(radius, reverse=True):
+        for _ in range(max_attempts):
+            x = np.random.uniform(r, mask.size[1] - r)
+            y = np.random.uniform(r, mask.size[0] - r)
+            circles = [(cx, cy, cr) for (cx, cy), cr in zip(loc, r_placed)]
+            if not mask.does_circle_overlap(circles, x, y, r):
+                loc.append([x, y])
+                r_placed.append(r)
+                break
+    return np.array(loc, dtype=np.float32), np.array(r_placed, dtype=np.float32)
+
+
+def _height_map_reference(mask, radius, locs):
+    # evaluate each lens over the full grid
+    x = np.arange(mask.resolution[0]).astype(np.float32) - mask.resolution[1] / 2
+    y = np.arange(mask.resolution[1]).astype(np.float32) - mask.resolution[0] / 2
+    X, Y = np.meshgrid(x, y, indexing="ij")
+    height = np.full(X.shape, mask.min_height, dtype=np.float32)
+    for rad, loc in zip(radius, locs):
+        dist_sq = (X - loc[1]) ** 2 + (Y - loc[0]) ** 2
+        contribution = np.sqrt(np.clip(rad**2 - dist_sq, 0, None)) * mask.feature_size[0]
+        height = height + contribution
+    height[height < mask.min_height] = mask.min_height
+    return height
+
+
+def test_multi_lens_array():
+    import torch
+    from lensless.hardware.mask import MultiLensArray
+
+    seed = 3
+    for use_torch in [False, True]:
+        mask = MultiLensArray(
+            N=60,
+            seed=seed,
+            resolution=(192, 256),
+            feature_size=2e-5,
+            use_torch=use_torch,
+        )
+        loc, radius = mask.loc, mask.radius
+        if use_torch:
+            loc, radius = loc.numpy(), radius.numpy()
+        assert 20 < len(radius) < 60
+
+        # same placement as comparing each candidate with all placed lenses
+        np.random.seed(seed)
+        radius_ref = np.random.uniform(mask.radius_range[0], mask.radius_range[1], mask.N)
+        loc_ref, radius_ref = _place_spheres_reference(mask, radius_ref)
+        np.testing.assert_array_equal(radius, radius_ref)
+        np.testing.assert_allclose(loc, loc_ref - np.array(mask.size) / 2, rtol=1e-6)
+
+        # same height map as evaluating each lens over the full grid
+        height_map = mask.height_map
+        if use_torch:
+            assert torch.is_tensor(height_map)
+            height_map = height_map.numpy()
+        height_map_ref = _height_map_reference(
+            mask, radius / mask.feature_size[0], loc / mask.feature_size[0]
+        )
+        assert np.any(height_map_ref > mask.min_height)
+        np.testing.assert_allclose(
+            height_map, height_map_ref, rtol=0, atol=1e-4 * height_map_ref.max()
+        )
+
+
+def test_angular_spectrum_batch():
+    from waveprop.rs import angular_spectrum
+    from lensless.utils.propagation import angular_spectrum_batch, get_transfer_function
+
+    rng = np.random.default_rng(0)
+    u_in = rng.uniform(size=(41, 60)).astype(np.float32)
+    wavelengths = [460e-9, 550e-9, 640e-9]
+    u_out = angular_spectrum_batch(u_in, wavelengths, d1=d1, dz=dz)
+    assert u_out.shape == (len(wavelengths),) + u_in.shape
+    for i, wv in enumerate(wavelengths):
+        ref = angular_spectrum(u_in=u_in, wv=wv, d1=d1, dz=dz, dtype=np.float32)[0]
+        np.testing.assert_allclose(u_out[i], ref, atol=1e-6 * np.abs(ref).max())
+
+    # transfer functions are cached
+    H = get_transfer_function(u_in.shape, d1, wavelengths[0], dz)
+    assert H is get_transfer_function(u_in.shape, d1, wavelengths[0], dz)
+
+
+def test_phase_retrieval_batch():
+    from lensless.hardware.mask import phase_retrieval
+
+    rng = np.random.default_rng(0)
+    target_psf = (rng.uniform(size=(3, 48, 64)) > 0.9).astype(np.float32)
+    wavelengths = [460e-9, 550e-9, 640e-9]
+    n_iter = 5
+
+    phi, height_map, errors = phase_retrieval(
+        target_psf, wavelengths, d1, dz, n_iter=n_iter, height_map=True, return_errors=True
+    )
+    assert phi.shape == (3, len(wavelengths), 48, 64)
+    assert height_map.shape == phi.shape
+    assert errors.shape == (n_iter, 3, len(wavelengths))
+
+    # same as one PSF and one wavelength at a time
+    phi_single, height_map_single = phase_retrieval(
+        target_psf[1], wavelengths[2], d1, dz, n_iter=n_iter, height_map=True
+    )
+    np.testing.assert_allclose(np.exp(1j * phi_single), np.exp(1j * phi[1, 2]), atol=1e-5)
+    np.testing.assert_allclose(height_map_single, height_map[1, 2], atol=1e-6 * dz)
+
+    # early stopping
+    _, errors = phase_retrieval(
+        target_psf[0], wavelengths[0], d1, dz, n_iter=100, tol=1, return_errors=True
+    )
+    assert errors.shape == (2,)
+
+
+def _phase_retrieval_reference(target_psf, wv, n_iter):
+    # previous implementation: one PSF and one wavelength, with `fresnel_conv` at each iteration
+    M_p = np.sqrt(target_psf)
+    for _ in range(n_iter):
+        M_phi = fresnel_conv(M_p, wv, d1, -dz, dtype=np.float32)[0]
+        M_phi = np.exp(1j * np.angle(M_phi))
+        M_p = fresnel_conv(M_phi, wv, d1, dz, dtype=np.float32)[0]
+        M_p = np.sqrt(target_psf) * np.exp(1j * np.angle(M_p))
+    return (np.angle(M_phi) + 2 * np.pi) % (2 * np.pi)
+
+
+def test_phase_retrieval_reference():
+    from lensless.hardware.mask import phase_retrieval
+
+    rng = np.random.default_rng(1)
+    target_psf = (rng.uniform(size=(48, 64)) > 0.9).astype(np.float32)
+    wv = 550e-9
+    for n_iter in [1, 2]:
+        phi_ref = _phase_retrieval_reference(target_psf, wv, n_iter)
+        phi = phase_retrieval(target_psf, wv, d1, dz, n_iter=n_iter)
+        np.testing.assert_allclose(np.exp(1j * phi), np.exp(1j * phi_ref), atol=1e-4)
+
+    # error does not depend on the scale of the target
+    _, errors = phase_retrieval(target_psf, wv, d1, dz, n_iter=3, return_errors=True)
+    _, errors_scaled = phase_retrieval(100 * target_psf, wv, d1, dz, n_iter=3, return_errors=True)
+    np.testing.assert_allclose(errors, errors_scaled, rtol=1e-4)
+    assert np.all(errors < 1)
+
+
+def _programmable_mask_reference(vals, sensor, slm_param):
+    # rasterize one SLM pixel at a time
+    from waveprop.devices import SLMParam
+    from waveprop.slm import get_centers
+
+    centers = get_centers(vals.shape, pixel_pitch=slm_param[SLMParam.PITCH])
+    height, width = (slm_param[SLMParam.CELL_SIZE] / sensor.pitch).astype(int)
+    color_filter = slm_param[SLMParam.COLOR_FILTER]
+    mask = np.zeros((len(color_filter),) + tuple(sensor.resolution), dtype=vals.dtype)
+    for i, center in enumerate(centers):
+        center_pixel = (center / sensor.pitch + sensor.resolution / 2).astype(int)
+        top = center_pixel[0] - height // 2
+        left = center_pixel[1] + 1 - width // 2
+        mask_val = vals.flat[i] * color_filter[i // vals.shape[1] % len(color_filter)][0]
+        mask[:, top : top + height, left : left + width] = mask_val[:, np.newaxis, np.newaxis]
+    return mask
+
+
+def test_mask_to_rectangles():
+    # merged boxes should cover the same volume as the pixel boxes, with at most as many boxes
+    if not cadquery_available:
+        return
+    rng = np.random.default_rng(0)
+    x = np.linspace(-1, 1, 64)
+    masks = [
+        rng.integers(0, 2, (64, 48)),  # binary
+        rng.random((64, 48)),  # random heights
+        np.clip(1 - x[:, None] ** 2 - x[None, :] ** 2, 0, None),  # lens
+    ]
+    px_size = np.array([1e-5, 2e-5])
+    for mask in masks:
+        points, heights = Mask3DModel.mask_to_points(mask, px_size)
+        if heights is None:
+            heights = np.ones(len(points))
+        for height_levels in [None, 8]:
+            rectangles = Mask3DModel.mask_to_rectangles(mask, px_size, height_levels)
+
+            # rasterize boxes
+            volume = np.zeros(mask.shape)
+            n_boxes = 0
+            for thickness, coordinates, sizes in rectangles:
+                start = np.round(coordinates / px_size + np.array(mask.shape) / 2).astype(int)
+                end = start + np.round(sizes / px_size).astype(int)
+                for (r0, c0), (r1, c1) in zip(start, end):
+                    assert np.all(volume[r0:r1, c0:c1] == 0), "Boxes should not overlap"
+                    volume[r0:r1, c0:c1] = thickness
+                n_boxes += len(coordinates)
+            assert n_boxes <= len(points)
+
+            if height_levels is None:
+                expected = np.zeros(mask.shape)
+                indices = np.round(points / px_size + np.array(mask.shape) / 2).astype(int)
+                expected[indices[:, 0], indices[:, 1]] = heights
+                np.testing.assert_allclose(volume, expected)
+            else:
+                step = mask.max() / height_levels
+                assert (
+                    np.abs(volume - (mask if len(np.unique(mask)) > 2 else mask == 0)).max() <= step
+                )
+
+
+def test_programmable_mask():
+    import torch
+    from waveprop.devices import slm_dict
+    from lensless.hardware.sensor import VirtualSensor
+    from lensless.hardware.slm import get_programmable_mask
+
+    slm_param = slm_dict["adafruit"]
+    rng = np.random.default_rng(0)
+    vals = rng.uniform(size=(54, 26)).astype(np.float32)
+    for downsample in [4, 8]:
+        sensor = VirtualSensor.from_name("rpi_hq", downsample=downsample)
+        mask = get_programmable_mask(vals, sensor, slm_param)
+        np.testing.assert_array_equal(mask, _programmable_mask_reference(vals, sensor, slm_param))
+
+        # same with torch, and differentiable
+        for deadspace in [True, False]:
+            vals_torch = torch.from_numpy(vals).requires_grad_()
+            mask_torch = get_programmable_mask(vals_torch, sensor, slm_param, deadspace=deadspace)
+            if deadspace:
+                np.testing.assert_array_equal(mask_torch.detach().numpy(), mask)
+            mask_torch.sum().backward()
+            assert vals_torch.grad is not None
+            assert torch.all(vals_torch.grad > 0)
+
+
+def test_intensity_psf():
+    import torch
+    from waveprop.devices import slm_dict
+    from waveprop.color import ColorSystem
+    from waveprop.rs import angular_spectrum
+    from waveprop.spherical import spherical_prop
+    from lensless.hardware.sensor import VirtualSensor
+    from lensless.hardware.slm import get_intensity_psf, get_programmable_mask
+
+    scene2mask, mask2sensor = 0.3, 2e-3
+    sensor = VirtualSensor.from_name("rpi_hq", downsample=8)
+    rng = np.random.default_rng(0)
+    vals = rng.uniform(size=(54, 26)).astype(np.float32)
+    mask = get_programmable_mask(vals, sensor, slm_dict["adafruit"])
+
+    # reference: propagate one wavelength at a time
+    psf_ref = []
+    for i, wv in enumerate(ColorSystem.rgb().wv):
+        u_in = spherical_prop(
+            in_shape=sensor.resolution,
+            d1=sensor.pitch,
+            wv=wv,
+            dz=scene2mask,
+            return_psf=True,
+            dtype=np.float32,
+        )[0]
+        u_out = angular_spectrum(
+            u_in=u_in * mask[i], wv=wv, d1=sensor.pitch, dz=mask2sensor, dtype=np.float32
+        )[0]
+        psf_ref.append(np.abs(u_out) ** 2)
+    psf_ref = np.stack(psf_ref)
+
+    for waveprop in [True, False]:
+        kwargs = dict(sensor=sensor, scene2mask=scene2mask, mask2sensor=mask2sensor)
+        ref = psf_ref if waveprop else np.abs(mask) ** 2
+
+        # second call with cached wavefronts and transfer functions
+        for _ in range(2):
+            psf = get_intensity_psf(mask, waveprop=waveprop, **kwargs)
+            np.testing.assert_allclose(psf, ref, rtol=0, atol=1e-4 * ref.max())
+
+        # same with torch, and differentiable
+        vals_torch = torch.from_numpy(vals).requires_grad_()
+        mask_torch = get_programmable_mask(vals_torch, sensor, slm_dict["adafruit"])
+        psf_torch = get_intensity_psf(mask_torch, waveprop=waveprop, **kwargs)
+        np.testing.assert_allclose(psf_torch.detach().numpy(), ref, rtol=0, atol=1e-4 * ref.max())
+        psf_torch.sum().backward()
+        assert vals_torch.grad is not None
+        assert torch.any(vals_torch.grad != 0)
+
+
 if __name__ == "__main__":
     test_flatcam()
     test_phlatcam()
     test_fza()
     test_classmethod()
+    test_angular_spectrum_batch()
+    test_phase_retrieval_batch()
+    test_phase_retrieval_reference()
+    test_multi_lens_array()
+    test_mask_to_rectangles()
+    test_programmable_mask()
+    test_intensity_psf()